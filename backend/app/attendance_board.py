@@ -0,0 +1,184 @@
+"""
+Live Attendance Board
+
+Today's attendance board of a department (the /attendance/today payload),
+built from the cached daily roster plus one query for today's check-ins, and
+its server-sent event stream: the board is sent once, then every committed
+check-in or check-out is pushed as an event carrying that employee's updated
+row fields. Dashboards hold one stream open instead of polling, so database
+load follows the number of check-ins rather than pollers x employees.
+
+Stream events:
+    board       the full /attendance/today payload (on connect, at midnight
+                and whenever the subscriber must resync)
+    check_in    {employee_id, employee_name, check_in_time, check_out_time,
+    check_out    status, date} - replaces these fields on the employee's rows,
+                or adds an unscheduled row if the board has none
+    end         {reason} - the session expired or access was revoked; the
+                client reconnects with a new stream token
+"""
+
+import asyncio
+import json
+import time
+from datetime import date
+from typing import AsyncIterator, Dict, List, Optional
+
+from fastapi import Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import async_session_maker
+from app.event_bus import event_bus, RESYNC
+from app.models import CheckInOut, UserType
+from app.principal_cache import principal_cache
+from app.roster_cache import roster_cache
+
+
+# Scope of the short-lived tokens that open the stream (see auth.create_scoped_token)
+ATTENDANCE_STREAM_SCOPE = "attendance_stream"
+
+
+def board_status(check_in_status: Optional[str], check_out_time) -> str:
+    """Board status of an employee from today's check-in (absent when there is none)"""
+    if check_out_time:
+        return "completed"
+    if check_in_status == "on-time":
+        return "present"
+    return check_in_status
+
+
+def _check_in_fields(checkin: Optional[CheckInOut]) -> Dict:
+    return {
+        "check_in_time": checkin.check_in_time.isoformat() if checkin and checkin.check_in_time else None,
+        "check_out_time": checkin.check_out_time.isoformat() if checkin and checkin.check_out_time else None,
+        "status": board_status(checkin.check_in_status, checkin.check_out_time) if checkin else "absent"
+    }
+
+
+async def build_board(db: AsyncSession, department_id: int, day: Optional[date] = None) -> Dict:
+    """Attendance board of a department: every scheduled employee plus anyone checked in without a schedule"""
+    day = day or date.today()
+
+    # Employees and the day's schedules from the cached daily roster
+    roster = await roster_cache.get(department_id, day)
+    employees = roster.employees
+    schedules = [s for s in roster.schedules if s['department_id'] == department_id]
+
+    checkin_result = await db.execute(
+        select(CheckInOut).filter(
+            CheckInOut.date == day,
+            CheckInOut.employee_id.in_(list(employees))
+        )
+    )
+    checkins = {c.employee_id: c for c in checkin_result.scalars().all()}
+
+    attendance_summary: List[Dict] = []
+    included_employees = set()
+
+    # First, add all employees with schedules
+    for schedule in schedules:
+        attendance_summary.append({
+            "employee_id": schedule['employee_id'],
+            "employee_name": employees.get(schedule['employee_id'], "Unknown"),
+            "schedule_id": schedule['id'],
+            "scheduled_time": f"{schedule['start_time']} - {schedule['end_time']}",
+            **_check_in_fields(checkins.get(schedule['employee_id']))
+        })
+        included_employees.add(schedule['employee_id'])
+
+    # Then, add any checked-in employees who don't have a schedule
+    for employee_id, checkin in checkins.items():
+        if employee_id not in included_employees:
+            attendance_summary.append({
+                "employee_id": employee_id,
+                "employee_name": employees.get(employee_id, "Unknown"),
+                "schedule_id": None,
+                "scheduled_time": "No Schedule",
+                **_check_in_fields(checkin)
+            })
+
+    return {
+        "date": day.isoformat(),
+        "total_scheduled": len(schedules),
+        "total_checked_in": len(checkins),
+        "total_shown": len(attendance_summary),
+        "attendance": attendance_summary
+    }
+
+
+def publish_check_in_change(event_type: str, department_id: int, employee_id: int, employee_name: str,
+                            check_in_time, check_out_time, check_in_status: Optional[str], day: date) -> int:
+    """Push a committed check-in / check-out to the department's board streams"""
+    return event_bus.publish(('attendance', department_id), {
+        "type": event_type,
+        "date": day.isoformat(),
+        "employee_id": employee_id,
+        "employee_name": employee_name,
+        "check_in_time": check_in_time.isoformat() if check_in_time else None,
+        "check_out_time": check_out_time.isoformat() if check_out_time else None,
+        "status": board_status(check_in_status, check_out_time)
+    })
+
+
+def _sse(event_type: str, payload: Dict) -> str:
+    return f"event: {event_type}\ndata: {json.dumps(payload, default=str)}\n\n"
+
+
+async def _board_event(department_id: int, day: date) -> str:
+    async with async_session_maker() as db:
+        return _sse('board', await build_board(db, department_id, day))
+
+
+async def _still_authorized(username: str, department_id: int) -> bool:
+    """The stream's user is still an active manager of the department (cached principal)"""
+    async with async_session_maker() as db:
+        principal = await principal_cache.get(db, username)
+    return (principal is not None and principal.is_active
+            and principal.user_type == UserType.MANAGER and principal.department_id == department_id)
+
+
+async def stream_board(request: Request, department_id: int, username: str,
+                       session_exp: float) -> AsyncIterator[str]:
+    """
+    Server-sent events: the board, then check-in / check-out events, with
+    keep-alive comments. Ends with an 'end' event when the session expires
+    (session_exp, a Unix timestamp) or the user loses access; the client
+    reconnects with a fresh stream token.
+    """
+    # Subscribe before loading the board so no commit falls between the two
+    async with event_bus.subscribe(('attendance', department_id)) as queue:
+        day = date.today()
+        yield await _board_event(department_id, day)
+        next_check = time.monotonic() + settings.ATTENDANCE_STREAM_HEARTBEAT_SECONDS
+        while True:
+            remaining = session_exp - time.time()
+            if remaining <= 0:
+                yield _sse('end', {'reason': 'session_expired'})
+                return
+            if time.monotonic() >= next_check:
+                next_check = time.monotonic() + settings.ATTENDANCE_STREAM_HEARTBEAT_SECONDS
+                if not await _still_authorized(username, department_id):
+                    yield _sse('end', {'reason': 'access_revoked'})
+                    return
+
+            try:
+                event = await asyncio.wait_for(
+                    queue.get(), timeout=min(settings.ATTENDANCE_STREAM_HEARTBEAT_SECONDS, remaining)
+                )
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                if date.today() != day:
+                    day = date.today()
+                    yield await _board_event(department_id, day)
+                else:
+                    yield ": keep-alive\n\n"
+                continue
+
+            if event['type'] == RESYNC['type'] or event['date'] != day.isoformat():
+                day = date.today()
+                yield await _board_event(department_id, day)
+            else:
+                yield _sse(event['type'], event)
@@ -9,12 +9,12 @@ from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 
 from app.config import settings
 from app.database import get_db
-from app.models import User, UserType
+from app.models import UserType
 from app.schemas import TokenData
+from app.principal_cache import principal_cache, Principal
 
 # Password hashing - use argon2 due to bcrypt/passlib compatibility issues
 pwd_context = CryptContext(schemes=["argon2", "bcrypt"], deprecated="auto")
@@ -45,11 +45,39 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
+def create_scoped_token(access_token: str, scope: str, expires_delta: timedelta) -> str:
+    """
+    Short-lived token for one purpose (e.g. opening an EventSource, which can
+    only authenticate through the URL). It carries the access token's expiry
+    as session_exp so whatever it opens can end with the session.
+    """
+    payload = jwt.decode(access_token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    return create_access_token(
+        {"sub": payload["sub"], "scope": scope, "session_exp": payload["exp"]},
+        expires_delta=expires_delta
+    )
+
+
+def decode_scoped_token(token: str, scope: str) -> dict:
+    """Claims of a valid, unexpired token issued for this scope (401 otherwise)"""
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        payload = {}
+    if payload.get("scope") != scope or not payload.get("sub") or not payload.get("session_exp"):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return payload
+
+
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: AsyncSession = Depends(get_db)
-) -> User:
-    """Get current authenticated user"""
+) -> Principal:
+    """Get current authenticated user (cached principal, see app.principal_cache)"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -59,28 +87,28 @@ async def get_current_user(
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         username: str = payload.get("sub")
-        if username is None:
+        # Scoped tokens (see create_scoped_token) are not API credentials
+        if username is None or payload.get("scope") is not None:
             raise credentials_exception
         token_data = TokenData(username=username)
     except JWTError:
         raise credentials_exception
     
-    result = await db.execute(select(User).filter(User.username == token_data.username))
-    user = result.scalar_one_or_none()
+    user = await principal_cache.get(db, token_data.username)
     
     if user is None:
         raise credentials_exception
     return user
 
 
-async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
+async def get_current_active_user(current_user: Principal = Depends(get_current_user)) -> Principal:
     """Get current active user"""
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
 
-async def require_admin(current_user: User = Depends(get_current_active_user)) -> User:
+async def require_admin(current_user: Principal = Depends(get_current_active_user)) -> Principal:
     """Require admin role"""
     if current_user.user_type != UserType.ADMIN:
         raise HTTPException(
@@ -90,7 +118,7 @@ async def require_admin(current_user: User = Depends(get_current_active_user)) -
     return current_user
 
 
-async def require_manager(current_user: User = Depends(get_current_active_user)) -> User:
+async def require_manager(current_user: Principal = Depends(get_current_active_user)) -> Principal:
     """Require manager role"""
     if current_user.user_type not in [UserType.ADMIN, UserType.MANAGER]:
         raise HTTPException(
@@ -100,7 +128,7 @@ async def require_manager(current_user: User = Depends(get_current_active_user))
     return current_user
 
 
-async def require_employee(current_user: User = Depends(get_current_active_user)) -> User:
+async def require_employee(current_user: Principal = Depends(get_current_active_user)) -> Principal:
     """Require employee role"""
     if current_user.user_type != UserType.EMPLOYEE:
         raise HTTPException(
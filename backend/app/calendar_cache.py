@@ -0,0 +1,140 @@
+"""
+Calendar Responses with HTTP Caching
+
+Builds the public calendar payloads (month holidays, week info, full year)
+once per argument set from the precomputed jp_calendar tables and serves
+them with a strong ETag and a long Cache-Control lifetime. Holiday data only
+changes with the holidays library, so a changed payload means a new ETag.
+Requests whose If-None-Match matches get a bodiless 304.
+"""
+
+import hashlib
+import json
+from calendar import monthrange
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+
+from app.config import settings
+from app.holidays_jp import jp_calendar
+
+
+def calendar_cache_control() -> str:
+    """Cache-Control for data that only changes with the holidays library"""
+    max_age = settings.CALENDAR_CACHE_MAX_AGE_SECONDS
+    return f"public, max-age={max_age}, stale-while-revalidate={max_age}"
+
+
+# Per-user data: cache, but revalidate with the ETag on every use
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+
+
+def compute_etag(payload: Dict) -> str:
+    """Strong ETag of a JSON payload (hash of its canonical serialization)"""
+    body = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return '"' + hashlib.sha256(body.encode('utf-8')).hexdigest()[:32] + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True when If-None-Match lists this ETag (weak comparison, as RFC 9110 requires) or *"""
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(',')]
+    return '*' in tags or etag in tags or f"W/{etag}" in tags
+
+
+def conditional_response(request: Request, payload: Dict, cache_control: str, etag: str = None) -> Response:
+    """200 with the payload, or 304 when the client already has this version"""
+    etag = etag or compute_etag(payload)
+    headers = {'ETag': etag, 'Cache-Control': cache_control}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=payload, headers=headers)
+
+
+# ===== Payloads (memoized, with their ETag) =====
+
+def week_start_for(year: int, week_number: int) -> date:
+    """Monday of the calendar's week_number-th week of the year (week 1 contains Jan 1)"""
+    jan_1 = date(year, 1, 1)
+    week_start = jan_1 + timedelta(weeks=week_number - 1)
+    return week_start - timedelta(days=week_start.weekday())
+
+
+def _holiday_entries(start_date: date, end_date: date) -> Dict[str, Dict]:
+    """Weekends and holidays keyed by ISO date"""
+    holidays = {}
+    for non_working_date in jp_calendar.get_non_working_days_in_range(start_date, end_date):
+        holiday_name = jp_calendar.get_holiday_name(non_working_date)
+        is_holiday = holiday_name is not None
+        holidays[non_working_date.isoformat()] = {
+            'date': non_working_date.isoformat(),
+            'day_name': non_working_date.strftime('%A'),
+            'is_weekend': non_working_date.weekday() >= 5,
+            'is_holiday': is_holiday,
+            'holiday_name': holiday_name,
+            'type': 'holiday' if is_holiday else 'weekend'
+        }
+    return holidays
+
+
+def _week_payload(week_start: date) -> Dict:
+    week_info = jp_calendar.get_week_info(week_start)
+    return {
+        'week_start': week_info['week_start'].isoformat(),
+        'week_end': week_info['week_end'].isoformat(),
+        'days': [
+            {
+                'date': day['date'].isoformat(),
+                'day_name': day['day_name'],
+                'is_weekend': day['is_weekend'],
+                'is_holiday': day['is_holiday'],
+                'holiday_name': day['holiday_name'],
+                'is_non_working': day['is_non_working']
+            }
+            for day in week_info['days']
+        ],
+        'weekend_count': week_info['weekend_count'],
+        'holiday_count': week_info['holiday_count'],
+        'weekday_holiday_count': week_info['weekday_holiday_count'],
+        'required_shifts': week_info['required_shifts']
+    }
+
+
+@lru_cache(maxsize=512)
+def month_holidays(year: int, month: int) -> Tuple[Dict, str]:
+    """(payload, etag) of /calendar/holidays"""
+    _, days_in_month = monthrange(year, month)
+    payload = {
+        'year': year,
+        'month': month,
+        'holidays': _holiday_entries(date(year, month, 1), date(year, month, days_in_month))
+    }
+    return payload, compute_etag(payload)
+
+
+@lru_cache(maxsize=1024)
+def week_info(year: int, week_number: int) -> Tuple[Dict, str]:
+    """(payload, etag) of /calendar/week-info"""
+    payload = _week_payload(week_start_for(year, week_number))
+    return payload, compute_etag(payload)
+
+
+@lru_cache(maxsize=32)
+def year_calendar(year: int) -> Tuple[Dict, str]:
+    """(payload, etag) of /calendar/year: every weekend and holiday plus every week's info"""
+    weeks: List[Dict] = []
+    week_number = 1
+    while week_start_for(year, week_number).year <= year:
+        weeks.append({'week_number': week_number, **_week_payload(week_start_for(year, week_number))})
+        week_number += 1
+    payload = {
+        'year': year,
+        'holidays': _holiday_entries(date(year, 1, 1), date(year, 12, 31)),
+        'weeks': weeks
+    }
+    return payload, compute_etag(payload)
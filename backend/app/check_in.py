@@ -0,0 +1,183 @@
+"""
+Employee Check-In
+
+Check-in path sized for the shift-start burst: the employee, any open
+check-in and today's approved leave / off-day schedule are resolved in one
+query, today's shift comes from the cached daily roster (a dict lookup, with a
+database fallback when the roster has none), then the CheckInOut row and the
+Attendance upsert are written in one transaction with a single commit. The
+committed check-in is pushed to the department's live attendance board.
+"""
+
+from datetime import date, datetime, time
+from typing import Dict, Optional
+
+from sqlalchemy import exists, insert, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Employee, CheckInOut, Attendance, Schedule, LeaveRequest, LeaveStatus
+from app.roster_cache import roster_cache, employee_day_schedule, OFF_DAY_STATUSES
+from app.attendance_board import publish_check_in_change
+
+# Shift start assumed when the schedule has no start time
+DEFAULT_START_TIME = time(9, 0)
+
+
+class CheckInRejected(Exception):
+    """The employee cannot check in now (no employee record, on leave, no shift, already in)"""
+
+
+def check_in_status(start_time: Optional[str], today: date, now: datetime) -> str:
+    """on-time / slightly-late (up to 15 minutes) / late against the shift start"""
+    try:
+        scheduled_time = datetime.strptime(start_time, "%H:%M").time() if start_time else DEFAULT_START_TIME
+    except (ValueError, TypeError):
+        # If we can't parse the time, just mark as on-time
+        return "on-time"
+
+    diff_minutes = (now - datetime.combine(today, scheduled_time)).total_seconds() / 60
+    if diff_minutes <= 0:
+        return "on-time"
+    if diff_minutes <= 15:
+        return "slightly-late"
+    return "late"
+
+
+def attendance_check_in_upsert(employee_id: int, schedule_id: int, today: date,
+                               in_time: str, status: str, now: datetime):
+    """
+    One statement that records the check-in on today's Attendance row: fills
+    in_time on an existing row that has none, or inserts the row when there
+    is none. attendance has no unique key on (employee_id, date), so this is a
+    data-modifying CTE rather than INSERT ... ON CONFLICT. INSERT ... SELECT
+    skips the model's Python-side defaults, so every defaulted column is listed.
+    """
+    fill_existing = (
+        update(Attendance)
+        .where(
+            Attendance.employee_id == employee_id,
+            Attendance.date == today,
+            Attendance.in_time.is_(None)
+        )
+        .values(in_time=in_time, status=status, updated_at=now)
+        .returning(Attendance.id)
+        .cte('fill_existing')
+    )
+    no_row_today = ~exists().where(Attendance.employee_id == employee_id, Attendance.date == today)
+    return (
+        insert(Attendance)
+        .from_select(
+            ['employee_id', 'schedule_id', 'date', 'in_time', 'status',
+             'worked_hours', 'night_hours', 'overtime_hours', 'break_minutes', 'created_at', 'updated_at'],
+            select(
+                literal(employee_id), literal(schedule_id), literal(today), literal(in_time),
+                literal(status), literal(0.0), literal(0.0), literal(0.0), literal(0),
+                literal(now), literal(now)
+            ).where(no_row_today)
+        )
+        .add_cte(fill_existing)
+    )
+
+
+async def check_in_employee(db: AsyncSession, user_id: int, location: Optional[str] = None) -> Dict:
+    """
+    Check in the employee of a user for today's shift.
+
+    Returns: the committed check-in as a CheckInResponse payload
+    Raises: CheckInRejected with the message for the client
+    """
+    today = date.today()
+
+    open_check_in = (
+        select(CheckInOut.id)
+        .where(
+            CheckInOut.employee_id == Employee.id,
+            CheckInOut.date == today,
+            CheckInOut.check_out_time.is_(None)
+        )
+        .limit(1)
+        .scalar_subquery()
+    )
+    # Leave and off days are read from the database in the same round trip: a
+    # leave approved in another worker process must be enforced at once
+    approved_leave = (
+        select(LeaveRequest.leave_type)
+        .where(
+            LeaveRequest.employee_id == Employee.id,
+            LeaveRequest.start_date <= today,
+            LeaveRequest.end_date >= today,
+            LeaveRequest.status == LeaveStatus.APPROVED
+        )
+        .order_by(LeaveRequest.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+    off_day = exists().where(
+        Schedule.employee_id == Employee.id,
+        Schedule.date == today,
+        Schedule.status.in_(OFF_DAY_STATUSES)
+    )
+    result = await db.execute(
+        select(
+            Employee, open_check_in.label('open_check_in_id'),
+            approved_leave.label('leave_type'), off_day.label('off_day')
+        ).where(Employee.user_id == user_id)
+    )
+    row = result.first()
+
+    if row is None:
+        raise CheckInRejected(f"Employee record not found for user_id: {user_id}")
+    employee, open_check_in_id, leave_type, is_off_day = row
+
+    if leave_type:
+        raise CheckInRejected(f"You are on approved {leave_type} today. You cannot check in.")
+    if is_off_day:
+        raise CheckInRejected("You are on leave/comp-off today. You cannot check in.")
+    if open_check_in_id:
+        raise CheckInRejected("Already checked in today. Please check out first.")
+
+    roster = await roster_cache.get(employee.department_id, today)
+    schedule = roster.entry(employee.id)['schedule']
+    if schedule is None:
+        # The roster may predate a shift created in another worker process
+        schedule = await employee_day_schedule(db, employee.id, today)
+        if schedule is not None:
+            roster_cache.apply({('employee', employee.id, today, today)})
+    if schedule is None:
+        raise CheckInRejected(
+            f"No scheduled shift for today. Please contact your manager. (Employee: {employee.id}, Date: {today})"
+        )
+
+    now = datetime.now()
+    status_val = check_in_status(schedule['start_time'], today, now)
+
+    check_in = CheckInOut(
+        employee_id=employee.id,
+        schedule_id=schedule['id'],
+        date=today,
+        check_in_time=now,
+        check_in_status=status_val,
+        location=location
+    )
+    db.add(check_in)
+    await db.flush()
+    await db.execute(attendance_check_in_upsert(
+        employee.id, schedule['id'], today, now.strftime("%H:%M"), status_val, datetime.utcnow()
+    ))
+    await db.commit()
+    publish_check_in_change(
+        'check_in', employee.department_id, employee.id, f"{employee.first_name} {employee.last_name}",
+        now, None, status_val, today
+    )
+
+    return {
+        'id': check_in.id,
+        'employee_id': employee.id,
+        'schedule_id': schedule['id'],
+        'date': today,
+        'check_in_time': now,
+        'check_out_time': None,
+        'check_in_status': status_val,
+        'employee': employee,
+        'schedule': schedule,
+    }
@@ -15,6 +15,36 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 1440  # 24 hours
     
+    # Schedule solver
+    SOLVER_POOL_WORKERS: int = 0  # CP-SAT solve processes (0 = half the CPU cores)
+    SOLVER_MAX_THREADS: int = 0  # CP-SAT search threads shared by all solves (0 = CPU cores)
+    SOLVER_MAX_WORKERS_PER_SOLVE: int = 8  # Upper bound on search threads for a single solve
+    SOLVER_TIME_LIMIT_SECONDS: int = 90  # Time budget per solve when nothing is queued
+    SOLVER_MIN_TIME_LIMIT_SECONDS: int = 10  # Floor for the budget when solves are queued
+    SOLVER_ACCEPT_GAP: float = 0.0  # Stop once within this relative optimality gap (0 = wait for OPTIMAL)
+    SOLVER_STALL_SECONDS: float = 0.0  # Stop when the best solution has not improved for this long (0 = off)
+    ROLLING_HORIZON_AFTER_DAYS: int = 42  # Longer ranges are solved in rolling windows (0 = never)
+    ROLLING_HORIZON_WINDOW_DAYS: int = 7  # Days per rolling-horizon window
+    SOLUTION_CACHE_MAX_ENTRIES: int = 500  # Cached solver results kept (0 = cache disabled)
+    SOLUTION_CACHE_TTL_HOURS: int = 168  # Cached results expire after a week
+
+    # Japanese calendar
+    CALENDAR_YEARS_BEFORE: int = 2  # Years before the current one precomputed at startup
+    CALENDAR_YEARS_AFTER: int = 3  # Years after the current one precomputed at startup
+    CALENDAR_CACHE_MAX_AGE_SECONDS: int = 604800  # Client cache lifetime of holiday / week-info responses
+
+    # Daily roster cache
+    ROSTER_CACHE_TTL_SECONDS: int = 120  # Max age of a cached daily roster (bounds staleness across workers)
+    ROSTER_PREWARM_MINUTES: int = 30  # Warm today's rosters this long before the first shift starts
+
+    # Live attendance stream
+    EVENT_BUS_BACKEND: str = "memory"  # Pub/sub backend for live streams ('memory' = this process only)
+    ATTENDANCE_STREAM_HEARTBEAT_SECONDS: int = 15  # Keep-alive interval of the live attendance stream
+    ATTENDANCE_STREAM_TOKEN_SECONDS: int = 60  # Lifetime of the scoped token that opens the stream
+
+    # Authenticated principal cache
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 30  # Max age of a cached authenticated user (bounds staleness across workers)
+    
     # CORS - Allow all localhost ports for development
     CORS_ORIGINS: list = [
         "http://localhost:3000", 
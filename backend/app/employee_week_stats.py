@@ -0,0 +1,349 @@
+"""
+Employee Week Stats
+
+Read model of per-employee ISO-week counters keyed by (employee_id,
+week_start): Mon-Fri coverage, Sat-Sun regular shifts, worked hours, leave
+days, the longest run of consecutive days and per-day occupancy and hours.
+Rows are recomputed in the same transaction as the schedule writes that
+affect them - ORM inserts, updates and deletes are picked up by session flush
+events, and the bulk writers (generation, bulk edits) refresh the weeks they
+touched explicitly. The recount holds a row lock on each week it refreshes, so
+concurrent writers to the same employee-week serialize instead of overwriting
+each other's counters. Rule checks read one row per employee-week by primary key
+instead of scanning schedules.
+
+Rebuild from scratch: python -m app.employee_week_stats
+"""
+
+import asyncio
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, event, inspect, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models import Schedule, EmployeeWeekStats
+from app.scheduling_context import (
+    week_start_of, longest_consecutive_run,
+    WORK_STATUSES, LEAVE_STATUSES, WEEKDAY_COVERAGE_STATUSES, WEEKEND_REGULAR_STATUSES
+)
+
+
+# Statuses that occupy a day for the consecutive-day limit
+CONSECUTIVE_STATUSES = ('scheduled', 'leave', 'comp_off_taken', 'leave_half_morning', 'leave_half_afternoon')
+
+# Schedule columns that feed the counters; other changes do not touch the read model
+TALLY_FIELDS = ('employee_id', 'date', 'status', 'start_time', 'end_time')
+
+STAT_COLUMNS = (
+    'weekday_coverage', 'weekend_regular', 'work_hours', 'leave_days',
+    'max_consecutive', 'day_occupancy', 'day_hours', 'updated_at'
+)
+
+# Keys / rows per statement
+BATCH_SIZE = 1000
+
+# session.info key for weeks touched by the pending flush
+_PENDING_KEY = 'employee_week_stats_keys'
+
+WeekKey = Tuple[int, date]
+
+
+def span_hours(start_time: Optional[str], end_time: Optional[str]) -> float:
+    """Hours between two HH:MM times (wrapping past midnight); 0 when malformed"""
+    try:
+        start_h, start_m = map(int, start_time.split(':'))
+        end_h, end_m = map(int, end_time.split(':'))
+    except (AttributeError, ValueError):
+        return 0.0
+    start_decimal = start_h + start_m / 60
+    end_decimal = end_h + end_m / 60
+    return end_decimal - start_decimal if end_decimal > start_decimal else 24 - start_decimal + end_decimal
+
+
+def empty_week() -> Dict:
+    return {
+        'weekday_coverage': 0,
+        'weekend_regular': 0,
+        'work_hours': 0.0,
+        'leave_days': 0.0,
+        'day_occupancy': [0] * 7,
+        'day_hours': [0.0] * 7,
+    }
+
+
+def week_from_row(row: Optional[EmployeeWeekStats]) -> Dict:
+    """Mutable counters of a stats row (an empty week when there is no row)"""
+    if row is None:
+        return empty_week()
+    return {
+        'weekday_coverage': row.weekday_coverage or 0,
+        'weekend_regular': row.weekend_regular or 0,
+        'work_hours': row.work_hours or 0.0,
+        'leave_days': row.leave_days or 0.0,
+        'day_occupancy': list(row.day_occupancy or [0] * 7),
+        'day_hours': list(row.day_hours or [0.0] * 7),
+    }
+
+
+def tally(week: Dict, day: date, status: str, start_time: Optional[str],
+          end_time: Optional[str], sign: int = 1) -> None:
+    """Add (sign=1) or remove (sign=-1) one schedule row's contribution to a week"""
+    weekday = day.weekday()
+    if weekday < 5:
+        if status in WEEKDAY_COVERAGE_STATUSES:
+            week['weekday_coverage'] += sign
+    elif status in WEEKEND_REGULAR_STATUSES:
+        week['weekend_regular'] += sign
+    if status in WORK_STATUSES:
+        hours = span_hours(start_time, end_time)
+        week['work_hours'] += sign * hours
+        week['day_hours'][weekday] += sign * hours
+    if status in LEAVE_STATUSES:
+        week['leave_days'] += sign * (0.5 if status.startswith('leave_half') else 1)
+    if status in CONSECUTIVE_STATUSES:
+        week['day_occupancy'][weekday] += sign
+
+
+def max_consecutive(week: Dict, week_start: date, extra_day: Optional[date] = None) -> int:
+    """Longest run of occupied days in the week, optionally with one more day occupied"""
+    days = [week_start + timedelta(days=i) for i, count in enumerate(week['day_occupancy']) if count > 0]
+    if extra_day is not None:
+        days.append(extra_day)
+    return longest_consecutive_run(days)
+
+
+def _is_empty(week: Dict) -> bool:
+    return not (week['weekday_coverage'] or week['weekend_regular'] or week['leave_days']
+                or any(week['day_occupancy']) or any(week['day_hours']))
+
+
+def _chunks(items: List, size: int) -> Iterable[List]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+# ===== Recompute (synchronous, on the session's connection) =====
+
+def _load_weeks(connection, keys: Set[WeekKey]) -> Dict[WeekKey, Dict]:
+    """Count the schedules of the given employee-weeks, one range query per week"""
+    weeks = {key: empty_week() for key in keys}
+    employees_by_week = defaultdict(set)
+    for employee_id, week_start in keys:
+        employees_by_week[week_start].add(employee_id)
+
+    for week_start, employee_ids in employees_by_week.items():
+        for ids in _chunks(sorted(employee_ids), BATCH_SIZE):
+            rows = connection.execute(
+                select(Schedule.employee_id, Schedule.date, Schedule.status,
+                       Schedule.start_time, Schedule.end_time)
+                .where(
+                    Schedule.employee_id.in_(ids),
+                    Schedule.date >= week_start,
+                    Schedule.date <= week_start + timedelta(days=6)
+                )
+            )
+            for employee_id, sched_date, status, start_time, end_time in rows:
+                tally(weeks[(employee_id, week_start)], sched_date, status, start_time, end_time)
+    return weeks
+
+
+def _store_weeks(connection, weeks: Dict[WeekKey, Dict]) -> int:
+    """Upsert non-empty weeks and drop the rows of weeks that no longer have schedules"""
+    now = datetime.utcnow()
+    rows, empty = [], []
+    for (employee_id, week_start), week in weeks.items():
+        if _is_empty(week):
+            empty.append((employee_id, week_start))
+            continue
+        rows.append({
+            'employee_id': employee_id,
+            'week_start': week_start,
+            'weekday_coverage': week['weekday_coverage'],
+            'weekend_regular': week['weekend_regular'],
+            'work_hours': round(week['work_hours'], 2),
+            'leave_days': week['leave_days'],
+            'max_consecutive': max_consecutive(week, week_start),
+            'day_occupancy': week['day_occupancy'],
+            'day_hours': [round(h, 2) for h in week['day_hours']],
+            'updated_at': now,
+        })
+
+    key_columns = tuple_(EmployeeWeekStats.employee_id, EmployeeWeekStats.week_start)
+    for batch in _chunks(empty, BATCH_SIZE):
+        connection.execute(delete(EmployeeWeekStats).where(key_columns.in_(batch)))
+    for batch in _chunks(rows, BATCH_SIZE):
+        stmt = pg_insert(EmployeeWeekStats).values(batch)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['employee_id', 'week_start'],
+            set_={column: stmt.excluded[column] for column in STAT_COLUMNS}
+        )
+        connection.execute(stmt)
+    return len(rows)
+
+
+def _lock_weeks(connection, keys: Set[WeekKey]) -> None:
+    """
+    Row-lock the stats rows of the given employee-weeks (creating missing ones)
+    until the transaction ends. A concurrent transaction writing the same week
+    waits here and recounts after this one commits, so it sees these schedule
+    rows instead of overwriting the counters with a snapshot that lacks them.
+    Keys are locked in sorted order to avoid deadlocks.
+    """
+    key_columns = tuple_(EmployeeWeekStats.employee_id, EmployeeWeekStats.week_start)
+    missing = sorted(keys)
+    # A row deleted (emptied week) by the transaction we waited for is not locked: retry
+    while missing:
+        for batch in _chunks(missing, BATCH_SIZE):
+            connection.execute(
+                pg_insert(EmployeeWeekStats)
+                .values([{'employee_id': employee_id, 'week_start': week_start}
+                         for employee_id, week_start in batch])
+                .on_conflict_do_nothing(index_elements=['employee_id', 'week_start'])
+            )
+        locked = set()
+        for batch in _chunks(missing, BATCH_SIZE):
+            rows = connection.execute(
+                select(EmployeeWeekStats.employee_id, EmployeeWeekStats.week_start)
+                .where(key_columns.in_(batch))
+                .order_by(EmployeeWeekStats.employee_id, EmployeeWeekStats.week_start)
+                .with_for_update()
+            )
+            locked.update((employee_id, week_start) for employee_id, week_start in rows)
+        missing = [key for key in missing if key not in locked]
+
+
+def refresh_weeks_sync(connection, keys: Iterable[WeekKey]) -> int:
+    """Recompute the given employee-weeks from schedules; returns rows written"""
+    keys = {key for key in keys if key[0] is not None and key[1] is not None}
+    if not keys:
+        return 0
+    # Lock first: the recount must see every committed write to these weeks
+    _lock_weeks(connection, keys)
+    return _store_weeks(connection, _load_weeks(connection, keys))
+
+
+async def refresh_weeks(db: AsyncSession, keys: Iterable[WeekKey]) -> int:
+    """Recompute the given employee-weeks inside the session's transaction"""
+    keys = set(keys)
+    if not keys:
+        return 0
+    return await db.run_sync(lambda session: refresh_weeks_sync(session.connection(), keys))
+
+
+async def schedule_week_keys(db: AsyncSession, schedule_ids: Iterable[int]) -> Set[WeekKey]:
+    """Employee-weeks of existing schedules (call before bulk UPDATE / DELETE statements)"""
+    keys = set()
+    for ids in _chunks(sorted(set(schedule_ids)), BATCH_SIZE):
+        result = await db.execute(
+            select(Schedule.employee_id, Schedule.date).where(Schedule.id.in_(ids))
+        )
+        keys.update((employee_id, week_start_of(sched_date)) for employee_id, sched_date in result.all())
+    return keys
+
+
+async def load_weeks(db: AsyncSession, keys: Iterable[WeekKey]) -> Dict[WeekKey, Dict]:
+    """Counters for the given employee-weeks by primary key (empty weeks have no row)"""
+    keys = sorted(set(keys))
+    weeks = {key: empty_week() for key in keys}
+    key_columns = tuple_(EmployeeWeekStats.employee_id, EmployeeWeekStats.week_start)
+    for batch in _chunks(keys, BATCH_SIZE):
+        result = await db.execute(select(EmployeeWeekStats).where(key_columns.in_(batch)))
+        for row in result.scalars().all():
+            weeks[(row.employee_id, row.week_start)] = week_from_row(row)
+    return weeks
+
+
+# ===== ORM write tracking =====
+
+def _touched_keys(obj: Schedule) -> Set[WeekKey]:
+    """Current and previous employee-week of a schedule in the unit of work"""
+    state = inspect(obj)
+    employee_ids = {obj.employee_id, *(state.attrs.employee_id.history.deleted or ())}
+    dates = {obj.date, *(state.attrs.date.history.deleted or ())}
+    return {
+        (employee_id, week_start_of(sched_date))
+        for employee_id in employee_ids for sched_date in dates
+        if employee_id is not None and sched_date is not None
+    }
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_week_keys(session, flush_context, instances):
+    keys = session.info.setdefault(_PENDING_KEY, set())
+    for obj in session.new:
+        if isinstance(obj, Schedule):
+            keys |= _touched_keys(obj)
+    for obj in session.dirty:
+        if isinstance(obj, Schedule):
+            state = inspect(obj)
+            if any(state.attrs[field].history.has_changes() for field in TALLY_FIELDS):
+                keys |= _touched_keys(obj)
+    for obj in session.deleted:
+        if isinstance(obj, Schedule):
+            keys |= _touched_keys(obj)
+
+
+@event.listens_for(Session, 'after_flush')
+def _refresh_week_keys(session, flush_context):
+    keys = session.info.pop(_PENDING_KEY, None)
+    if keys:
+        refresh_weeks_sync(session.connection(), keys)
+
+
+# ===== Rebuild =====
+
+async def rebuild_week_stats(db: AsyncSession) -> Dict:
+    """
+    Recompute the whole read model from schedules in one transaction.
+
+    Returns: {'schedules', 'weeks', 'seconds'}
+    """
+    started = time.perf_counter()
+
+    def rebuild(session):
+        connection = session.connection()
+        connection.execute(delete(EmployeeWeekStats))
+        weeks = defaultdict(empty_week)
+        schedules = 0
+        rows = connection.execute(
+            select(Schedule.employee_id, Schedule.date, Schedule.status,
+                   Schedule.start_time, Schedule.end_time)
+        )
+        for employee_id, sched_date, status, start_time, end_time in rows:
+            tally(weeks[(employee_id, week_start_of(sched_date))], sched_date, status, start_time, end_time)
+            schedules += 1
+        return schedules, _store_weeks(connection, dict(weeks))
+
+    schedules, weeks = await db.run_sync(rebuild)
+    await db.commit()
+    return {'schedules': schedules, 'weeks': weeks, 'seconds': round(time.perf_counter() - started, 3)}
+
+
+async def ensure_week_stats(db: AsyncSession) -> Optional[Dict]:
+    """Build the read model if it is empty but schedules exist (first start after upgrade)"""
+    has_stats = (await db.execute(select(EmployeeWeekStats.employee_id).limit(1))).first()
+    has_schedules = (await db.execute(select(Schedule.id).limit(1))).first()
+    if has_stats or not has_schedules:
+        return None
+    return await rebuild_week_stats(db)
+
+
+async def _main():
+    from app.database import async_session_maker, engine
+
+    print("🔄 Rebuilding employee_week_stats from schedules...")
+    async with engine.begin() as conn:
+        await conn.run_sync(lambda sync_conn: EmployeeWeekStats.__table__.create(sync_conn, checkfirst=True))
+    async with async_session_maker() as db:
+        result = await rebuild_week_stats(db)
+    print(f"✅ {result['weeks']} employee-weeks from {result['schedules']} schedules in {result['seconds']}s")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
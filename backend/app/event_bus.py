@@ -0,0 +1,78 @@
+"""
+Event Bus
+
+Small publish / subscribe bus for pushing server events to long-lived client
+streams. Channels are plain hashable keys (e.g. a department id); each
+subscriber gets its own bounded queue. A subscriber that falls behind has its
+queue replaced by a single RESYNC event, telling it to reload its state
+instead of replaying a backlog.
+
+The backend is chosen with EVENT_BUS_BACKEND. 'memory' delivers within this
+process only; a backend shared by several workers (Redis pub/sub, Postgres
+LISTEN/NOTIFY) can be registered in EVENT_BUS_BACKENDS as long as it provides
+the same publish() / subscribe() pair.
+"""
+
+import asyncio
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Hashable, Set
+
+from app.config import settings
+
+
+# Sent in place of a backlog the subscriber could not keep up with
+RESYNC = {'type': 'resync'}
+
+
+class InProcessEventBus:
+    """Delivers events to the subscribers of this process"""
+
+    def __init__(self, queue_size: int = 256):
+        self.queue_size = queue_size
+        self._subscribers: Dict[Hashable, Set[asyncio.Queue]] = defaultdict(set)
+
+    def publish(self, channel: Hashable, event: Dict) -> int:
+        """Queue an event for every subscriber of a channel (never blocks); returns the subscriber count"""
+        queues = self._subscribers.get(channel)
+        if not queues:
+            return 0
+        for queue in queues:
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC)
+        return len(queues)
+
+    @asynccontextmanager
+    async def subscribe(self, channel: Hashable) -> AsyncIterator[asyncio.Queue]:
+        """Queue receiving the channel's events for the duration of the block"""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[channel].add(queue)
+        try:
+            yield queue
+        finally:
+            self._subscribers[channel].discard(queue)
+            if not self._subscribers[channel]:
+                del self._subscribers[channel]
+
+    def subscriber_count(self, channel: Hashable) -> int:
+        return len(self._subscribers.get(channel, ()))
+
+
+EVENT_BUS_BACKENDS = {
+    'memory': InProcessEventBus,
+}
+
+
+def create_event_bus(backend: str = None):
+    backend = backend or settings.EVENT_BUS_BACKEND
+    if backend not in EVENT_BUS_BACKENDS:
+        raise ValueError(f"Unknown event bus backend '{backend}'. Available: {', '.join(EVENT_BUS_BACKENDS)}")
+    return EVENT_BUS_BACKENDS[backend]()
+
+
+# Global instance
+event_bus = create_event_bus()
@@ -0,0 +1,274 @@
+"""
+Background Schedule Generation Jobs
+
+POST /schedules/generate?run_async=true stores a ScheduleGenerationJob row and
+returns its id immediately; a worker loop running inside every uvicorn process
+claims queued jobs, runs generate_department_schedules() and writes progress,
+feedback and the final result back to the row. Because all state lives in the
+database, any uvicorn worker can answer GET /schedules/generate/{job_id}, and a
+job whose worker died (stale heartbeat) is re-queued and picked up again.
+"""
+
+import asyncio
+import os
+import socket
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import async_session_maker
+from app.models import ScheduleGenerationJob
+from app.schedule_engine import generate_department_schedules
+
+
+POLL_INTERVAL_SECONDS = 5
+HEARTBEAT_INTERVAL_SECONDS = 30
+STALE_AFTER_SECONDS = 300
+PROGRESS_WRITE_INTERVAL_SECONDS = 1.0
+
+
+async def create_job(db: AsyncSession, department_id: int, requested_by: Optional[int],
+                     start_date: date, end_date: date, regenerate: bool, engine: str,
+                     repair: bool = False, dry_run: bool = False,
+                     accept_gap: Optional[float] = None,
+                     stall_seconds: Optional[float] = None) -> ScheduleGenerationJob:
+    """Queue a generation job and wake the local worker"""
+    job = ScheduleGenerationJob(
+        id=str(uuid.uuid4()),
+        department_id=department_id,
+        requested_by=requested_by,
+        start_date=start_date,
+        end_date=end_date,
+        regenerate=regenerate,
+        engine=engine,
+        repair=repair,
+        dry_run=dry_run,
+        accept_gap=accept_gap,
+        stall_seconds=stall_seconds,
+        status='queued',
+        progress=0,
+        feedback=[],
+        overtime_warnings=[],
+        schedules_created=0
+    )
+    db.add(job)
+    await db.commit()
+    generation_worker.wake()
+    return job
+
+
+def job_to_response(job: ScheduleGenerationJob) -> Dict:
+    """Serialize a job row for the polling endpoint"""
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "progress": job.progress or 0,
+        "start_date": job.start_date,
+        "end_date": job.end_date,
+        "engine": job.engine,
+        "repair": bool(job.repair),
+        "dry_run": bool(job.dry_run),
+        "feedback": job.feedback or [],
+        "overtime_warnings": job.overtime_warnings or [],
+        "schedules_created": job.schedules_created or 0,
+        "result": job.result,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at
+    }
+
+
+class GenerationJobWorker:
+    """Polls the jobs table and runs claimed jobs one at a time"""
+
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+
+    def start(self):
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+            print(f"✓ Schedule generation worker {self.worker_id} started")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def wake(self):
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await self._requeue_stale_jobs()
+                # Drain the queue before sleeping again
+                while await self._run_next_job():
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[DEBUG] Generation worker error: {e}", flush=True)
+
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def _requeue_stale_jobs(self):
+        """Put jobs back in the queue whose worker stopped heartbeating"""
+        cutoff = datetime.utcnow() - timedelta(seconds=STALE_AFTER_SECONDS)
+        async with async_session_maker() as db:
+            result = await db.execute(
+                update(ScheduleGenerationJob)
+                .where(
+                    ScheduleGenerationJob.status == 'running',
+                    ScheduleGenerationJob.heartbeat_at < cutoff
+                )
+                .values(status='queued', worker_id=None, progress=0)
+            )
+            await db.commit()
+            if result.rowcount:
+                print(f"[DEBUG] Re-queued {result.rowcount} stale generation job(s)", flush=True)
+
+    async def _claim_next_job(self) -> Optional[ScheduleGenerationJob]:
+        async with async_session_maker() as db:
+            candidates = await db.execute(
+                select(ScheduleGenerationJob.id)
+                .where(ScheduleGenerationJob.status == 'queued')
+                .order_by(ScheduleGenerationJob.created_at)
+                .limit(5)
+            )
+            for job_id in candidates.scalars().all():
+                now = datetime.utcnow()
+                # Only one worker wins the queued -> running transition
+                claimed = await db.execute(
+                    update(ScheduleGenerationJob)
+                    .where(ScheduleGenerationJob.id == job_id, ScheduleGenerationJob.status == 'queued')
+                    .values(status='running', worker_id=self.worker_id, started_at=now,
+                            heartbeat_at=now, progress=0, feedback=[], error=None)
+                )
+                await db.commit()
+                if claimed.rowcount == 1:
+                    job = await db.get(ScheduleGenerationJob, job_id)
+                    return job
+        return None
+
+    async def _run_next_job(self) -> bool:
+        job = await self._claim_next_job()
+        if job is None:
+            return False
+
+        print(f"[DEBUG] Worker {self.worker_id} running generation job {job.id} "
+              f"(department {job.department_id}, {job.start_date} to {job.end_date}, engine={job.engine})", flush=True)
+
+        heartbeat = asyncio.create_task(self._heartbeat(job.id))
+        reporter = _ProgressReporter(job.id, self.worker_id)
+        try:
+            async with async_session_maker() as db:
+                result = await generate_department_schedules(
+                    db, job.department_id, job.start_date, job.end_date,
+                    regenerate=job.regenerate, engine=job.engine,
+                    progress=reporter.report, repair=bool(job.repair),
+                    dry_run=bool(job.dry_run), accept_gap=job.accept_gap,
+                    stall_seconds=job.stall_seconds
+                )
+            await self._finish(job.id, result)
+        except Exception as e:
+            print(f"[DEBUG] Generation job {job.id} failed: {e}", flush=True)
+            await self._fail(job.id, str(e), reporter.feedback)
+        finally:
+            heartbeat.cancel()
+        return True
+
+    async def _heartbeat(self, job_id: str):
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL_SECONDS)
+            try:
+                async with async_session_maker() as db:
+                    await db.execute(
+                        update(ScheduleGenerationJob)
+                        .where(ScheduleGenerationJob.id == job_id, ScheduleGenerationJob.worker_id == self.worker_id)
+                        .values(heartbeat_at=datetime.utcnow())
+                    )
+                    await db.commit()
+            except Exception as e:
+                print(f"[DEBUG] Heartbeat for job {job_id} failed: {e}", flush=True)
+
+    # _heartbeat, _finish and _fail only touch the job while this worker owns it: a job
+    # re-queued as stale may have been claimed by another worker in the meantime
+
+    async def _finish(self, job_id: str, result: Dict):
+        # A requires_confirmation answer is a normal outcome; the client re-submits with regenerate=true
+        succeeded = result.get('success') or result.get('requires_confirmation')
+        async with async_session_maker() as db:
+            await db.execute(
+                update(ScheduleGenerationJob)
+                .where(ScheduleGenerationJob.id == job_id, ScheduleGenerationJob.worker_id == self.worker_id)
+                .values(
+                    status='completed' if succeeded else 'failed',
+                    progress=100,
+                    feedback=result.get('feedback', []),
+                    overtime_warnings=result.get('overtime_warnings', []),
+                    schedules_created=result.get('schedules_created', 0),
+                    result=result,
+                    finished_at=datetime.utcnow()
+                )
+            )
+            await db.commit()
+
+    async def _fail(self, job_id: str, error: str, feedback: List[str]):
+        async with async_session_maker() as db:
+            await db.execute(
+                update(ScheduleGenerationJob)
+                .where(ScheduleGenerationJob.id == job_id, ScheduleGenerationJob.worker_id == self.worker_id)
+                .values(status='failed', error=error, feedback=feedback,
+                        finished_at=datetime.utcnow())
+            )
+            await db.commit()
+
+
+class _ProgressReporter:
+    """Accumulates feedback lines and writes progress to the job row, throttled"""
+
+    def __init__(self, job_id: str, worker_id: str):
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.feedback: List[str] = []
+        self.percent = 0
+        self._last_write = 0.0
+
+    async def report(self, percent: int, messages: List[str]):
+        self.feedback.extend(messages)
+        self.percent = max(self.percent, min(int(percent), 99))
+        now = time.monotonic()
+        if not messages and now - self._last_write < PROGRESS_WRITE_INTERVAL_SECONDS:
+            return
+        self._last_write = now
+        # Separate session: the generation session must not commit half a schedule
+        async with async_session_maker() as db:
+            await db.execute(
+                update(ScheduleGenerationJob)
+                .where(ScheduleGenerationJob.id == self.job_id,
+                       ScheduleGenerationJob.worker_id == self.worker_id)
+                .values(progress=self.percent, feedback=list(self.feedback),
+                        heartbeat_at=datetime.utcnow())
+            )
+            await db.commit()
+
+
+# Global instance
+generation_worker = GenerationJobWorker()
@@ -6,93 +6,86 @@ and to get holiday information.
 """
 
 from datetime import date, datetime, timedelta
-from typing import Optional, Dict, List
+from typing import Optional, Dict, Iterable, Iterator, List, Tuple
 import holidays as holidays_lib
 
+from app.config import settings
+
 
 class JapaneseCalendar:
-    """Utility class for Japanese calendar operations"""
-    
-    def __init__(self):
-        """Initialize Japanese holidays library"""
-        self.holidays_jp = holidays_lib.Japan()
-    
-    def is_holiday(self, target_date: date) -> bool:
-        """Check if a date is a Japanese public holiday"""
-        return target_date in self.holidays_jp
-    
-    def is_weekend(self, target_date: date) -> bool:
-        """Check if a date is Saturday or Sunday"""
-        day_of_week = target_date.weekday()
-        return day_of_week >= 5  # 5 = Saturday, 6 = Sunday
-    
-    def is_weekend_or_holiday(self, target_date: date) -> bool:
-        """Check if a date is either weekend or public holiday"""
-        return self.is_weekend(target_date) or self.is_holiday(target_date)
-    
-    def get_holiday_name(self, target_date: date) -> Optional[str]:
-        """Get the name of the holiday for a given date"""
-        if target_date in self.holidays_jp:
-            return self.holidays_jp[target_date]
-        return None
-    
-    def get_holidays_in_range(self, start_date: date, end_date: date) -> Dict[date, str]:
-        """Get all holidays within a date range"""
-        holidays_in_range = {}
-        current_date = start_date
-        
-        while current_date <= end_date:
-            if current_date in self.holidays_jp:
-                holidays_in_range[current_date] = self.holidays_jp[current_date]
-            current_date += timedelta(days=1)
-        
-        return holidays_in_range
-    
-    def get_non_working_days_in_range(self, start_date: date, end_date: date) -> Dict[date, str]:
-        """Get all non-working days (weekends and holidays) in a date range"""
-        non_working = {}
-        current_date = start_date
-        
-        while current_date <= end_date:
-            if self.is_weekend(current_date):
-                day_name = current_date.strftime('%A')
-                non_working[current_date] = day_name
-            elif current_date in self.holidays_jp:
-                non_working[current_date] = self.holidays_jp[current_date]
-            current_date += timedelta(days=1)
-        
-        return non_working
-    
-    def get_shifts_required_for_week(self, week_start: date) -> int:
-        """
-        Get the number of shifts required for a week, considering holidays.
-        
-        - Default: 5 shifts per week (Mon-Fri)
-        - Exception 1: If there's a public holiday in the week, reduce by 1
-        - Exception 2: If comp-off is applied, it adds an extra shift to compensate
-        
-        Returns the minimum shifts required for the week.
-        """
-        week_end = week_start + timedelta(days=6)  # Full week Mon-Sun
-        
-        # Count weekday holidays
-        weekday_holidays = 0
-        current_date = week_start
-        
-        while current_date <= week_end:
-            # Check if it's a weekday (Mon-Fri) and a holiday
-            if current_date.weekday() < 5 and self.is_holiday(current_date):
-                weekday_holidays += 1
-            current_date += timedelta(days=1)
-        
-        # Base 5 shifts, minus 1 for each weekday holiday
-        required_shifts = max(4, 5 - weekday_holidays)
-        return required_shifts
-    
-    def get_week_info(self, week_start: date) -> Dict:
-        """Get comprehensive week information for scheduling"""
+    """
+    Utility class for Japanese calendar operations.
+
+    Holidays are precomputed into per-year tables (a day-of-year holiday
+    bitset and a holiday-name array) and per-week info structs for a window
+    of years around the current one, so range queries are slices and week
+    lookups are memoized reads. Years outside the window are tabulated on
+    first use.
+    """
+
+    def __init__(self, years: Optional[Iterable[int]] = None):
+        """Initialize Japanese holidays library and the precomputed tables"""
+        if years is None:
+            this_year = date.today().year
+            years = range(this_year - settings.CALENDAR_YEARS_BEFORE,
+                          this_year + settings.CALENDAR_YEARS_AFTER + 1)
+        years = sorted(set(years))
+        self.holidays_jp = holidays_lib.Japan(years=years)
+
+        self._year_start: Dict[int, int] = {}  # year -> ordinal of Jan 1
+        self._holiday_bits: Dict[int, int] = {}  # year -> bit (day of year - 1) set on holidays
+        self._holiday_names: Dict[int, List[Optional[str]]] = {}  # year -> name per day of year
+        self._week_info: Dict[date, Dict] = {}  # week start -> week info (shared, read-only)
+
+        for year in years:
+            self._build_year(year)
+        if years:
+            week_start = date(years[0], 1, 1) - timedelta(days=date(years[0], 1, 1).weekday())
+            while week_start.year <= years[-1]:
+                self._week_info[week_start] = self._build_week_info(week_start)
+                week_start += timedelta(days=7)
+
+    # ===== Precomputed tables =====
+
+    def _build_year(self, year: int) -> None:
+        jan_1 = date(year, 1, 1)
+        names: List[Optional[str]] = [None] * ((date(year, 12, 31) - jan_1).days + 1)
+        bits = 0
+        for holiday, name in holidays_lib.Japan(years=year).items():
+            offset = (holiday - jan_1).days
+            names[offset] = name
+            bits |= 1 << offset
+        self._holiday_names[year] = names
+        self._holiday_bits[year] = bits
+        self._year_start[year] = jan_1.toordinal()
+
+    def _offset(self, target_date: date) -> int:
+        """Day-of-year index of a date, tabulating its year if needed"""
+        if isinstance(target_date, datetime):
+            target_date = target_date.date()
+        if target_date.year not in self._year_start:
+            self._build_year(target_date.year)
+        return target_date.toordinal() - self._year_start[target_date.year]
+
+    def _holidays_between(self, start_date: date, end_date: date) -> Iterator[Tuple[date, str]]:
+        """Holidays in [start_date, end_date] in date order, from slices of the yearly bitsets"""
+        for year in range(start_date.year, end_date.year + 1):
+            low = self._offset(max(start_date, date(year, 1, 1)))
+            high = self._offset(min(end_date, date(year, 12, 31)))
+            if high < low:
+                continue
+            bits = (self._holiday_bits[year] >> low) & ((1 << (high - low + 1)) - 1)
+            names = self._holiday_names[year]
+            jan_1 = date(year, 1, 1)
+            while bits:
+                lowest = bits & -bits
+                offset = low + lowest.bit_length() - 1
+                yield jan_1 + timedelta(days=offset), names[offset]
+                bits ^= lowest
+
+    def _build_week_info(self, week_start: date) -> Dict:
         week_end = week_start + timedelta(days=6)
-        
+
         week_info = {
             'week_start': week_start,
             'week_end': week_end,
@@ -102,33 +95,93 @@ class JapaneseCalendar:
             'weekday_holiday_count': 0,
             'required_shifts': 5
         }
-        
-        current_date = week_start
-        while current_date <= week_end:
+
+        for i in range(7):
+            current_date = week_start + timedelta(days=i)
+            holiday_name = self.get_holiday_name(current_date)
             day_info = {
                 'date': current_date,
                 'day_name': current_date.strftime('%A'),
                 'is_weekend': self.is_weekend(current_date),
-                'is_holiday': self.is_holiday(current_date),
-                'holiday_name': self.get_holiday_name(current_date),
-                'is_non_working': self.is_weekend_or_holiday(current_date)
+                'is_holiday': holiday_name is not None,
+                'holiday_name': holiday_name,
+                'is_non_working': self.is_weekend(current_date) or holiday_name is not None
             }
-            
+
             week_info['days'].append(day_info)
-            
+
             if day_info['is_weekend']:
                 week_info['weekend_count'] += 1
-            
+
             if day_info['is_holiday']:
                 week_info['holiday_count'] += 1
                 if not day_info['is_weekend']:
                     week_info['weekday_holiday_count'] += 1
-            
-            current_date += timedelta(days=1)
-        
+
         # Calculate required shifts
         week_info['required_shifts'] = max(4, 5 - week_info['weekday_holiday_count'])
-        
+
+        return week_info
+
+    # ===== Lookups =====
+
+    def is_holiday(self, target_date: date) -> bool:
+        """Check if a date is a Japanese public holiday"""
+        offset = self._offset(target_date)
+        return bool(self._holiday_bits[target_date.year] >> offset & 1)
+
+    def is_weekend(self, target_date: date) -> bool:
+        """Check if a date is Saturday or Sunday"""
+        day_of_week = target_date.weekday()
+        return day_of_week >= 5  # 5 = Saturday, 6 = Sunday
+
+    def is_weekend_or_holiday(self, target_date: date) -> bool:
+        """Check if a date is either weekend or public holiday"""
+        return self.is_weekend(target_date) or self.is_holiday(target_date)
+
+    def get_holiday_name(self, target_date: date) -> Optional[str]:
+        """Get the name of the holiday for a given date"""
+        offset = self._offset(target_date)
+        return self._holiday_names[target_date.year][offset]
+
+    def get_holidays_in_range(self, start_date: date, end_date: date) -> Dict[date, str]:
+        """Get all holidays within a date range"""
+        return dict(self._holidays_between(start_date, end_date))
+
+    def get_non_working_days_in_range(self, start_date: date, end_date: date) -> Dict[date, str]:
+        """Get all non-working days (weekends and holidays) in a date range"""
+        non_working = {
+            holiday: name for holiday, name in self._holidays_between(start_date, end_date)
+            if holiday.weekday() < 5
+        }
+        # Saturdays and Sundays a week at a time; a weekend holiday is listed by day name
+        for weekday in (5, 6):
+            current_date = start_date + timedelta(days=(weekday - start_date.weekday()) % 7)
+            while current_date <= end_date:
+                non_working[current_date] = current_date.strftime('%A')
+                current_date += timedelta(days=7)
+        return dict(sorted(non_working.items()))
+
+    def get_shifts_required_for_week(self, week_start: date) -> int:
+        """
+        Get the number of shifts required for a week, considering holidays.
+
+        - Default: 5 shifts per week (Mon-Fri)
+        - Exception 1: If there's a public holiday in the week, reduce by 1
+        - Exception 2: If comp-off is applied, it adds an extra shift to compensate
+
+        Returns the minimum shifts required for the week.
+        """
+        return self.get_week_info(week_start)['required_shifts']
+
+    def get_week_info(self, week_start: date) -> Dict:
+        """
+        Get comprehensive week information for scheduling.
+        The returned dict is shared by all callers and must not be modified.
+        """
+        week_info = self._week_info.get(week_start)
+        if week_info is None:
+            week_info = self._week_info.setdefault(week_start, self._build_week_info(week_start))
         return week_info
 
 
@@ -22,21 +22,37 @@ from collections import defaultdict
 from ortools.sat.python import cp_model
 
 from app.config import settings
-from app.database import get_db
+from app.database import get_db, async_session_maker
 from app.models import (
     User, Department, Manager, Employee, Role, Schedule, LeaveRequest,
     CheckInOut, Message, Notification,
     UserType, LeaveStatus, Attendance, Unavailability, Shift,
     OvertimeTracking, OvertimeRequest, OvertimeWorked, OvertimeStatus,
-    CompOffRequest, CompOffTracking, CompOffDetail
+    CompOffRequest, CompOffTracking, CompOffDetail, ScheduleGenerationJob, ScheduleSolutionCache,
+    SolverRunTelemetry, EmployeeWeekStats
 )
 from app.schemas import *
 from app.auth import (
     get_password_hash, verify_password, create_access_token,
-    get_current_active_user, require_admin, require_manager, require_employee
+    get_current_active_user, require_admin, require_manager, require_employee,
+    oauth2_scheme, create_scoped_token, decode_scoped_token
 )
+from app.principal_cache import principal_cache
 from app.schedule_generator import ShiftScheduleGenerator
+from app.schedule_engine import generate_department_schedules, apply_schedule_diff, ENGINES
+from app.solver_pool import solver_pool
+from app.solution_cache import solution_cache
+from app.solver_resources import solver_resources
+from app.solver_telemetry import department_summary
+from app.schedule_validation import validate_assignments, validate_assignment
+from app.schedule_bulk import apply_bulk_operations
+from app.employee_week_stats import rebuild_week_stats, ensure_week_stats
+from app.check_in import check_in_employee, CheckInRejected
+from app.roster_cache import roster_cache, schedule_snapshot
+from app.attendance_board import build_board, stream_board, publish_check_in_change, ATTENDANCE_STREAM_SCOPE
+from app.generation_jobs import create_job, job_to_response, generation_worker
 from app.holidays_jp import jp_calendar, is_japanese_holiday, get_japanese_holiday_name
+from app import calendar_cache
 
 app = FastAPI(
     title="Shift Scheduler V5.1 API",
@@ -140,6 +156,68 @@ async def upgrade_database():
         print(f"Database upgrade error: {e}")
 
 
+async def create_generation_jobs_table():
+    """Migration to create the schedule_generation_jobs and schedule_solution_cache tables"""
+    from app.database import engine
+    from sqlalchemy import text
+
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(
+                lambda sync_conn: ScheduleGenerationJob.__table__.create(sync_conn, checkfirst=True)
+            )
+            await conn.run_sync(
+                lambda sync_conn: ScheduleSolutionCache.__table__.create(sync_conn, checkfirst=True)
+            )
+            await conn.run_sync(
+                lambda sync_conn: SolverRunTelemetry.__table__.create(sync_conn, checkfirst=True)
+            )
+            await conn.execute(text(
+                "ALTER TABLE schedule_generation_jobs ADD COLUMN IF NOT EXISTS repair BOOLEAN DEFAULT FALSE"
+            ))
+            await conn.execute(text(
+                "ALTER TABLE schedule_generation_jobs ADD COLUMN IF NOT EXISTS dry_run BOOLEAN DEFAULT FALSE"
+            ))
+            await conn.execute(text(
+                "ALTER TABLE schedule_generation_jobs ADD COLUMN IF NOT EXISTS accept_gap DOUBLE PRECISION"
+            ))
+            await conn.execute(text(
+                "ALTER TABLE schedule_generation_jobs ADD COLUMN IF NOT EXISTS stall_seconds DOUBLE PRECISION"
+            ))
+            # Jobs must not block deleting their department or requesting user
+            await conn.execute(text("""
+                ALTER TABLE schedule_generation_jobs
+                    DROP CONSTRAINT IF EXISTS fk_genjob_department,
+                    ADD CONSTRAINT fk_genjob_department FOREIGN KEY (department_id)
+                        REFERENCES departments(id) ON DELETE CASCADE,
+                    DROP CONSTRAINT IF EXISTS fk_genjob_user,
+                    ADD CONSTRAINT fk_genjob_user FOREIGN KEY (requested_by)
+                        REFERENCES users(id) ON DELETE SET NULL
+            """))
+        print("✓ schedule_generation_jobs, schedule_solution_cache and solver_run_telemetry tables ready")
+    except Exception as e:
+        print(f"Generation jobs migration error: {e}")
+
+
+async def create_employee_week_stats_table():
+    """Migration to create the employee_week_stats read model and build it on first start"""
+    from app.database import engine, async_session_maker
+
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(
+                lambda sync_conn: EmployeeWeekStats.__table__.create(sync_conn, checkfirst=True)
+            )
+        async with async_session_maker() as db:
+            rebuilt = await ensure_week_stats(db)
+        if rebuilt:
+            print(f"✓ employee_week_stats built: {rebuilt['weeks']} employee-weeks from {rebuilt['schedules']} schedules")
+        else:
+            print("✓ employee_week_stats table ready")
+    except Exception as e:
+        print(f"Employee week stats migration error: {e}")
+
+
 async def add_manager_id_column():
     """Migration to add manager_id field to Manager table"""
     from app.database import engine
@@ -255,11 +333,24 @@ async def startup_event():
     await add_employee_id_column()
     await add_manager_id_column()
     await upgrade_database()
+    await create_generation_jobs_table()
+    await create_employee_week_stats_table()
     
     print("="*60)
     print("All migrations completed!")
     print("="*60 + "\n")
 
+    generation_worker.start()
+    roster_cache.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the background workers and the CP-SAT solver processes"""
+    await generation_worker.stop()
+    await roster_cache.stop()
+    solver_pool.shutdown()
+
 
 # =============== HELPER FUNCTIONS ===============
 
@@ -348,137 +439,6 @@ async def general_exception_handler(request: Request, exc: Exception):
     return response
 
 
-# ===== CONSTRAINT VALIDATION HELPER FUNCTIONS =====
-
-async def validate_5_shifts_per_week(
-    employee_id: int, 
-    target_date: date, 
-    db: AsyncSession,
-    exclude_schedule_id: Optional[int] = None
-) -> tuple[bool, str]:
-    """
-    Validate that employee doesn't exceed required shifts per week
-    
-    Rules:
-    - Base: 5 shifts per week (Mon-Fri)
-    - Exception 1: If a weekday (Mon-Fri) is a public holiday, reduce by 1
-    - Exception 2: Comp-off taken/earned on Mon-Fri counts as fulfilling shift requirement
-    - Exception 3: Comp-off earned/taken on Sat-Sun are bonus shifts (don't count)
-    
-    Returns: (is_valid, error_message)
-    """
-    week_start = target_date - timedelta(days=target_date.weekday())
-    week_end = week_start + timedelta(days=6)
-    
-    # Get required shifts for this week (considering Japanese holidays)
-    required_shifts = jp_calendar.get_shifts_required_for_week(week_start)
-    
-    # Count WEEKDAY (Mon-Fri) coverage: regular shifts + comp-off (both count toward requirement)
-    weekday_coverage_query = select(func.count(Schedule.id)).filter(
-        Schedule.employee_id == employee_id,
-        Schedule.date >= week_start,
-        Schedule.date <= week_end,
-        Schedule.status.in_(['scheduled', 'leave', 'comp_off_taken', 'comp_off_earned', 'leave_half_morning', 'leave_half_afternoon']),
-        # Only count Mon-Fri (1=Mon, 5=Fri in PostgreSQL extraction)
-        func.extract('dow', Schedule.date).in_([1, 2, 3, 4, 5])
-    )
-    
-    if exclude_schedule_id:
-        weekday_coverage_query = weekday_coverage_query.filter(Schedule.id != exclude_schedule_id)
-    
-    result = await db.execute(weekday_coverage_query)
-    weekday_coverage = result.scalar() or 0
-    
-    # Count weekend (Sat-Sun) shifts - only comp-off (earning extra time off) don't count
-    weekend_regular_query = select(func.count(Schedule.id)).filter(
-        Schedule.employee_id == employee_id,
-        Schedule.date >= week_start,
-        Schedule.date <= week_end,
-        Schedule.status.in_(['scheduled', 'leave', 'leave_half_morning', 'leave_half_afternoon']),  # Regular shifts only
-        # Only count Sat-Sun (6=Sat, 0=Sun in PostgreSQL extraction)
-        func.extract('dow', Schedule.date).in_([6, 0])
-    )
-    
-    if exclude_schedule_id:
-        weekend_regular_query = weekend_regular_query.filter(Schedule.id != exclude_schedule_id)
-    
-    result = await db.execute(weekend_regular_query)
-    weekend_regular_shifts = result.scalar() or 0
-    
-    # Get week info for detailed error messaging
-    week_info = jp_calendar.get_week_info(week_start)
-    holiday_str = ""
-    if week_info['weekday_holiday_count'] > 0:
-        holiday_names = [day['holiday_name'] for day in week_info['days'] if day['holiday_name']]
-        holiday_str = f" (Contains {week_info['weekday_holiday_count']} weekday holiday(s): {', '.join(holiday_names)})"
-    
-    # Check if target is weekday or weekend
-    target_weekday = target_date.weekday()  # 0=Mon, 5=Sat, 6=Sun
-    
-    if target_weekday >= 5:
-        # Weekend (Sat-Sun) shift
-        # Check if weekday requirement is already met
-        if weekday_coverage >= required_shifts:
-            return False, f"Cannot assign weekend shift on {target_date} - weekday requirement already met. Employee has {weekday_coverage} weekday shifts/comp-offs (required: {required_shifts}){holiday_str}"
-        # Weekend regular shifts also count toward total
-        total_shifts = weekday_coverage + weekend_regular_shifts
-        if total_shifts >= required_shifts:
-            return False, f"Cannot assign more than {required_shifts} shifts per week. Employee has {weekday_coverage} weekday + {weekend_regular_shifts} weekend shifts (total: {total_shifts}){holiday_str}"
-    else:
-        # Weekday (Mon-Fri) shift
-        if weekday_coverage >= required_shifts:
-            return False, f"Cannot assign more than {required_shifts} weekday shifts per week. Employee already has {weekday_coverage} weekday shifts/comp-offs (required: {required_shifts}){holiday_str} (Mon-Sun: {week_start} to {week_end})"
-    
-    return True, ""
-
-
-async def validate_consecutive_shifts_limit(
-    employee_id: int,
-    target_date: date,
-    db: AsyncSession,
-    exclude_schedule_id: Optional[int] = None,
-    max_consecutive: int = 5
-) -> tuple[bool, str]:
-    """
-    Validate that adding a shift on target_date doesn't exceed consecutive shift limit
-    Returns: (is_valid, error_message)
-    """
-    week_start = target_date - timedelta(days=target_date.weekday())
-    week_end = week_start + timedelta(days=6)
-    
-    query = select(Schedule).filter(
-        Schedule.employee_id == employee_id,
-        Schedule.date >= week_start,
-        Schedule.date <= week_end,
-        Schedule.status.in_(['scheduled', 'leave', 'comp_off_taken', 'leave_half_morning', 'leave_half_afternoon'])
-    ).order_by(Schedule.date)
-    
-    if exclude_schedule_id:
-        query = query.filter(Schedule.id != exclude_schedule_id)
-    
-    result = await db.execute(query)
-    existing_schedules = result.scalars().all()
-    
-    # Collect all dates including the new one
-    all_dates = sorted([s.date for s in existing_schedules] + [target_date])
-    all_dates = list(dict.fromkeys(all_dates))  # Remove duplicates while preserving order
-    
-    # Find the longest consecutive sequence
-    max_consecutive_found = 1
-    current_consecutive = 1
-    for i in range(1, len(all_dates)):
-        if (all_dates[i] - all_dates[i-1]).days == 1:
-            current_consecutive += 1
-            max_consecutive_found = max(max_consecutive_found, current_consecutive)
-        else:
-            current_consecutive = 1
-    
-    if max_consecutive_found > max_consecutive:
-        return False, f"Cannot create {max_consecutive_found} consecutive shifts. Maximum allowed is {max_consecutive} consecutive shifts."
-    
-    return True, ""
-
-
 # Health check
 @app.get("/")
 async def root():
@@ -544,21 +504,18 @@ async def read_users_me(
     db: AsyncSession = Depends(get_db)
 ):
     # For managers, include their department_id
-    if current_user.user_type == UserType.MANAGER:
-        mgr_result = await db.execute(select(Manager).filter(Manager.user_id == current_user.id))
-        manager = mgr_result.scalar_one_or_none()
-        if manager:
-            # Create a response with manager_department_id
-            response_dict = {
-                "id": current_user.id,
-                "username": current_user.username,
-                "email": current_user.email,
-                "full_name": current_user.full_name,
-                "user_type": current_user.user_type,
-                "is_active": current_user.is_active,
-                "manager_department_id": manager.department_id
-            }
-            return response_dict
+    if current_user.user_type == UserType.MANAGER and current_user.manager_id:
+        # Create a response with manager_department_id
+        response_dict = {
+            "id": current_user.id,
+            "username": current_user.username,
+            "email": current_user.email,
+            "full_name": current_user.full_name,
+            "user_type": current_user.user_type,
+            "is_active": current_user.is_active,
+            "manager_department_id": current_user.department_id
+        }
+        return response_dict
     
     return current_user
 
@@ -1484,16 +1441,9 @@ async def delete_role(
 
 # Helper functions to resolve department ownership
 async def get_user_department(user: User, db: AsyncSession) -> Optional[int]:
-    """Resolve the department for a manager or employee user"""
-    if user.user_type == UserType.MANAGER:
-        result = await db.execute(select(Manager).filter(Manager.user_id == user.id))
-        manager = result.scalar_one_or_none()
-        return manager.department_id if manager else None
-    
-    if user.user_type == UserType.EMPLOYEE:
-        result = await db.execute(select(Employee).filter(Employee.user_id == user.id))
-        employee = result.scalar_one_or_none()
-        return employee.department_id if employee else None
+    """Resolve the department for a manager or employee user (held by the cached principal)"""
+    if user.user_type in (UserType.MANAGER, UserType.EMPLOYEE):
+        return user.department_id
     
     return None
 
@@ -1514,171 +1464,11 @@ async def check_in(
     db: AsyncSession = Depends(get_db)
 ):
     try:
-        today = date.today()
-        print(f"[CHECK-IN] User ID: {current_user.id}, Date: {today}")
-        
-        # Get employee by user_id
-        result = await db.execute(
-            select(Employee).filter(Employee.user_id == current_user.id)
-        )
-        employee = result.scalar_one_or_none()
-        
-        if not employee:
-            error_msg = f"Employee record not found for user_id: {current_user.id}"
-            print(f"[CHECK-IN ERROR] {error_msg}")
-            raise HTTPException(status_code=400, detail=error_msg)
-        
-        print(f"[CHECK-IN] Employee found: {employee.id}, name: {employee.first_name} {employee.last_name}")
-        
-        # Check if employee is on approved leave or comp-off via LeaveRequest
-        leave_result = await db.execute(
-            select(LeaveRequest).filter(
-                LeaveRequest.employee_id == employee.id,
-                LeaveRequest.start_date <= today,
-                LeaveRequest.end_date >= today,
-                LeaveRequest.status == LeaveStatus.APPROVED
-            )
-        )
-        leave_request = leave_result.scalar_one_or_none()
-        if leave_request:
-            error_msg = f"You are on approved {leave_request.leave_type} today. You cannot check in."
-            print(f"[CHECK-IN ERROR] Leave Request block - {error_msg}")
-            raise HTTPException(status_code=400, detail=error_msg)
-        
-        # Also check Schedule table for leave/comp-off status
-        schedule_result = await db.execute(
-            select(Schedule).filter(
-                Schedule.employee_id == employee.id,
-                Schedule.date == today,
-                Schedule.status.in_(['leave', 'comp_off_taken', 'comp_off_earned', 'leave_half_morning', 'leave_half_afternoon'])
-            )
-        )
-        if schedule_result.scalar_one_or_none():
-            error_msg = "You are on leave/comp-off today. You cannot check in."
-            print(f"[CHECK-IN ERROR] Schedule block - {error_msg}")
-            raise HTTPException(status_code=400, detail=error_msg)
-        
-        # Check if already checked in
-        result = await db.execute(
-            select(CheckInOut).filter(
-                CheckInOut.employee_id == employee.id,
-                CheckInOut.date == today,
-                CheckInOut.check_out_time == None
-            )
-        )
-        if result.scalar_one_or_none():
-            error_msg = "Already checked in today. Please check out first."
-            print(f"[CHECK-IN ERROR] {error_msg}")
-            raise HTTPException(status_code=400, detail=error_msg)
-        
-        # Get today's schedule
-        result = await db.execute(
-            select(Schedule).filter(
-                Schedule.employee_id == employee.id,
-                Schedule.date == today
-            )
-        )
-        schedule = result.scalar_one_or_none()
-        
-        if not schedule:
-            error_msg = f"No scheduled shift for today. Please contact your manager. (Employee: {employee.id}, Date: {today})"
-            print(f"[CHECK-IN ERROR] {error_msg}")
-            raise HTTPException(status_code=400, detail=error_msg)
-        
-        # Calculate late status
-        now = datetime.now()
-        status_val = "on-time"
-        
-        try:
-            if isinstance(schedule.start_time, str):
-                scheduled_time = datetime.strptime(schedule.start_time, "%H:%M").time()
-            else:
-                scheduled_time = schedule.start_time if isinstance(schedule.start_time, type(None)) is False else datetime.strptime("09:00", "%H:%M").time()
-            
-            if scheduled_time:
-                scheduled_datetime = datetime.combine(today, scheduled_time)
-                diff_minutes = (now - scheduled_datetime).total_seconds() / 60
-                
-                if diff_minutes <= 0:
-                    status_val = "on-time"
-                elif diff_minutes <= 15:
-                    status_val = "slightly-late"
-                else:
-                    status_val = "late"
-        except (ValueError, TypeError, AttributeError) as e:
-            # If we can't parse the time, just mark as on-time
-            print(f"Time parsing error: {str(e)}")
-            status_val = "on-time"
-        
-        # Create check-in record
-        check_in = CheckInOut(
-            employee_id=employee.id,
-            schedule_id=schedule.id,
-            date=today,
-            check_in_time=now,
-            check_in_status=status_val,
-            location=check_in_data.location
-        )
-        
-        db.add(check_in)
-        await db.commit()
-        
-        # Also create or update Attendance record immediately on check-in
-        try:
-            att_result = await db.execute(
-                select(Attendance).filter(
-                    Attendance.employee_id == employee.id,
-                    Attendance.date == today
-                )
-            )
-            attendance = att_result.scalar_one_or_none()
-            
-            if not attendance:
-                # Create new attendance record with check-in time
-                attendance = Attendance(
-                    employee_id=employee.id,
-                    schedule_id=schedule.id,
-                    date=today,
-                    in_time=now.strftime("%H:%M") if now else None,
-                    status=status_val,
-                    out_time=None,
-                    worked_hours=0,
-                    overtime_hours=0,
-                    break_minutes=0
-                )
-                db.add(attendance)
-                await db.flush()
-                print(f"[CHECK-IN] Created attendance record for employee {employee.id}")
-            else:
-                # Update existing record with check-in time if not already set
-                if not attendance.in_time:
-                    attendance.in_time = now.strftime("%H:%M") if now else None
-                    attendance.status = status_val
-                    await db.flush()
-                    print(f"[CHECK-IN] Updated attendance record for employee {employee.id}")
-            
-            await db.commit()
-        except Exception as att_error:
-            await db.rollback()
-            print(f"[CHECK-IN ERROR] Failed to create/update attendance record: {str(att_error)}")
-            import traceback
-            traceback.print_exc()
-            # Don't fail the check-in if attendance record fails
-        
-        # Refresh with proper eager loading
-        result = await db.execute(
-            select(CheckInOut)
-            .where(CheckInOut.id == check_in.id)
-            .options(
-                selectinload(CheckInOut.employee),
-                selectinload(CheckInOut.schedule).selectinload(Schedule.role)
-            )
-        )
-        check_in = result.scalar_one()
-        
-        return check_in
-    except HTTPException:
-        raise
+        print(f"[CHECK-IN] User ID: {current_user.id}, Date: {date.today()}")
+        return await check_in_employee(db, current_user.id, check_in_data.location)
+    except CheckInRejected as e:
+        print(f"[CHECK-IN ERROR] {e}")
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         error_msg = str(e)
         print(f"[CHECK-IN EXCEPTION] {error_msg}")
@@ -1710,10 +1500,7 @@ async def check_out(
 
         # Find today's check-in
         result = await db.execute(
-            select(CheckInOut).options(
-                selectinload(CheckInOut.employee).selectinload(Employee.user),
-                selectinload(CheckInOut.schedule).selectinload(Schedule.role)
-            ).filter(
+            select(CheckInOut).filter(
                 CheckInOut.employee_id == employee.id,
                 CheckInOut.date == today,
                 CheckInOut.check_out_time == None
@@ -1728,7 +1515,18 @@ async def check_out(
         check_in.notes = check_out_data.notes
 
         await db.commit()
-        await db.refresh(check_in, ['employee', 'schedule'])
+        publish_check_in_change(
+            'check_out', employee.department_id, employee.id, f"{employee.first_name} {employee.last_name}",
+            check_in.check_in_time, check_in.check_out_time, check_in.check_in_status, today
+        )
+
+        # The shift (with its role's break) from today's cached roster
+        schedule = None
+        if check_in.schedule_id:
+            roster = await roster_cache.get(employee.department_id, today)
+            schedule = roster.entry(employee.id)['schedule']
+            if not schedule or schedule['id'] != check_in.schedule_id:
+                schedule = await schedule_snapshot(db, check_in.schedule_id)
 
         # Create or update Attendance record with overtime calculation
         try:
@@ -1763,8 +1561,8 @@ async def check_out(
                 
                 # Get break minutes from role, but only apply if total time is long enough
                 break_minutes = 0
-                if check_in.schedule and check_in.schedule.role:
-                    role_break = check_in.schedule.role.break_minutes or 0
+                if schedule:
+                    role_break = schedule['break_minutes'] or 0
                     # Only apply break if total time is at least the break duration
                     if total_minutes >= role_break:
                         break_minutes = role_break
@@ -1794,10 +1592,10 @@ async def check_out(
                 )
                 overtime_request = approved_ot_result.scalar_one_or_none()
                 
-                if overtime_request and check_in.schedule:
+                if overtime_request and schedule:
                     # Parse shift end time
                     try:
-                        shift_end_str = check_in.schedule.end_time
+                        shift_end_str = schedule['end_time']
                         if isinstance(shift_end_str, str):
                             shift_end_h, shift_end_m = map(int, shift_end_str.split(':'))
                         else:
@@ -1862,7 +1660,17 @@ async def check_out(
             traceback.print_exc()
             # Don't fail the checkout, just log the error
         
-        return check_in
+        return {
+            'id': check_in.id,
+            'employee_id': check_in.employee_id,
+            'schedule_id': check_in.schedule_id,
+            'date': check_in.date,
+            'check_in_time': check_in.check_in_time,
+            'check_out_time': check_in.check_out_time,
+            'check_in_status': check_in.check_in_status,
+            'employee': employee,
+            'schedule': schedule,
+        }
     except HTTPException:
         raise
     except Exception as e:
@@ -2010,103 +1818,66 @@ async def get_todays_attendance(
     db: AsyncSession = Depends(get_db)
 ):
     """Get today's attendance summary for manager"""
-    today = date.today()
-
-    # Get all employees in department
     manager_dept = await get_manager_department(current_user, db)
     if not manager_dept:
         raise HTTPException(status_code=400, detail="Manager department not found")
-    
-    emp_result = await db.execute(
-        select(Employee).filter(
-            Employee.department_id == manager_dept,
-            Employee.is_active == True
-        )
-    )
-    employees = emp_result.scalars().all()
 
-    # Get today's schedules
-    sched_result = await db.execute(
-        select(Schedule).filter(
-            Schedule.department_id == manager_dept,
-            Schedule.date == today
-        )
-    )
-    schedules = sched_result.scalars().all()
-    schedule_map = {s.employee_id: s for s in schedules}
-
-    # Get today's check-ins for this department's employees
-    employee_ids = [e.id for e in employees]
-    checkin_result = await db.execute(
-        select(CheckInOut).filter(
-            CheckInOut.date == today,
-            CheckInOut.employee_id.in_(employee_ids)
-        )
-    )
-    checkins = {c.employee_id: c for c in checkin_result.scalars().all()}
+    return await build_board(db, manager_dept)
 
-    # Build attendance summary - include all employees with schedules + all checked-in employees
-    attendance_summary = []
-    included_employees = set()
-    
-    # First, add all employees with schedules
-    for schedule in schedules:
-        checkin = checkins.get(schedule.employee_id)
-        employee = next((e for e in employees if e.id == schedule.employee_id), None)
-
-        status = "absent"
-        if checkin:
-            if checkin.check_out_time:
-                status = "completed"
-            elif checkin.check_in_status == "on-time":
-                status = "present"
-            else:
-                status = checkin.check_in_status
-
-        attendance_summary.append({
-            "employee_id": schedule.employee_id,
-            "employee_name": f"{employee.first_name} {employee.last_name}" if employee else "Unknown",
-            "schedule_id": schedule.id,
-            "scheduled_time": f"{schedule.start_time} - {schedule.end_time}",
-            "check_in_time": checkin.check_in_time.isoformat() if checkin and checkin.check_in_time else None,
-            "check_out_time": checkin.check_out_time.isoformat() if checkin and checkin.check_out_time else None,
-            "status": status
-        })
-        included_employees.add(schedule.employee_id)
-    
-    # Then, add any checked-in employees who don't have a schedule
-    for employee_id, checkin in checkins.items():
-        if employee_id not in included_employees:
-            employee = next((e for e in employees if e.id == employee_id), None)
-            
-            status = "absent"
-            if checkin:
-                if checkin.check_out_time:
-                    status = "completed"
-                elif checkin.check_in_status == "on-time":
-                    status = "present"
-                else:
-                    status = checkin.check_in_status
-            
-            attendance_summary.append({
-                "employee_id": employee_id,
-                "employee_name": f"{employee.first_name} {employee.last_name}" if employee else "Unknown",
-                "schedule_id": None,
-                "scheduled_time": "No Schedule",
-                "check_in_time": checkin.check_in_time.isoformat() if checkin and checkin.check_in_time else None,
-                "check_out_time": checkin.check_out_time.isoformat() if checkin and checkin.check_out_time else None,
-                "status": status
-            })
 
+@app.post("/attendance/today/stream-token")
+async def create_attendance_stream_token(
+    token: str = Depends(oauth2_scheme),
+    current_user: User = Depends(require_manager),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Short-lived token for opening /attendance/today/stream. EventSource cannot
+    send headers, so the stream is authenticated through its URL; a scoped
+    token that expires in seconds keeps the access token out of access logs
+    and browser history.
+    """
+    manager_dept = await get_manager_department(current_user, db)
+    if not manager_dept:
+        raise HTTPException(status_code=400, detail="Manager department not found")
+
+    expires_in = settings.ATTENDANCE_STREAM_TOKEN_SECONDS
     return {
-        "date": today.isoformat(),
-        "total_scheduled": len(schedules),
-        "total_checked_in": len(checkins),
-        "total_shown": len(attendance_summary),
-        "attendance": attendance_summary
+        "token": create_scoped_token(token, ATTENDANCE_STREAM_SCOPE, timedelta(seconds=expires_in)),
+        "expires_in": expires_in
     }
 
 
+@app.get("/attendance/today/stream")
+async def stream_todays_attendance(
+    request: Request,
+    token: str
+):
+    """
+    Live attendance board (server-sent events): today's board once, then an
+    event per committed check-in / check-out. Opened with a token from
+    POST /attendance/today/stream-token; the stream ends (event: end) when the
+    session expires or the user is no longer an active manager of the department.
+    """
+    claims = decode_scoped_token(token, ATTENDANCE_STREAM_SCOPE)
+
+    # Short-lived session: the stream itself must not hold a connection
+    async with async_session_maker() as db:
+        current_user = await principal_cache.get(db, claims["sub"])
+        if current_user is None:
+            raise HTTPException(status_code=401, detail="Could not validate credentials")
+        current_user = await require_manager(await get_current_active_user(current_user))
+        manager_dept = await get_manager_department(current_user, db)
+    if not manager_dept:
+        raise HTTPException(status_code=400, detail="Manager department not found")
+
+    return StreamingResponse(
+        stream_board(request, manager_dept, claims["sub"], claims["session_exp"]),
+        media_type="text/event-stream",
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
 @app.get("/attendance/stats")
 async def get_attendance_stats(
     start_date: date,
@@ -5791,42 +5562,26 @@ async def delete_notification(
 @app.get("/calendar/holidays")
 async def get_holidays(
     year: int,
-    month: int
+    month: int,
+    request: Request
 ):
-    """Get Japanese holidays for a specific month (public endpoint)"""
-    from calendar import monthrange
-    
-    # Get the calendar days for the month
-    _, days_in_month = monthrange(year, month)
-    start_date = date(year, month, 1)
-    end_date = date(year, month, days_in_month)
-    
-    # Get all holidays and weekends
-    holidays = {}
-    current_date = start_date
-    
-    while current_date <= end_date:
-        is_weekend = current_date.weekday() >= 5  # Saturday=5, Sunday=6
-        is_holiday = is_japanese_holiday(current_date)
-        holiday_name = get_japanese_holiday_name(current_date) if is_holiday else None
-        
-        if is_weekend or is_holiday:
-            holidays[current_date.isoformat()] = {
-                'date': current_date.isoformat(),
-                'day_name': current_date.strftime('%A'),
-                'is_weekend': is_weekend,
-                'is_holiday': is_holiday,
-                'holiday_name': holiday_name,
-                'type': 'holiday' if is_holiday else 'weekend'
-            }
-        
-        current_date += timedelta(days=1)
-    
-    return {
-        'year': year,
-        'month': month,
-        'holidays': holidays
-    }
+    """Get Japanese holidays for a specific month (public endpoint, cacheable with ETag)"""
+    payload, etag = calendar_cache.month_holidays(year, month)
+    return calendar_cache.conditional_response(request, payload, calendar_cache.calendar_cache_control(), etag)
+
+
+@app.get("/calendar/year")
+async def get_calendar_year(
+    year: int,
+    request: Request
+):
+    """
+    Full-year calendar (public endpoint, cacheable with ETag): every weekend
+    and holiday keyed by date, plus week info for each week_number of the year,
+    so clients fetch the calendar once per year.
+    """
+    payload, etag = calendar_cache.year_calendar(year)
+    return calendar_cache.conditional_response(request, payload, calendar_cache.calendar_cache_control(), etag)
 
 
 @app.get("/calendar/week-validation/{employee_id}")
@@ -5835,6 +5590,7 @@ async def check_week_validation(
     year: int,
     month: int,
     week: int,
+    request: Request,
     current_user: User = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
@@ -5846,15 +5602,11 @@ async def check_week_validation(
     - Current shifts assigned
     - Remaining capacity
     - Holiday information
+
+    Carries an ETag; clients revalidate with If-None-Match and get 304 while
+    the employee's week is unchanged.
     """
-    from calendar import monthrange
-    
-    # Calculate week start
-    jan_1 = date(year, 1, 1)
-    week_start = jan_1 + timedelta(weeks=week - 1)
-    # Adjust to Monday
-    days_to_monday = week_start.weekday()
-    week_start = week_start - timedelta(days=days_to_monday)
+    week_start = calendar_cache.week_start_for(year, week)
     week_end = week_start + timedelta(days=6)
     
     # Get week info with holidays
@@ -5877,7 +5629,7 @@ async def check_week_validation(
     current_shift_count = len(current_shifts)
     can_add_shifts = required_shifts - current_shift_count
     
-    return {
+    payload = {
         'week_start': week_start.isoformat(),
         'week_end': week_end.isoformat(),
         'required_shifts': required_shifts,
@@ -5905,43 +5657,19 @@ async def check_week_validation(
             for s in current_shifts
         ]
     }
+    return calendar_cache.conditional_response(request, payload, calendar_cache.PRIVATE_CACHE_CONTROL)
 
 
 @app.get("/calendar/week-info")
 async def get_week_info(
     year: int,
     month: int,
-    week_number: int
+    week_number: int,
+    request: Request
 ):
-    """Get detailed week information including holidays and required shifts (public endpoint)"""
-    # Calculate week start (Monday of the specified week)
-    jan_1 = date(year, 1, 1)
-    week_start = jan_1 + timedelta(weeks=week_number - 1)
-    # Adjust to Monday
-    days_to_monday = week_start.weekday()
-    week_start = week_start - timedelta(days=days_to_monday)
-    
-    week_info = jp_calendar.get_week_info(week_start)
-    
-    return {
-        'week_start': week_info['week_start'].isoformat(),
-        'week_end': week_info['week_end'].isoformat(),
-        'days': [
-            {
-                'date': day['date'].isoformat(),
-                'day_name': day['day_name'],
-                'is_weekend': day['is_weekend'],
-                'is_holiday': day['is_holiday'],
-                'holiday_name': day['holiday_name'],
-                'is_non_working': day['is_non_working']
-            }
-            for day in week_info['days']
-        ],
-        'weekend_count': week_info['weekend_count'],
-        'holiday_count': week_info['holiday_count'],
-        'weekday_holiday_count': week_info['weekday_holiday_count'],
-        'required_shifts': week_info['required_shifts']
-    }
+    """Get detailed week information including holidays and required shifts (public endpoint, cacheable with ETag)"""
+    payload, etag = calendar_cache.week_info(year, week_number)
+    return calendar_cache.conditional_response(request, payload, calendar_cache.calendar_cache_control(), etag)
 
 
 @app.get("/schedules", response_model=List[ScheduleResponse])
@@ -6052,15 +5780,11 @@ async def create_schedule(
         shift_hours = 0
     
     # ===== CONSTRAINT VALIDATION =====
-    # CONSTRAINT 1: Check 5 shifts per week limit
-    is_valid, error_msg = await validate_5_shifts_per_week(schedule_data.employee_id, schedule_data.date, db)
-    if not is_valid:
-        raise HTTPException(status_code=400, detail=error_msg)
-    
-    # CONSTRAINT 2: Check 5 consecutive shifts limit
-    is_valid, error_msg = await validate_consecutive_shifts_limit(schedule_data.employee_id, schedule_data.date, db)
-    if not is_valid:
-        raise HTTPException(status_code=400, detail=error_msg)
+    # Weekly shift requirement and 5 consecutive shifts limit
+    verdict = await validate_assignment(db, schedule_data.employee_id, schedule_data.date,
+                                        shift_id=schedule_data.shift_id)
+    if not verdict['valid']:
+        raise HTTPException(status_code=400, detail=verdict['errors'][0])
     
     # Check if this creates overtime (exceeds 8hrs/day)
     overtime_required = False
@@ -6217,6 +5941,58 @@ async def create_schedule(
     return result.scalar_one()
 
 
+@app.post("/schedules/validate")
+async def validate_schedule_assignments(
+    request: ScheduleValidationRequest,
+    current_user: User = Depends(require_manager),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Validate a batch of proposed (employee, date, shift) assignments against
+    the weekly shift requirement and the consecutive-day limit without saving
+    anything. Assignments are evaluated in order; earlier valid ones count
+    toward later ones.
+    """
+    if current_user.user_type == UserType.MANAGER:
+        manager_dept = await get_manager_department(current_user, db)
+        employee_ids = {a.employee_id for a in request.assignments}
+        result = await db.execute(
+            select(Employee.id).filter(Employee.id.in_(employee_ids), Employee.department_id == manager_dept)
+        )
+        if set(result.scalars().all()) != employee_ids:
+            raise HTTPException(status_code=403, detail="Can only validate schedules for employees in your department")
+
+    verdicts = await validate_assignments(db, [a.dict() for a in request.assignments])
+    return {
+        "valid": all(v['valid'] for v in verdicts),
+        "invalid_count": sum(1 for v in verdicts if not v['valid']),
+        "results": verdicts
+    }
+
+
+@app.post("/schedules/bulk")
+async def bulk_update_schedules(
+    request: ScheduleBulkRequest,
+    current_user: User = Depends(require_manager),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Apply a batch of create / move / delete operations (calendar drag-and-drop)
+    in one transaction. All operations are validated together against the
+    affected employee-weeks; if any is invalid nothing is saved and the
+    per-operation errors are returned.
+    """
+    department_id = None
+    if current_user.user_type == UserType.MANAGER:
+        department_id = await get_manager_department(current_user, db)
+        if not department_id:
+            raise HTTPException(status_code=400, detail="Manager department not found")
+
+    return await apply_bulk_operations(
+        db, [op.dict() for op in request.operations], department_id=department_id
+    )
+
+
 @app.put("/schedules/{schedule_id}", response_model=ScheduleResponse)
 async def update_schedule(
     schedule_id: int,
@@ -6239,15 +6015,11 @@ async def update_schedule(
     if schedule_data.date and schedule_data.date != schedule.date:
         new_date = schedule_data.date if isinstance(schedule_data.date, date) else datetime.strptime(schedule_data.date, '%Y-%m-%d').date()
         
-        # CONSTRAINT 1: Check 5 shifts per week limit
-        is_valid, error_msg = await validate_5_shifts_per_week(schedule.employee_id, new_date, db, exclude_schedule_id=schedule_id)
-        if not is_valid:
-            raise HTTPException(status_code=400, detail=error_msg)
-        
-        # CONSTRAINT 2: Check 5 consecutive shifts limit
-        is_valid, error_msg = await validate_consecutive_shifts_limit(schedule.employee_id, new_date, db, exclude_schedule_id=schedule_id)
-        if not is_valid:
-            raise HTTPException(status_code=400, detail=error_msg)
+        # Weekly shift requirement and 5 consecutive shifts limit
+        verdict = await validate_assignment(db, schedule.employee_id, new_date,
+                                            exclude_schedule_id=schedule_id)
+        if not verdict['valid']:
+            raise HTTPException(status_code=400, detail=verdict['errors'][0])
 
     for key, value in schedule_data.dict(exclude_unset=True).items():
         # Convert string date to date object if needed
@@ -6295,6 +6067,12 @@ async def generate_schedules(
     start_date: date,
     end_date: date,
     regenerate: bool = False,
+    engine: str = 'greedy',
+    run_async: bool = False,
+    repair: bool = False,
+    dry_run: bool = False,
+    accept_gap: Optional[float] = None,
+    stall_seconds: Optional[float] = None,
     current_user: User = Depends(require_manager),
     db: AsyncSession = Depends(get_db)
 ):
@@ -6307,9 +6085,36 @@ async def generate_schedules(
     3. Calculate each employee's capacity (shifts per week)
     4. Fairly assign shifts equally across different shift types
     5. Respect min_emp and max_emp constraints for each shift
+
+    engine:
+    - greedy: assign day by day, shift by shift (default)
+    - cpsat:  solve one OR-Tools CP-SAT model for the whole range
+
+    run_async: queue a background job and return its id immediately;
+    poll GET /schedules/generate/{job_id} for progress and the result
+
+    repair: after leave/unavailability changes, re-solve only the affected
+    employees' weeks (warm-started from the current schedule) and apply a
+    minimal insert/delete diff instead of regenerating the whole range
+
+    dry_run: run the engine without saving and return the diff against the
+    current schedule (added/removed/changed per employee and day) with
+    per-shift coverage; commit it with POST /schedules/generate/apply
+
+    accept_gap / stall_seconds (cpsat and repair): take the best schedule once
+    it is within this relative optimality gap (e.g. 0.02) or has not improved
+    for this many seconds, instead of waiting for OPTIMAL or the time limit.
+    Background jobs report each improving solution in their feedback.
     """
+    if engine not in ENGINES:
+        raise HTTPException(status_code=400, detail=f"Invalid engine '{engine}'. Use one of: {', '.join(ENGINES)}")
+    if accept_gap is not None and not 0 <= accept_gap <= 1:
+        raise HTTPException(status_code=400, detail="accept_gap must be between 0 and 1")
+    if stall_seconds is not None and stall_seconds < 0:
+        raise HTTPException(status_code=400, detail="stall_seconds must not be negative")
+
     try:
-        print(f"[DEBUG] Schedule generation started for dates {start_date} to {end_date}", flush=True)
+        print(f"[DEBUG] Schedule generation started for dates {start_date} to {end_date} (engine={engine}, repair={repair}, dry_run={dry_run})", flush=True)
 
         # Get manager's department
         department_id = await get_manager_department(current_user, db)
@@ -6318,595 +6123,120 @@ async def generate_schedules(
 
         print(f"[DEBUG] Department ID: {department_id}", flush=True)
 
-        # ===== NEW: Check if schedules already exist in this date range =====
-        existing_schedules_result = await db.execute(
-            select(Schedule)
-            .filter(
-                Schedule.department_id == department_id,
-                Schedule.date >= start_date,
-                Schedule.date <= end_date
+        if run_async:
+            job = await create_job(
+                db, department_id, current_user.id, start_date, end_date, regenerate, engine,
+                repair=repair, dry_run=dry_run,
+                accept_gap=accept_gap, stall_seconds=stall_seconds
             )
-        )
-        existing_schedules = existing_schedules_result.scalars().all()
-        
-        if existing_schedules and not regenerate:
-            # Return message asking if user wants to regenerate
+            print(f"[DEBUG] Queued generation job {job.id}", flush=True)
             return {
-                "success": False,
-                "schedules_created": 0,
-                "start_date": start_date.isoformat(),
-                "end_date": end_date.isoformat(),
-                "requires_confirmation": True,
-                "existing_count": len(existing_schedules),
-                "feedback": [
-                    f"⚠️  Found {len(existing_schedules)} existing schedules for this date range.",
-                    "Do you want to regenerate and replace them?"
-                ],
-                "schedules": []
+                "job_id": job.id,
+                "status": job.status,
+                "poll_url": f"/schedules/generate/{job.id}"
             }
-        
-        # ===== PRESERVE SCHEDULES WITH CHECK-INS DURING REGENERATION =====
-        # Get schedule IDs that have check-in records - these should NOT be deleted
-        schedules_with_checkins = set()
-        if existing_schedules and regenerate:
-            checkin_sched_result = await db.execute(
-                select(CheckInOut.schedule_id)
-                .where(CheckInOut.schedule_id != None)
-                .distinct()
-            )
-            schedules_with_checkins = set(checkin_sched_result.scalars().all())
-            
-            if schedules_with_checkins:
-                print(f"[DEBUG] Found {len(schedules_with_checkins)} schedules with check-in records - will skip deletion", flush=True)
-        
-        # If regenerate is True, delete existing schedules first (but PRESERVE leaves, comp-off, and schedules with check-ins)
-        if existing_schedules and regenerate:
-            print(f"[DEBUG] Regenerating - deleting {len(existing_schedules)} existing schedules (excluding ones with check-ins)", flush=True)
-            
-            # Get ONLY 'scheduled' schedules to delete (will recreate them)
-            # BUT: Exclude any that have check-in records
-            # Preserve: 'leave', 'leave_half_morning', 'leave_half_afternoon', 'comp_off_earned', 'comp_off_taken'
-            # comp_off_taken is approved leave and should NOT be deleted!
-            # Build filter conditions dynamically
-            filter_conditions = [
-                Schedule.department_id == department_id,
-                Schedule.date >= start_date,
-                Schedule.date <= end_date,
-                Schedule.status == 'scheduled'  # Only delete work shifts, NOT approved leaves or comp-off usage
-            ]
-            # Exclude schedules with check-ins if any exist
-            if schedules_with_checkins:
-                filter_conditions.append(~Schedule.id.in_(list(schedules_with_checkins)))
-            
-            schedules_to_delete_result = await db.execute(
-                select(Schedule.id).filter(*filter_conditions)
-            )
-            schedules_to_delete_ids = schedules_to_delete_result.scalars().all()
-            
-            if schedules_to_delete_ids:
-                print(f"[DEBUG] Deleting {len(schedules_to_delete_ids)} work shift schedules (excluding {len(schedules_with_checkins)} with check-ins)", flush=True)
-                
-                # IMPORTANT: Do NOT touch check-in records - they are historical data
-                # Just delete the schedules that don't have check-ins
-                
-                # Nullify in CompOffRequest table (preserve comp-off requests)
-                await db.execute(
-                    update(CompOffRequest)
-                    .where(CompOffRequest.schedule_id.in_(schedules_to_delete_ids))
-                    .values(schedule_id=None)
-                )
-                
-                # Nullify in Attendance table (preserve attendance records but remove schedule reference)
-                await db.execute(
-                    update(Attendance)
-                    .where(Attendance.schedule_id.in_(schedules_to_delete_ids))
-                    .values(schedule_id=None)
-                )
-            
-            # Now delete ONLY the work shift schedules that don't have check-ins
-            # (do NOT delete comp-off taken or approved leaves or schedules with check-ins)
-            delete_filter_conditions = [
-                Schedule.department_id == department_id,
-                Schedule.date >= start_date,
-                Schedule.date <= end_date,
-                Schedule.status == 'scheduled'  # Only delete work shifts, NOT comp-off taken or leaves
-            ]
-            # Exclude schedules with check-ins if any exist
-            if schedules_with_checkins:
-                delete_filter_conditions.append(~Schedule.id.in_(list(schedules_with_checkins)))
-            
-            await db.execute(
-                delete(Schedule).filter(*delete_filter_conditions)
-            )
-            await db.commit()
-            feedback = [f"Cleared work shift schedules. Generating new schedule (preserving comp-off, regular leaves, and schedules with check-ins)..."]
-        else:
-            feedback = []
 
-        # Get all roles in this department
-        roles_result = await db.execute(
-            select(Role)
-            .filter(Role.department_id == department_id, Role.is_active == True)
+        return await generate_department_schedules(
+            db, department_id, start_date, end_date,
+            regenerate=regenerate, engine=engine, repair=repair, dry_run=dry_run,
+            accept_gap=accept_gap, stall_seconds=stall_seconds
         )
-        roles = roles_result.scalars().all()
-        print(f"[DEBUG] Found {len(roles)} roles", flush=True)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error in schedule generation: {str(e)}", flush=True)
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Schedule generation error: {str(e)}")
 
-        if not roles:
-            return {
-                "success": True,
-                "schedules_created": 0,
-                "start_date": start_date.isoformat(),
-                "end_date": end_date.isoformat(),
-                "feedback": ["❌ No active roles found in your department. Create roles first."],
-                "schedules": []
-            }
 
-        # Get all shifts for these roles
-        role_ids = [r.id for r in roles]
-        shifts_result = await db.execute(
-            select(Shift)
-            .filter(Shift.role_id.in_(role_ids), Shift.is_active == True)
-        )
-        shifts = shifts_result.scalars().all()
-        print(f"[DEBUG] Found {len(shifts)} shifts", flush=True)
-
-        # Log shift details and ensure all shifts have schedule_config
-        print(f"[DEBUG] Processing {len(shifts)} shifts for schedule_config validation", flush=True)
-        for shift in shifts:
-            # For backward compatibility:
-            # - If shift has NO schedule_config or empty, assume ALL days are enabled
-            # - If shift has schedule_config, use the configured days
-            if not shift.schedule_config or not isinstance(shift.schedule_config, dict) or len(shift.schedule_config) == 0:
-                print(f"[DEBUG] Shift {shift.id} ({shift.name}) has empty/invalid schedule_config, enabling all days for backward compatibility", flush=True)
-                # Old shift without schedule_config - enable all days for backward compatibility
-                shift.schedule_config = {
-                    'Monday': {'enabled': True},
-                    'Tuesday': {'enabled': True},
-                    'Wednesday': {'enabled': True},
-                    'Thursday': {'enabled': True},
-                    'Friday': {'enabled': True},
-                    'Saturday': {'enabled': True},
-                    'Sunday': {'enabled': True}
-                }
-            else:
-                # Ensure all days have proper structure
-                if isinstance(shift.schedule_config, dict):
-                    for day in ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']:
-                        if day not in shift.schedule_config or not isinstance(shift.schedule_config[day], dict):
-                            # Missing day or malformed - fix it
-                            shift.schedule_config[day] = {'enabled': False}
-                        elif 'enabled' not in shift.schedule_config[day]:
-                            # Missing 'enabled' key - add it
-                            shift.schedule_config[day]['enabled'] = False
-            
-            enabled_days = [day for day, cfg in shift.schedule_config.items() if isinstance(cfg, dict) and cfg.get('enabled', False)]
-            print(f"[DEBUG] Final Shift: {shift.id} - {shift.name}, enabled_days={enabled_days}", flush=True)
+@app.post("/schedules/generate/apply")
+async def apply_generated_schedules(
+    preview: ScheduleDiffApply,
+    current_user: User = Depends(require_manager),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Commit the diff returned by POST /schedules/generate?dry_run=true in one
+    bulk transaction. Returns 409 if the range changed since the preview.
+    """
+    department_id = await get_manager_department(current_user, db)
+    if not department_id:
+        raise HTTPException(status_code=400, detail="Manager department not found")
 
-        if not shifts:
-            return {
-                "success": True,
-                "schedules_created": 0,
-                "start_date": start_date.isoformat(),
-                "end_date": end_date.isoformat(),
-                "feedback": ["❌ No active shifts found in your roles. Create shifts first."],
-                "schedules": []
-            }
+    result = await apply_schedule_diff(
+        db, department_id, preview.start_date, preview.end_date,
+        preview.base_fingerprint, preview.diff.model_dump(mode='json'), preview.preview_signature
+    )
+    if result.get('conflict'):
+        raise HTTPException(status_code=409, detail=result['feedback'][0])
+    if not result['success']:
+        raise HTTPException(status_code=400, detail=result['feedback'][0])
+    return result
 
-        # Get all employees in the department
-        employees_result = await db.execute(
-            select(Employee)
-            .filter(Employee.department_id == department_id, Employee.is_active == True)
-        )
-        employees = employees_result.scalars().all()
-        print(f"[DEBUG] Found {len(employees)} employees", flush=True)
 
-        # Log employee details
-        for emp in employees:
-            print(f"[DEBUG] Employee: {emp.id} - {emp.first_name}, active={emp.is_active}, weekly_hours={emp.weekly_hours}, daily_max={emp.daily_max_hours}, shifts_per_week={emp.shifts_per_week}", flush=True)
+@app.get("/schedules/generate/{job_id}", response_model=ScheduleGenerationJobResponse)
+async def get_generation_job(
+    job_id: str,
+    current_user: User = Depends(require_manager),
+    db: AsyncSession = Depends(get_db)
+):
+    """Status, progress, feedback and result of a background generation job"""
+    job = await db.get(ScheduleGenerationJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Generation job not found")
 
-        if not employees:
-            return {
-                "success": True,
-                "schedules_created": 0,
-                "start_date": start_date.isoformat(),
-                "end_date": end_date.isoformat(),
-                "feedback": ["❌ No active employees found in your department. Create employees first."],
-                "schedules": []
-            }
+    if current_user.user_type != UserType.ADMIN:
+        department_id = await get_manager_department(current_user, db)
+        if job.department_id != department_id:
+            raise HTTPException(status_code=403, detail="Not authorized to view this job")
 
-        # Generate date range (one schedule per shift per day)
-        current_date = start_date
-        schedules_created = 0
-        feedback = []
-        overtime_warnings = []  # Track shifts requiring overtime approval
-
-        # Group shifts by role for fair distribution
-        shifts_by_role = defaultdict(list)
-        for shift in shifts:
-            shifts_by_role[shift.role_id].append(shift)
-
-        # Calculate which employees are eligible for each shift (based on role)
-        # Strategy: Assign employees to shifts day-by-day
-        # Each employee gets ONE shift per day maximum (no double shifts)
-        # If shifts are Mon-Friday, all eligible employees get all 5 days
-        eligible_for_shift = {}  # {shift_id: [emp1, emp2, emp3...]} - only eligible employees per shift
-
-        print(f"[DEBUG] Building eligibility matrix for {len(shifts)} shifts and {len(employees)} employees", flush=True)
-        for shift in shifts:
-            eligible_for_shift[shift.id] = []
-            
-            for emp in employees:
-                # Employee is eligible if:
-                # 1. They have no specific role assignment (flexible=True), OR
-                # 2. Their role matches the shift's role
-                is_eligible = (emp.role_id is None) or (emp.role_id == shift.role_id)
-                
-                if is_eligible:
-                    eligible_for_shift[shift.id].append(emp)
-                    print(f"[DEBUG] Shift {shift.id} ({shift.name}): {emp.id} ({emp.first_name}) is ELIGIBLE", flush=True)
-                else:
-                    print(f"[DEBUG] Shift {shift.id} ({shift.name}): {emp.id} ({emp.first_name}) is NOT eligible (role mismatch: emp.role={emp.role_id} vs shift.role={shift.role_id})", flush=True)
-
-        # Create schedules
-        current_date = start_date
-        while current_date <= end_date:
-            day_name = current_date.strftime('%A')  # e.g., 'Monday', 'Sunday'
-            
-            # ===== SKIP PUBLIC HOLIDAYS - Don't assign shifts on holidays =====
-            if is_japanese_holiday(current_date):
-                holiday_name = get_japanese_holiday_name(current_date)
-                print(f"[DEBUG] Skipping {current_date} ({day_name}) - Public Holiday: {holiday_name}", flush=True)
-                current_date += timedelta(days=1)
-                continue
+    return job_to_response(job)
 
-            for shift in shifts:
-                # Check if shift operates on this day
-                role = next((r for r in roles if r.id == shift.role_id), None)
-                
-                # Determine if this shift should run on this day
-                should_skip = False
-                
-                if shift.schedule_config and isinstance(shift.schedule_config, dict):
-                    # Shift has a schedule_config with day configuration
-                    day_config = shift.schedule_config.get(day_name, {})
-                    is_day_enabled = day_config.get('enabled', False) if isinstance(day_config, dict) else False
-                    
-                    if not is_day_enabled:
-                        should_skip = True
-                        print(f"[DEBUG] ✗ Shift {shift.id} ({shift.name}) - Day {day_name} is disabled, skipping", flush=True)
-                    else:
-                        print(f"[DEBUG] ✓ Shift {shift.id} ({shift.name}) - Day {day_name} is ENABLED, processing", flush=True)
-                else:
-                    # No schedule_config or invalid format - skip to prevent unintended assignments
-                    should_skip = True
-                    print(f"[DEBUG] ✗ Shift {shift.id} ({shift.name}) - No valid schedule_config, skipping {day_name}", flush=True)
-
-                if should_skip:
-                    continue
-
-                # Assign employees to this shift on this day
-                # Only consider employees who are eligible for this shift
-                assigned_count = 0
-                
-                for emp in eligible_for_shift[shift.id]:
-                    # Check leave - if employee is on approved leave, mark them as leave (not shift)
-                    leave_result = await db.execute(
-                        select(LeaveRequest)
-                        .filter(
-                            LeaveRequest.employee_id == emp.id,
-                            LeaveRequest.start_date <= current_date,
-                            LeaveRequest.end_date >= current_date,
-                            LeaveRequest.status == LeaveStatus.APPROVED
-                        )
-                    )
-                    leave_request = leave_result.scalars().first()
-                    
-                    # Also check for approved comp-off requests
-                    comp_off_result = await db.execute(
-                        select(CompOffRequest)
-                        .filter(
-                            CompOffRequest.employee_id == emp.id,
-                            CompOffRequest.comp_off_date == current_date,
-                            CompOffRequest.status == LeaveStatus.APPROVED
-                        )
-                    )
-                    comp_off_request = comp_off_result.scalars().first()
-                    
-                    if leave_request or comp_off_request:
-                        # Employee is on approved leave or comp-off - create appropriate schedule entry
-                        existing_today = await db.execute(
-                            select(Schedule)
-                            .filter(
-                                Schedule.employee_id == emp.id,
-                                Schedule.date == current_date
-                            )
-                        )
-                        if not existing_today.scalars().first():
-                            # Determine status based on type
-                            if comp_off_request:
-                                # This is a comp-off earned day (employee worked, earned comp-off)
-                                # Get the correct shift time for this employee
-                                leave_status = 'comp_off_earned'
-                                
-                                # Try to get shift times from same week first
-                                week_start = current_date - timedelta(days=current_date.weekday())
-                                week_end = week_start + timedelta(days=6)
-                                
-                                week_shift = await db.execute(
-                                    select(Schedule)
-                                    .filter(
-                                        Schedule.employee_id == emp.id,
-                                        Schedule.date >= week_start,
-                                        Schedule.date <= week_end,
-                                        Schedule.date != current_date,
-                                        Schedule.status.in_(['scheduled', 'completed', 'comp_off_earned'])
-                                    )
-                                    .order_by(Schedule.date)
-                                    .limit(1)
-                                )
-                                week_sched = week_shift.scalar_one_or_none()
-                                
-                                if week_sched and week_sched.start_time and week_sched.end_time:
-                                    start_time = week_sched.start_time
-                                    end_time = week_sched.end_time
-                                else:
-                                    # Fallback to same day of week from previous weeks
-                                    day_name = current_date.strftime('%A')
-                                    same_day = await db.execute(
-                                        select(Schedule)
-                                        .filter(
-                                            Schedule.employee_id == emp.id,
-                                            func.to_char(Schedule.date, 'Day').ilike(f'%{day_name}%'),
-                                            Schedule.status.in_(['scheduled', 'completed', 'comp_off_earned'])
-                                        )
-                                        .order_by(Schedule.date.desc())
-                                        .limit(1)
-                                    )
-                                    same_day_sched = same_day.scalar_one_or_none()
-                                    
-                                    if same_day_sched and same_day_sched.start_time and same_day_sched.end_time:
-                                        start_time = same_day_sched.start_time
-                                        end_time = same_day_sched.end_time
-                                    else:
-                                        # Default fallback
-                                        start_time = "00:00"
-                                        end_time = "23:59"
-                                
-                                leave_notes = f"Comp-Off Earned: {comp_off_request.reason or 'Worked on non-shift day'}"
-                            elif leave_request.leave_type == 'comp_off':
-                                # This is using comp-off (taking the earned comp-off) - no shift times, full day off
-                                leave_status = 'comp_off_taken'
-                                start_time = None  # No shift time for comp-off usage
-                                end_time = None
-                                leave_notes = f"Comp-Off Taken: {leave_request.reason or 'Using earned comp-off'}"
-                            elif leave_request.duration_type == 'half_day_morning':
-                                leave_status = 'leave_half_morning'
-                                # Use shift's start time to 12:00 for morning leave
-                                start_time = shift.start_time
-                                end_time = "12:00"
-                                leave_notes = f"Half Day Leave (Morning) - {leave_request.leave_type}"
-                            elif leave_request.duration_type == 'half_day_afternoon':
-                                leave_status = 'leave_half_afternoon'
-                                # Use 12:00 to shift's end time for afternoon leave
-                                start_time = "12:00"
-                                end_time = shift.end_time
-                                leave_notes = f"Half Day Leave (Afternoon) - {leave_request.leave_type}"
-                            else:
-                                # Full day leave - use the actual shift times
-                                leave_status = 'leave'
-                                start_time = shift.start_time
-                                end_time = shift.end_time
-                                leave_notes = f"Full Day Leave - {leave_request.leave_type}"
-
-                            leave_type_desc = 'comp-off' if comp_off_request else leave_request.leave_type
-                            print(f"[DEBUG] ✓ {emp.first_name} is on approved {leave_type_desc} on {current_date}, creating {leave_status} schedule", flush=True)
-                            leave_schedule = Schedule(
-                                department_id=department_id,
-                                employee_id=emp.id,
-                                role_id=shift.role_id,
-                                shift_id=shift.id,
-                                date=current_date,
-                                start_time=start_time,
-                                end_time=end_time,
-                                status=leave_status,
-                                notes=leave_notes
-                            )
-                            db.add(leave_schedule)
-                            schedules_created += 1
-                        else:
-                            print(f"[DEBUG] ✗ {emp.first_name} already has a schedule entry on {current_date}, skipping leave creation", flush=True)
-                        continue  # Don't assign shift for leave/comp-off day
-                    
-                    # CRITICAL: Check if employee already has a shift on this day (NO DOUBLE SHIFTS)
-                    existing_today = await db.execute(
-                        select(Schedule)
-                        .filter(
-                            Schedule.employee_id == emp.id,
-                            Schedule.date == current_date
-                        )
-                    )
-                    if existing_today.scalars().first():
-                        print(f"[DEBUG] ✗ {emp.first_name} already has a shift on {current_date}, skipping (NO DOUBLE SHIFTS)", flush=True)
-                        continue  # Skip if employee already has a shift today
-                    
-                    print(f"[DEBUG] Checking {emp.first_name} ({emp.id}) for shift {shift.id} ({shift.name}) on {current_date}", flush=True)
-                    
-                    # Check 5 consecutive shifts limit
-                    week_start = current_date - timedelta(days=current_date.weekday())
-                    week_end = week_start + timedelta(days=6)
-                    
-                    consecutive_check = await db.execute(
-                        select(Schedule)
-                        .filter(
-                            Schedule.employee_id == emp.id,
-                            Schedule.date >= week_start,
-                            Schedule.date <= week_end,
-                            Schedule.status.in_(['scheduled', 'completed', 'comp_off_earned'])  # Exclude 'leave', 'comp_off_taken' status
-                        )
-                        .order_by(Schedule.date)
-                    )
-                    week_schedules = consecutive_check.scalars().all()
-                    
-                    # Check consecutive shifts INCLUDING the new one
-                    # NOTE: Leave days are not counted as "shifts" for the consecutive limit
-                    week_dates = [s.date for s in week_schedules]
-                    if current_date not in week_dates:
-                        week_dates.append(current_date)
-                    
-                    week_dates.sort()
-                    max_consecutive = 1
-                    current_consecutive = 1
-                    
-                    for i in range(1, len(week_dates)):
-                        if (week_dates[i] - week_dates[i-1]).days == 1:
-                            current_consecutive += 1
-                            max_consecutive = max(max_consecutive, current_consecutive)
-                        else:
-                            current_consecutive = 1
-                    
-                    if max_consecutive > 5:
-                        print(f"[DEBUG] ✗ {emp.first_name} would have {max_consecutive} consecutive shifts, skipping (MAX 5 consecutive)", flush=True)
-                        continue  # Skip if would exceed 5 consecutive shifts
-
-                    # Fetch existing schedules for the week (with eager loading of role)
-                    # IMPORTANT: Only count actual work shifts, not leave days, for hour calculations
-                    existing_schedules_result = await db.execute(
-                        select(Schedule)
-                        .filter(
-                            Schedule.employee_id == emp.id,
-                            Schedule.date >= week_start,
-                            Schedule.date <= week_end,
-                            Schedule.status.in_(['scheduled', 'completed', 'comp_off_earned'])  # Exclude 'leave', 'comp_off_taken' status
-                        )
-                        .options(selectinload(Schedule.role))
-                    )
-                    existing_schedules = existing_schedules_result.scalars().all()
-
-                    # Also count leave days for scheduling fairness, but not for hours calculation
-                    leave_schedules_result = await db.execute(
-                        select(Schedule)
-                        .filter(
-                            Schedule.employee_id == emp.id,
-                            Schedule.date >= week_start,
-                            Schedule.date <= week_end,
-                            Schedule.status.in_(['leave', 'leave_half_morning', 'leave_half_afternoon', 'comp_off_taken'])
-                        )
-                    )
-                    leave_schedules = leave_schedules_result.scalars().all()
-                    leave_days_count = len(leave_schedules)
-
-                    # Calculate existing hours in Python, subtracting break time
-                    # NOTE: Leave days don't add to hour count, but they fulfill part of weekly requirement
-                    existing_hours = 0
-                    existing_hours_today = 0
-                    for sched in existing_schedules:
-                        if sched.start_time and sched.end_time:
-                            try:
-                                start = datetime.strptime(sched.start_time, '%H:%M')
-                                end = datetime.strptime(sched.end_time, '%H:%M')
-                                total_hours = (end - start).total_seconds() / 3600
-
-                                # Subtract break time from role
-                                break_hours = (sched.role.break_minutes or 0) / 60 if sched.role else 0
-                                work_hours = total_hours - break_hours
-
-                                existing_hours += work_hours
-                                # Check hours for current day
-                                if sched.date == current_date:
-                                    existing_hours_today += work_hours
-                            except (ValueError, TypeError):
-                                pass
-
-                    # Calculate shift hours (total time) and work hours (minus breaks)
-                    shift_start = datetime.strptime(shift.start_time, '%H:%M')
-                    shift_end = datetime.strptime(shift.end_time, '%H:%M')
-                    total_shift_hours = (shift_end - shift_start).total_seconds() / 3600
-
-                    # Subtract break time from role
-                    break_hours = (role.break_minutes or 0) / 60
-                    work_hours = total_shift_hours - break_hours
-
-                    # Check both weekly and daily limits using work hours (excluding breaks)
-                    daily_max = emp.daily_max_hours or 8
-                    print(f"[DEBUG] {emp.first_name}: weekly {existing_hours:.1f}+{work_hours:.1f}<={emp.weekly_hours}, daily {existing_hours_today:.1f}+{work_hours:.1f}<={daily_max}", flush=True)
-
-                    # ===== Check for overtime (> 9 hours total in a day) =====
-                    daily_total_with_shift = existing_hours_today + total_shift_hours
-                    has_overtime = daily_total_with_shift > 9
-                    
-                    if has_overtime:
-                        overtime_warnings.append({
-                            'employee_id': emp.id,
-                            'employee_name': f"{emp.first_name} {emp.last_name}",
-                            'date': current_date.isoformat(),
-                            'shift_hours': total_shift_hours,
-                            'existing_daily_hours': existing_hours_today,
-                            'total_daily_hours': daily_total_with_shift,
-                            'total_weekly_hours': existing_hours + work_hours,
-                            'message': f"Total {daily_total_with_shift:.1f}h on {current_date} (includes {total_shift_hours}h shift)"
-                        })
-                        print(f"[DEBUG] ⚠️  OVERTIME: {emp.first_name} would work {daily_total_with_shift:.1f} hours on {current_date}", flush=True)
-
-                    if (existing_hours + work_hours <= emp.weekly_hours and
-                        existing_hours_today + work_hours <= daily_max):
-                        
-                        # ===== NEW: Check 5-shifts-per-week limit with holiday awareness =====
-                        is_valid_shifts, shifts_error = await validate_5_shifts_per_week(emp.id, current_date, db)
-                        if not is_valid_shifts:
-                            print(f"[DEBUG] ✗ {emp.first_name} failed 5-shifts validation on {current_date}: {shifts_error}", flush=True)
-                            continue  # Skip this employee for this shift due to weekly shift limit
-                        
-                        print(f"[DEBUG] ✓ Creating schedule for {emp.first_name} on {current_date}", flush=True)
-                        # Create schedule
-                        schedule = Schedule(
-                            department_id=department_id,
-                            employee_id=emp.id,
-                            role_id=shift.role_id,
-                            shift_id=shift.id,
-                            date=current_date,
-                            start_time=shift.start_time,
-                            end_time=shift.end_time,
-                            status="scheduled"
-                        )
-                        db.add(schedule)
-                        schedules_created += 1
-                        assigned_count += 1
-                        
-                        if assigned_count >= shift.max_emp:
-                            break  # Max employees for this shift on this day
-                    else:
-                        print(f"[DEBUG] ✗ {emp.first_name} failed hours check on {current_date}", flush=True)
 
-                # Ensure minimum employees are assigned
-                if assigned_count < shift.min_emp:
-                    feedback.append(f"Warning: {shift.name} on {current_date} has {assigned_count} employees (min: {shift.min_emp})")
+@app.get("/admin/solver/stats")
+async def get_solver_stats(
+    current_user: User = Depends(require_admin)
+):
+    """Solver process pool status: queue depth, in-flight solves, thread budget, totals and cache hits"""
+    return {
+        **solver_pool.stats(),
+        'resources': solver_resources.stats(),
+        'solution_cache': solution_cache.stats()
+    }
 
-            current_date += timedelta(days=1)
 
-        await db.commit()
+@app.get("/admin/solver/telemetry")
+async def get_solver_telemetry(
+    days: int = 30,
+    department_id: Optional[int] = None,
+    current_user: User = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Schedule generation telemetry per department over the last `days` days:
+    model size (and its growth), time per step, solver status and search
+    effort. Departments with the largest models come first.
+    """
+    if days < 1:
+        raise HTTPException(status_code=400, detail="days must be at least 1")
+    return {
+        'days': days,
+        'departments': await department_summary(db, days=days, department_id=department_id)
+    }
 
-        feedback.insert(0, f"Successfully generated {schedules_created} schedules")
-        
-        # Add overtime warnings to feedback
-        if overtime_warnings:
-            feedback.append(f"⚠️  {len(overtime_warnings)} overtime alert(s) - shifts exceed 9 hours on that day")
 
-        return {
-            "success": True,
-            "schedules_created": schedules_created,
-            "start_date": start_date.isoformat(),
-            "end_date": end_date.isoformat(),
-            "feedback": feedback,
-            "overtime_warnings": overtime_warnings,
-            "schedules": []
-        }
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"Error in schedule generation: {str(e)}", flush=True)
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Schedule generation error: {str(e)}")
+@app.post("/admin/week-stats/rebuild")
+async def rebuild_employee_week_stats(
+    current_user: User = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    """Recompute the employee_week_stats read model from all schedules"""
+    result = await rebuild_week_stats(db)
+    return {
+        **result,
+        'feedback': [f"Rebuilt {result['weeks']} employee-weeks from {result['schedules']} schedules in {result['seconds']}s"]
+    }
 
 
 @app.get("/schedules/conflicts")
@@ -3,7 +3,7 @@ Database Models for Shift Scheduler - Normalized Schema V6
 Optimized with clean foreign key relationships
 """
 
-from sqlalchemy import Column, Integer, String, Boolean, Float, DateTime, ForeignKey, JSON, Date, Text, Enum as SQLEnum
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, Float, DateTime, ForeignKey, JSON, Date, Text, Enum as SQLEnum
 from sqlalchemy.orm import relationship, declarative_base
 from datetime import datetime
 import enum
@@ -439,3 +439,90 @@ class CompOffDetail(Base):
 
     # Relationships
     tracking = relationship("CompOffTracking", back_populates="comp_off_details")
+
+
+class ScheduleGenerationJob(Base):
+    """Background schedule generation job with progress for polling clients"""
+    __tablename__ = "schedule_generation_jobs"
+
+    id = Column(String(36), primary_key=True)  # UUID
+    department_id = Column(Integer, ForeignKey('departments.id', name='fk_genjob_department', ondelete='CASCADE'), nullable=False, index=True)
+    requested_by = Column(Integer, ForeignKey('users.id', name='fk_genjob_user', ondelete='SET NULL'), nullable=True)
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=False)
+    regenerate = Column(Boolean, default=False)
+    engine = Column(String(20), default='greedy')
+    repair = Column(Boolean, default=False)  # Incremental repair instead of full generation
+    dry_run = Column(Boolean, default=False)  # Preview only - result holds the diff, nothing is written
+    accept_gap = Column(Float, nullable=True)  # CP-SAT early-accept optimality gap (None = setting)
+    stall_seconds = Column(Float, nullable=True)  # CP-SAT early-accept stall time (None = setting)
+    status = Column(String(20), default='queued', index=True)  # queued, running, completed, failed
+    progress = Column(Integer, default=0)  # Percent complete (0-100)
+    feedback = Column(JSON, default=list)
+    overtime_warnings = Column(JSON, default=list)
+    schedules_created = Column(Integer, default=0)
+    result = Column(JSON, nullable=True)  # Final response of the generation
+    error = Column(Text, nullable=True)
+    worker_id = Column(String(100), nullable=True)  # host:pid of the worker running it
+    heartbeat_at = Column(DateTime, nullable=True)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class ScheduleSolutionCache(Base):
+    """Solved CP-SAT assignments keyed by a fingerprint of the solver inputs"""
+    __tablename__ = "schedule_solution_cache"
+
+    key = Column(String(64), primary_key=True)  # SHA-256 of the canonical solver inputs
+    department_id = Column(Integer, ForeignKey('departments.id', name='fk_solcache_department', ondelete='CASCADE'), nullable=False, index=True)
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=False)
+    result = Column(JSON, nullable=False)  # Serialized solve result (schedule, coverage, status)
+    hit_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class SolverRunTelemetry(Base):
+    """Structured timings, model size and search statistics of one schedule generation"""
+    __tablename__ = "solver_run_telemetry"
+
+    id = Column(Integer, primary_key=True, index=True)
+    department_id = Column(Integer, ForeignKey('departments.id', name='fk_solvertel_department', ondelete='CASCADE'), nullable=False, index=True)
+    engine = Column(String(20), nullable=False)  # greedy, cpsat, repair
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=False)
+    employees = Column(Integer, default=0)
+    shifts = Column(Integer, default=0)
+    success = Column(Boolean, default=True)
+    status = Column(String(20))  # Worst solver status over the run's models (OPTIMAL, FEASIBLE, ...)
+    models = Column(Integer, default=0)  # CP-SAT models solved (excluding cache hits)
+    cached_models = Column(Integer, default=0)
+    variables = Column(Integer, default=0)  # Summed over models
+    constraints = Column(Integer, default=0)  # Summed over models
+    objective = Column(Float, nullable=True)
+    best_bound = Column(Float, nullable=True)
+    branches = Column(BigInteger, default=0)
+    conflicts = Column(BigInteger, default=0)
+    steps = Column(JSON, default=dict)  # step -> seconds (load, assign, model steps, solve, extraction, persist)
+    model_details = Column(JSON, default=list)  # Per-model telemetry from the generator
+    total_seconds = Column(Float, default=0.0)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class EmployeeWeekStats(Base):
+    """Per-employee ISO-week coverage counters, maintained with every schedule write"""
+    __tablename__ = "employee_week_stats"
+
+    employee_id = Column(Integer, ForeignKey('employees.id', name='fk_weekstats_employee', ondelete='CASCADE'), primary_key=True)
+    week_start = Column(Date, primary_key=True)  # Monday of the ISO week
+    weekday_coverage = Column(Integer, default=0)  # Mon-Fri shifts, leaves and comp-offs
+    weekend_regular = Column(Integer, default=0)  # Sat-Sun regular shifts and leaves
+    work_hours = Column(Float, default=0.0)  # Hours of worked statuses
+    leave_days = Column(Float, default=0.0)  # Leave and comp-off days (half days count 0.5)
+    max_consecutive = Column(Integer, default=0)  # Longest run of occupied days in the week
+    day_occupancy = Column(JSON, default=list)  # Mon..Sun: rows occupying the day for the consecutive limit
+    day_hours = Column(JSON, default=list)  # Mon..Sun: worked hours
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,164 @@
+"""
+Authenticated Principal Cache
+
+get_current_user resolves the token subject to a compact, read-only
+Principal (user id, username, type, active flag, employee id, manager id and
+department id) loaded with one query and cached by subject for
+PRINCIPAL_CACHE_TTL_SECONDS. Handlers read the department from the principal
+instead of querying the Manager / Employee row again.
+
+Entries are dropped when a commit changes what they hold: a user created,
+updated (identity, type, active flag), deactivated or deleted, or an employee
+or manager record linked, reassigned to another department or removed
+(update_manager, reassign_manager, delete_user, delete_employee, ...). The
+TTL bounds staleness from writes made by other worker processes.
+"""
+
+import time
+from collections import defaultdict
+from typing import Dict, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import User, UserType, Employee, Manager
+
+
+# Columns whose change makes a cached principal stale
+USER_FIELDS = ('username', 'email', 'full_name', 'user_type', 'is_active')
+LINK_FIELDS = ('user_id', 'department_id', 'is_active')
+
+# session.info key for users touched by the pending transaction
+_PENDING_KEY = 'principal_cache_users'
+
+
+class Principal:
+    """The authenticated user as the API sees it (shared between requests: do not modify)"""
+
+    __slots__ = ('id', 'username', 'email', 'full_name', 'user_type', 'is_active',
+                 'employee_id', 'manager_id', 'department_id')
+
+    def __init__(self, user: User, employee_id: Optional[int], manager_id: Optional[int],
+                 department_id: Optional[int]):
+        self.id = user.id
+        self.username = user.username
+        self.email = user.email
+        self.full_name = user.full_name
+        self.user_type = user.user_type
+        self.is_active = user.is_active
+        self.employee_id = employee_id  # employees.id of an employee user
+        self.manager_id = manager_id  # managers.id of a manager user
+        self.department_id = department_id  # Manager's or employee's department
+
+    def __repr__(self):
+        return f"<Principal {self.username} ({self.user_type}) dept={self.department_id}>"
+
+
+async def load_principal(db: AsyncSession, username: str) -> Optional[Principal]:
+    """User plus its employee / manager link in one query"""
+    result = await db.execute(
+        select(User, Employee.id, Employee.department_id, Manager.id, Manager.department_id)
+        .outerjoin(Employee, Employee.user_id == User.id)
+        .outerjoin(Manager, Manager.user_id == User.id)
+        .where(User.username == username)
+        .order_by(Employee.id)
+        .limit(1)
+    )
+    row = result.first()
+    if row is None:
+        return None
+    user, employee_id, employee_department_id, manager_id, manager_department_id = row
+    department_id = None
+    if user.user_type == UserType.MANAGER:
+        department_id = manager_department_id
+    elif user.user_type == UserType.EMPLOYEE:
+        department_id = employee_department_id
+    return Principal(user, employee_id, manager_id, department_id)
+
+
+class PrincipalCache:
+    """Token subject -> Principal with a short TTL and commit-time invalidation"""
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[Principal, float]] = {}
+        self._usernames: Dict[int, str] = {}  # user id -> cached subject
+        # Versions so a load that raced a commit is not cached: bumped per subject,
+        # and per user id (the user may not be cached yet, so its subject is unknown)
+        self._versions: Dict[str, int] = defaultdict(int)
+        self._sequence = 0
+        self._invalidated_at: Dict[int, int] = {}  # user id -> sequence of its last invalidation
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, db: AsyncSession, username: str) -> Optional[Principal]:
+        entry = self._entries.get(username)
+        now = time.monotonic()
+        if entry is not None and entry[1] > now:
+            self.hits += 1
+            return entry[0]
+        self.misses += 1
+        version, sequence = self._versions[username], self._sequence
+        principal = await load_principal(db, username)
+        if principal is None:
+            self._entries.pop(username, None)
+        elif (self._versions[username] == version
+              and self._invalidated_at.get(principal.id, 0) <= sequence):
+            self._entries[username] = (principal, now + settings.PRINCIPAL_CACHE_TTL_SECONDS)
+            self._usernames[principal.id] = username
+        return principal
+
+    def invalidate_user(self, user_id: int):
+        self._sequence += 1
+        self._invalidated_at[user_id] = self._sequence
+        username = self._usernames.pop(user_id, None)
+        if username is not None:
+            self._versions[username] += 1
+            self._entries.pop(username, None)
+
+    def clear(self):
+        self._entries.clear()
+        self._usernames.clear()
+
+
+# Global instance
+principal_cache = PrincipalCache()
+
+
+# ===== ORM change tracking =====
+
+def _changed(obj, fields) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[field].history.has_changes() for field in fields)
+
+
+def _user_ids(obj) -> Set[int]:
+    history = inspect(obj).attrs.user_id.history
+    return {obj.user_id, *(history.deleted or ())} - {None}
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_principal_changes(session, flush_context, instances):
+    user_ids = session.info.setdefault(_PENDING_KEY, set())
+    for obj in session.dirty:
+        if isinstance(obj, User) and obj.id is not None and _changed(obj, USER_FIELDS):
+            user_ids.add(obj.id)
+        elif isinstance(obj, (Employee, Manager)) and _changed(obj, LINK_FIELDS):
+            user_ids |= _user_ids(obj)
+    for obj in (*session.new, *session.deleted):
+        if isinstance(obj, User) and obj.id is not None:
+            user_ids.add(obj.id)
+        elif isinstance(obj, (Employee, Manager)):
+            user_ids |= _user_ids(obj)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_principal_changes(session):
+    for user_id in session.info.pop(_PENDING_KEY, ()):
+        principal_cache.invalidate_user(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_principal_changes(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,344 @@
+"""
+Daily Roster Cache
+
+In-process cache of each department's roster for a day, keyed by
+(department_id, date): employee_id -> the day's schedule (id, role, shift,
+start/end time, status, role break), whether the employee is off (approved
+leave, or a leave / comp-off schedule) and the names of the department's
+active employees. Check-in, check-out and /attendance/today read it instead
+of re-deriving the same facts from the database on every call.
+
+Today's rosters are pre-warmed ROSTER_PREWARM_MINUTES before the day's first
+shift and refreshed in the background while the day runs. Commits that touch
+a cached day invalidate exactly the affected rosters: schedule inserts,
+updates and deletes (ORM flushes, plus touch() from the statement-based
+writers), leave and comp-off request changes and employee changes.
+ROSTER_CACHE_TTL_SECONDS bounds staleness from writes made by other worker
+processes.
+"""
+
+import asyncio
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import event, func, inspect, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import async_session_maker
+from app.models import (
+    Schedule, Employee, Department, Role, LeaveRequest, CompOffRequest, LeaveStatus
+)
+
+
+# Schedule statuses that mean the employee is off that day
+OFF_DAY_STATUSES = ('leave', 'comp_off_taken', 'comp_off_earned', 'leave_half_morning', 'leave_half_afternoon')
+
+# Schedule columns kept in a roster entry (the ScheduleResponse fields)
+SCHEDULE_FIELDS = (
+    'id', 'department_id', 'employee_id', 'role_id', 'shift_id', 'date',
+    'start_time', 'end_time', 'status', 'notes'
+)
+
+WARM_POLL_SECONDS = 30
+
+# session.info key for rosters touched by the pending transaction
+_PENDING_KEY = 'roster_cache_touches'
+
+RosterKey = Tuple[int, date]
+
+
+class DailyRoster:
+    """One department's roster for one day"""
+
+    def __init__(self, department_id: int, day: date, employees: Dict[int, str],
+                 schedules: List[Dict], leaves: Dict[int, str]):
+        self.department_id = department_id
+        self.day = day
+        self.loaded_at = time.monotonic()
+        self.employees = employees  # Active department employees: id -> display name
+        self.schedules = schedules  # The day's schedules, ordered by start time
+        self.entries: Dict[int, Dict] = {}
+        for schedule in schedules:
+            entry = self._entry(schedule['employee_id'])
+            if schedule['status'] in OFF_DAY_STATUSES:
+                entry['off_day'] = True
+            if entry['schedule'] is None:
+                entry['schedule'] = schedule
+        for employee_id, leave_type in leaves.items():
+            self._entry(employee_id)['leave_type'] = leave_type
+
+    def _entry(self, employee_id: int) -> Dict:
+        return self.entries.setdefault(employee_id, {'schedule': None, 'off_day': False, 'leave_type': None})
+
+    def entry(self, employee_id: int) -> Dict:
+        """{'schedule': snapshot or None, 'off_day', 'leave_type'} for an employee"""
+        return self.entries.get(employee_id) or {'schedule': None, 'off_day': False, 'leave_type': None}
+
+    def involves(self, employee_id: int) -> bool:
+        return employee_id in self.employees or employee_id in self.entries
+
+
+async def load_roster(db: AsyncSession, department_id: int, day: date) -> DailyRoster:
+    """Build a roster from the database (three queries)"""
+    department_employees = select(Employee.id).where(Employee.department_id == department_id)
+
+    emp_result = await db.execute(
+        select(Employee.id, Employee.first_name, Employee.last_name)
+        .where(Employee.department_id == department_id, Employee.is_active == True)
+    )
+    employees = {emp_id: f"{first_name} {last_name}" for emp_id, first_name, last_name in emp_result.all()}
+
+    sched_result = await db.execute(
+        select(*(getattr(Schedule, field) for field in SCHEDULE_FIELDS), Role.break_minutes)
+        .outerjoin(Role, Role.id == Schedule.role_id)
+        .where(
+            Schedule.date == day,
+            or_(Schedule.department_id == department_id, Schedule.employee_id.in_(department_employees))
+        )
+        .order_by(Schedule.start_time, Schedule.employee_id, Schedule.id)
+    )
+    schedules = [
+        dict(zip(SCHEDULE_FIELDS + ('break_minutes',), row))
+        for row in sched_result.all()
+    ]
+
+    leave_result = await db.execute(
+        select(LeaveRequest.employee_id, LeaveRequest.leave_type)
+        .where(
+            LeaveRequest.employee_id.in_(department_employees),
+            LeaveRequest.start_date <= day,
+            LeaveRequest.end_date >= day,
+            LeaveRequest.status == LeaveStatus.APPROVED
+        )
+        .order_by(LeaveRequest.id)
+    )
+    leaves = {}
+    for employee_id, leave_type in leave_result.all():
+        leaves.setdefault(employee_id, leave_type)
+
+    return DailyRoster(department_id, day, employees, schedules, leaves)
+
+
+async def schedule_snapshot(db: AsyncSession, schedule_id: int) -> Optional[Dict]:
+    """One schedule in roster form, for schedules outside the cached rosters"""
+    result = await db.execute(
+        select(*(getattr(Schedule, field) for field in SCHEDULE_FIELDS), Role.break_minutes)
+        .outerjoin(Role, Role.id == Schedule.role_id)
+        .where(Schedule.id == schedule_id)
+    )
+    row = result.first()
+    return dict(zip(SCHEDULE_FIELDS + ('break_minutes',), row)) if row else None
+
+
+async def employee_day_schedule(db: AsyncSession, employee_id: int, day: date) -> Optional[Dict]:
+    """An employee's first schedule of a day in roster form (the roster entry's schedule)"""
+    result = await db.execute(
+        select(*(getattr(Schedule, field) for field in SCHEDULE_FIELDS), Role.break_minutes)
+        .outerjoin(Role, Role.id == Schedule.role_id)
+        .where(Schedule.employee_id == employee_id, Schedule.date == day)
+        .order_by(Schedule.start_time, Schedule.id)
+        .limit(1)
+    )
+    row = result.first()
+    return dict(zip(SCHEDULE_FIELDS + ('break_minutes',), row)) if row else None
+
+
+class RosterCache:
+    """(department_id, date) -> DailyRoster, with precise invalidation and a pre-warm loop"""
+
+    def __init__(self):
+        self._rosters: Dict[RosterKey, DailyRoster] = {}
+        self._loading: Dict[RosterKey, asyncio.Task] = {}
+        # Bumped on invalidation so a load that raced a commit is not cached
+        self._versions: Dict[RosterKey, int] = defaultdict(int)
+        self._task: Optional[asyncio.Task] = None
+        self.warmed_day: Optional[date] = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def get(self, department_id: int, day: Optional[date] = None) -> DailyRoster:
+        """Cached roster, loading it (once, however many callers wait) when missing or expired"""
+        key = (department_id, day or date.today())
+        roster = self._rosters.get(key)
+        if roster is not None and time.monotonic() - roster.loaded_at < settings.ROSTER_CACHE_TTL_SECONDS:
+            self.hits += 1
+            return roster
+        self.misses += 1
+        return await self._reload(key)
+
+    async def _reload(self, key: RosterKey) -> DailyRoster:
+        task = self._loading.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key))
+            self._loading[key] = task
+            task.add_done_callback(lambda done: self._loading.pop(key) if self._loading.get(key) is done else None)
+        return await asyncio.shield(task)
+
+    async def _load(self, key: RosterKey) -> DailyRoster:
+        version = self._versions[key]
+        async with async_session_maker() as db:
+            roster = await load_roster(db, *key)
+        if self._versions[key] == version:
+            self._rosters[key] = roster
+        return roster
+
+    # ===== Invalidation =====
+
+    def _drop(self, key: RosterKey):
+        self._versions[key] += 1
+        # Callers arriving after the commit must not join a load that started before it
+        self._loading.pop(key, None)
+        if self._rosters.pop(key, None) is not None:
+            self.invalidations += 1
+
+    def apply(self, touches: Set[Tuple]):
+        """
+        Invalidate rosters for committed changes:
+        ('department', department_id, day) or ('employee', employee_id, first_day, last_day)
+        (days None = every day)
+        """
+        keys = set(self._rosters) | set(self._loading)
+        for touch in touches:
+            if touch[0] == 'department':
+                _, department_id, day = touch
+                self._drop((department_id, day))
+                continue
+            _, employee_id, first_day, last_day = touch
+            if employee_id is None:
+                continue
+            for key in keys:
+                if first_day is not None and not (first_day <= key[1] <= (last_day or first_day)):
+                    continue
+                roster = self._rosters.get(key)
+                # A roster still loading may or may not include the employee
+                if roster is None or roster.involves(employee_id):
+                    self._drop(key)
+
+    # ===== Pre-warm =====
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            print("✓ Daily roster cache warmer started")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def warm(self, day: date) -> int:
+        """Load the rosters of every active department for a day"""
+        async with async_session_maker() as db:
+            result = await db.execute(select(Department.id).where(Department.is_active == True))
+            department_ids = [row[0] for row in result.all()]
+        for department_id in department_ids:
+            await self._reload((department_id, day))
+        return len(department_ids)
+
+    async def _first_shift_start(self, day: date) -> Optional[datetime]:
+        async with async_session_maker() as db:
+            result = await db.execute(
+                select(func.min(Schedule.start_time)).where(Schedule.date == day, Schedule.status == 'scheduled')
+            )
+            start_time = result.scalar()
+        try:
+            return datetime.combine(day, datetime.strptime(start_time, "%H:%M").time())
+        except (TypeError, ValueError):
+            return None
+
+    async def _run(self):
+        while True:
+            try:
+                today = date.today()
+                if self.warmed_day != today:
+                    first_start = await self._first_shift_start(today)
+                    lead = timedelta(minutes=settings.ROSTER_PREWARM_MINUTES)
+                    if first_start is None or datetime.now() >= first_start - lead:
+                        for key in [k for k in self._rosters if k[1] < today]:
+                            self._rosters.pop(key, None)
+                        warmed = await self.warm(today)
+                        self.warmed_day = today
+                        print(f"[DEBUG] Pre-warmed {warmed} department rosters for {today}", flush=True)
+                else:
+                    # Refresh ahead of expiry so the cache stays warm through the day
+                    refresh_after = settings.ROSTER_CACHE_TTL_SECONDS / 2
+                    now = time.monotonic()
+                    for key, roster in list(self._rosters.items()):
+                        if key[1] == today and now - roster.loaded_at >= refresh_after:
+                            await self._reload(key)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[DEBUG] Roster warmer error: {e}", flush=True)
+            await asyncio.sleep(WARM_POLL_SECONDS)
+
+    def stats(self) -> Dict:
+        return {
+            'rosters': len(self._rosters),
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'warmed_day': self.warmed_day.isoformat() if self.warmed_day else None,
+        }
+
+
+# Global instance
+roster_cache = RosterCache()
+
+
+def touch(db: AsyncSession, department_id: int, day: date):
+    """Invalidate a roster when db commits (for statement writes the flush events do not see)"""
+    db.info.setdefault(_PENDING_KEY, set()).add(('department', department_id, day))
+
+
+def touch_employee(db: AsyncSession, employee_id: int, first_day: date, last_day: date):
+    """Invalidate, when db commits, the rosters an employee is on between two days"""
+    db.info.setdefault(_PENDING_KEY, set()).add(('employee', employee_id, first_day, last_day))
+
+
+# ===== ORM change tracking =====
+
+def _history_values(obj, attribute: str) -> Set:
+    state = inspect(obj)
+    return {getattr(obj, attribute), *(state.attrs[attribute].history.deleted or ())} - {None}
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_roster_touches(session, flush_context, instances):
+    touches = session.info.setdefault(_PENDING_KEY, set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Schedule):
+            days = _history_values(obj, 'date')
+            for department_id in _history_values(obj, 'department_id'):
+                touches.update(('department', department_id, day) for day in days)
+            for employee_id in _history_values(obj, 'employee_id'):
+                touches.update(('employee', employee_id, day, day) for day in days)
+        elif isinstance(obj, LeaveRequest):
+            touches.add(('employee', obj.employee_id, obj.start_date, obj.end_date))
+        elif isinstance(obj, CompOffRequest):
+            touches.add(('employee', obj.employee_id, obj.comp_off_date, obj.comp_off_date))
+        elif isinstance(obj, Employee) and obj.id is not None:
+            touches.add(('employee', obj.id, None, None))
+            for department_id in _history_values(obj, 'department_id'):
+                touches.add(('department', department_id, date.today()))
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_roster_touches(session):
+    touches = session.info.pop(_PENDING_KEY, None)
+    if touches:
+        roster_cache.apply(touches)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_roster_touches(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,168 @@
+"""
+Bulk Schedule Mutations
+
+Applies a list of create / move / delete operations from the manager
+calendar (drag-and-drop edits) as one unit: the referenced schedules and
+employees are loaded in one query each, all operations are validated together
+against an in-memory view of the affected employee-weeks (deletes and moves
+free their old slot first), and the batch is written in a single transaction.
+If any operation is invalid nothing is written. employee_week_stats is
+refreshed in the same transaction.
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Schedule, Employee, CheckInOut, Attendance, CompOffRequest
+from app.schedule_validation import validate_assignments
+from app.employee_week_stats import refresh_weeks
+from app import roster_cache
+from app.scheduling_context import week_start_of
+
+
+OPERATIONS = ('create', 'move', 'delete')
+
+# Fields a move may change
+MOVE_FIELDS = ('employee_id', 'role_id', 'shift_id', 'date', 'start_time', 'end_time', 'notes')
+
+# A created shift above these needs the overtime approval flow of POST /schedules
+DAILY_HOURS_LIMIT = 8
+WEEKLY_HOURS_LIMIT = 40
+
+
+async def apply_bulk_operations(db: AsyncSession, operations: List[Dict],
+                                department_id: Optional[int] = None) -> Dict:
+    """
+    Validate and apply schedule operations in one transaction.
+
+    Args:
+        db: Database session
+        operations: Dicts with 'op' ('create', 'move' or 'delete'), schedule_id
+            for move/delete, and the schedule fields for create / the changed
+            fields for move
+        department_id: Restrict all operations to this department (managers)
+
+    Returns: {'success', 'applied', 'results'} with one result per operation:
+        {'index', 'op', 'schedule_id', 'valid', 'errors'}
+    """
+    results = [
+        {'index': i, 'op': op['op'], 'schedule_id': op.get('schedule_id'), 'valid': True, 'errors': []}
+        for i, op in enumerate(operations)
+    ]
+
+    schedule_ids = {op['schedule_id'] for op in operations if op['op'] in ('move', 'delete') and op.get('schedule_id')}
+    schedules = {}
+    if schedule_ids:
+        sched_result = await db.execute(select(Schedule).filter(Schedule.id.in_(schedule_ids)))
+        schedules = {s.id: s for s in sched_result.scalars().all()}
+
+    employee_ids = {op['employee_id'] for op in operations if op.get('employee_id')}
+    employees = {}
+    if employee_ids:
+        emp_result = await db.execute(select(Employee).filter(Employee.id.in_(employee_ids)))
+        employees = {e.id: e for e in emp_result.scalars().all()}
+
+    # Structural checks: known op, target rows and employees exist and are in scope
+    touched = set()
+    for op, res in zip(operations, results):
+        errors = res['errors']
+        if op['op'] not in OPERATIONS:
+            errors.append(f"Unknown operation '{op['op']}'. Use one of: {', '.join(OPERATIONS)}")
+            continue
+        if op['op'] in ('move', 'delete'):
+            sched = schedules.get(op.get('schedule_id'))
+            if sched is None:
+                errors.append("Schedule not found")
+                continue
+            if department_id is not None and sched.department_id != department_id:
+                errors.append("Can only edit schedules in your department")
+            if sched.id in touched:
+                errors.append("Schedule is changed by more than one operation")
+            touched.add(sched.id)
+        if op['op'] == 'create':
+            missing = [f for f in ('employee_id', 'role_id', 'date', 'start_time', 'end_time') if op.get(f) is None]
+            if missing:
+                errors.append(f"Missing field(s) for create: {', '.join(missing)}")
+                continue
+        if op.get('employee_id'):
+            emp = employees.get(op['employee_id'])
+            if emp is None:
+                errors.append("Employee not found")
+            elif department_id is not None and emp.department_id != department_id:
+                errors.append("Can only schedule employees in your department")
+
+    # Rule checks for every resulting assignment, after deletes free their slots
+    deleted_ids = [op['schedule_id'] for op, res in zip(operations, results)
+                   if op['op'] == 'delete' and not res['errors']]
+    proposals, proposal_index = [], []
+    for i, (op, res) in enumerate(zip(operations, results)):
+        if res['errors'] or op['op'] == 'delete':
+            continue
+        if op['op'] == 'move':
+            sched = schedules[op['schedule_id']]
+            target = {f: op.get(f) if op.get(f) is not None else getattr(sched, f) for f in MOVE_FIELDS}
+            target['status'] = sched.status
+            target['exclude_schedule_id'] = sched.id
+        else:
+            target = {f: op.get(f) for f in MOVE_FIELDS}
+        proposals.append(target)
+        proposal_index.append(i)
+
+    verdicts = await validate_assignments(db, proposals, removed_schedule_ids=deleted_ids)
+    for i, verdict in zip(proposal_index, verdicts):
+        results[i]['errors'].extend(verdict['errors'])
+        if operations[i]['op'] == 'create' and verdict['valid'] and (
+                verdict['daily_hours'] > DAILY_HOURS_LIMIT or verdict['weekly_hours'] > WEEKLY_HOURS_LIMIT):
+            results[i]['errors'].append(
+                f"Requires overtime approval ({verdict['daily_hours']:.1f}h that day, "
+                f"{verdict['weekly_hours']:.1f}h that week) - create this shift individually"
+            )
+
+    for res in results:
+        res['valid'] = not res['errors']
+    if not all(res['valid'] for res in results):
+        return {'success': False, 'applied': False, 'results': results}
+
+    # ===== Apply in one transaction =====
+    if deleted_ids:
+        # Same effect as deleting each row through the ORM: check-in and attendance
+        # rows cascade; comp-off requests keep their record without the reference
+        await db.execute(update(CompOffRequest).where(CompOffRequest.schedule_id.in_(deleted_ids)).values(schedule_id=None))
+        await db.execute(delete(CheckInOut).where(CheckInOut.schedule_id.in_(deleted_ids)))
+        await db.execute(delete(Attendance).where(Attendance.schedule_id.in_(deleted_ids)))
+        await db.execute(delete(Schedule).where(Schedule.id.in_(deleted_ids)).execution_options(synchronize_session=False))
+        # Statement deletes bypass the flush events that maintain employee_week_stats
+        await refresh_weeks(db, {(schedules[sid].employee_id, week_start_of(schedules[sid].date)) for sid in deleted_ids})
+        for sid in deleted_ids:
+            roster_cache.touch(db, schedules[sid].department_id, schedules[sid].date)
+            roster_cache.touch_employee(db, schedules[sid].employee_id, schedules[sid].date, schedules[sid].date)
+
+    now = datetime.utcnow()
+    created = []
+    for i, target in zip(proposal_index, proposals):
+        op = operations[i]
+        if op['op'] == 'move':
+            sched = schedules[op['schedule_id']]
+            for field in MOVE_FIELDS:
+                setattr(sched, field, target[field])
+            if op.get('employee_id'):
+                sched.department_id = employees[op['employee_id']].department_id
+            sched.updated_at = now
+        else:
+            sched = Schedule(
+                department_id=employees[op['employee_id']].department_id,
+                status='scheduled',
+                **{field: target[field] for field in MOVE_FIELDS}
+            )
+            db.add(sched)
+            created.append((i, sched))
+
+    await db.flush()
+    for i, sched in created:
+        results[i]['schedule_id'] = sched.id
+    await db.commit()
+
+    return {'success': True, 'applied': True, 'results': results}
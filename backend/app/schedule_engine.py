@@ -0,0 +1,1328 @@
+"""
+Schedule Generation Engines
+
+Shared core of POST /schedules/generate. Loads the department's roles, shifts,
+employees and prefetched SchedulingContext once, then assigns shifts with one
+of two engines:
+
+- greedy: day-by-day assignment against the in-memory context
+- cpsat:  OR-Tools CP-SAT over the whole range (ShiftScheduleGenerator), one
+          model per independent role/eligibility component, solved
+          concurrently in the solver process pool
+
+Repair mode re-solves only the neighborhood of leave/unavailability changes
+with CP-SAT, warm-started from the current schedule, and applies a minimal
+insert/delete diff.
+
+Both engines return the same response shape (feedback, overtime warnings,
+schedules_created).
+
+Dry runs execute the same pipeline in memory and return the diff against the
+current schedule; apply_schedule_diff later commits exactly that diff if the
+range has not changed in between.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import logging
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import (
+    Schedule, Role, Shift, Employee, CheckInOut
+)
+from app.config import settings
+from app.schedule_generator import (
+    solve_shift_schedule, decompose_shift_inputs, merge_shift_results,
+    horizon_windows, commit_window
+)
+from app.schedule_writer import write_generated_schedules
+from app.scheduling_context import (
+    SchedulingContext, shift_hours, week_start_of
+)
+from app.solution_cache import solution_cache, fingerprint
+from app.solver_pool import solver_pool
+from app.solver_resources import solver_resources
+from app.solver_telemetry import record_generation
+
+
+# Per-employee / per-shift / per-day trace of the greedy engine and the
+# eligibility matrix; enable with logging.getLogger('app.schedule_engine').setLevel(logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+ENGINES = ('greedy', 'cpsat')
+
+# Statuses of the rows a generation writes (work shifts and build_leave_schedule)
+GENERATED_STATUSES = ('scheduled', 'leave', 'leave_half_morning', 'leave_half_afternoon',
+                      'comp_off_earned', 'comp_off_taken')
+
+# progress(percent, new_feedback_lines) - lets background jobs stream progress
+ProgressCallback = Callable[[int, List[str]], Awaitable[None]]
+
+
+async def _no_progress(percent: int, messages: List[str]):
+    pass
+
+
+def build_leave_schedule(department_id: int, emp, shift, current_date: date,
+                         leave_request, comp_off_request,
+                         context: SchedulingContext) -> Schedule:
+    """Create the schedule entry marking an approved leave or comp-off day"""
+    # Determine status based on type
+    if comp_off_request:
+        # This is a comp-off earned day (employee worked, earned comp-off)
+        # Use the week's shift times, else the same weekday's, else full day
+        leave_status = 'comp_off_earned'
+        start_time, end_time = context.comp_off_shift_times(emp.id, current_date)
+        leave_notes = f"Comp-Off Earned: {comp_off_request.reason or 'Worked on non-shift day'}"
+    elif leave_request.leave_type == 'comp_off':
+        # This is using comp-off (taking the earned comp-off) - no shift times, full day off
+        leave_status = 'comp_off_taken'
+        start_time = None  # No shift time for comp-off usage
+        end_time = None
+        leave_notes = f"Comp-Off Taken: {leave_request.reason or 'Using earned comp-off'}"
+    elif leave_request.duration_type == 'half_day_morning':
+        leave_status = 'leave_half_morning'
+        # Use shift's start time to 12:00 for morning leave
+        start_time = shift.start_time
+        end_time = "12:00"
+        leave_notes = f"Half Day Leave (Morning) - {leave_request.leave_type}"
+    elif leave_request.duration_type == 'half_day_afternoon':
+        leave_status = 'leave_half_afternoon'
+        # Use 12:00 to shift's end time for afternoon leave
+        start_time = "12:00"
+        end_time = shift.end_time
+        leave_notes = f"Half Day Leave (Afternoon) - {leave_request.leave_type}"
+    else:
+        # Full day leave - use the actual shift times
+        leave_status = 'leave'
+        start_time = shift.start_time
+        end_time = shift.end_time
+        leave_notes = f"Full Day Leave - {leave_request.leave_type}"
+
+    leave_type_desc = 'comp-off' if comp_off_request else leave_request.leave_type
+    logger.debug("✓ %s is on approved %s on %s, creating %s schedule", emp.first_name, leave_type_desc, current_date, leave_status)
+    leave_schedule = Schedule(
+        department_id=department_id,
+        employee_id=emp.id,
+        role_id=shift.role_id,
+        shift_id=shift.id,
+        date=current_date,
+        start_time=start_time,
+        end_time=end_time,
+        status=leave_status,
+        notes=leave_notes
+    )
+    return leave_schedule
+
+
+async def run_greedy(department_id: int, start_date: date, end_date: date, roles, shifts,
+                     eligible_for_shift: Dict[int, list], context: SchedulingContext,
+                     progress: ProgressCallback = _no_progress) -> Dict:
+    """
+    Assign shifts day by day, filling each shift up to max_emp with eligible
+    employees that pass the leave, double-shift, consecutive-day, hours and
+    weekly-shift checks. Runs entirely against the prefetched context.
+
+    Returns: dict with new_schedules, feedback and overtime_warnings
+    """
+    new_schedules = []
+    feedback = []
+    overtime_warnings = []  # Track shifts requiring overtime approval
+    roles_by_id = {r.id: r for r in roles}
+    total_days = (end_date - start_date).days + 1
+    reported_feedback = 0
+
+    # Create schedules
+    current_date = start_date
+    while current_date <= end_date:
+        days_done = (current_date - start_date).days
+        await progress(10 + 80 * days_done // total_days, feedback[reported_feedback:])
+        reported_feedback = len(feedback)
+
+        day_name = current_date.strftime('%A')  # e.g., 'Monday', 'Sunday'
+        
+        # ===== SKIP PUBLIC HOLIDAYS - Don't assign shifts on holidays =====
+        if context.is_holiday(current_date):
+            holiday_name = context.holiday_name(current_date)
+            logger.debug("Skipping %s (%s) - Public Holiday: %s", current_date, day_name, holiday_name)
+            current_date += timedelta(days=1)
+            continue
+
+        for shift in shifts:
+            # Check if shift operates on this day
+            role = roles_by_id.get(shift.role_id)
+            
+            # Determine if this shift should run on this day
+            should_skip = False
+            
+            if shift.schedule_config and isinstance(shift.schedule_config, dict):
+                # Shift has a schedule_config with day configuration
+                day_config = shift.schedule_config.get(day_name, {})
+                is_day_enabled = day_config.get('enabled', False) if isinstance(day_config, dict) else False
+                
+                if not is_day_enabled:
+                    should_skip = True
+                    logger.debug("✗ Shift %s (%s) - Day %s is disabled, skipping", shift.id, shift.name, day_name)
+                else:
+                    logger.debug("✓ Shift %s (%s) - Day %s is ENABLED, processing", shift.id, shift.name, day_name)
+            else:
+                # No schedule_config or invalid format - skip to prevent unintended assignments
+                should_skip = True
+                logger.debug("✗ Shift %s (%s) - No valid schedule_config, skipping %s", shift.id, shift.name, day_name)
+
+            if should_skip:
+                continue
+
+            # Assign employees to this shift on this day
+            # Only consider employees who are eligible for this shift
+            assigned_count = 0
+            
+            for emp in eligible_for_shift[shift.id]:
+                # Check leave - if employee is on approved leave, mark them as leave (not shift)
+                leave_request = context.leave_for(emp.id, current_date)
+                
+                # Also check for approved comp-off requests
+                comp_off_request = context.comp_off_for(emp.id, current_date)
+                
+                if leave_request or comp_off_request:
+                    # Employee is on approved leave or comp-off - create appropriate schedule entry
+                    if not context.has_schedule_on(emp.id, current_date):
+                        leave_schedule = build_leave_schedule(
+                            department_id, emp, shift, current_date,
+                            leave_request, comp_off_request, context
+                        )
+                        new_schedules.append(leave_schedule)
+                        context.add_schedule(leave_schedule)
+                    else:
+                        logger.debug("✗ %s already has a schedule entry on %s, skipping leave creation", emp.first_name, current_date)
+                    continue  # Don't assign shift for leave/comp-off day
+                
+                # CRITICAL: Check if employee already has a shift on this day (NO DOUBLE SHIFTS)
+                if context.has_schedule_on(emp.id, current_date):
+                    logger.debug("✗ %s already has a shift on %s, skipping (NO DOUBLE SHIFTS)", emp.first_name, current_date)
+                    continue  # Skip if employee already has a shift today
+                
+                logger.debug("Checking %s (%s) for shift %s (%s) on %s", emp.first_name, emp.id, shift.id, shift.name, current_date)
+                
+                # Check 5 consecutive shifts limit INCLUDING the new one
+                # NOTE: Leave days are not counted as "shifts" for the consecutive limit
+                max_consecutive = context.max_consecutive_with(emp.id, current_date)
+                if max_consecutive > 5:
+                    logger.debug("✗ %s would have %s consecutive shifts, skipping (MAX 5 consecutive)", emp.first_name, max_consecutive)
+                    continue  # Skip if would exceed 5 consecutive shifts
+
+                # Existing work hours for the week and for today, minus break time
+                # NOTE: Leave days don't add to hour count, but they fulfill part of weekly requirement
+                existing_hours, existing_hours_today = context.week_hours(emp.id, current_date)
+
+                # Calculate shift hours (total time) and work hours (minus breaks)
+                total_shift_hours, work_hours = shift_hours(
+                    shift.start_time, shift.end_time, role.break_minutes if role else 0
+                )
+
+                # Check both weekly and daily limits using work hours (excluding breaks)
+                daily_max = emp.daily_max_hours or 8
+                logger.debug("%s: weekly %.1f+%.1f<=%s, daily %.1f+%.1f<=%s", emp.first_name, existing_hours, work_hours,
+                             emp.weekly_hours, existing_hours_today, work_hours, daily_max)
+
+                # ===== Check for overtime (> 9 hours total in a day) =====
+                daily_total_with_shift = existing_hours_today + total_shift_hours
+                has_overtime = daily_total_with_shift > 9
+                
+                if has_overtime:
+                    overtime_warnings.append({
+                        'employee_id': emp.id,
+                        'employee_name': f"{emp.first_name} {emp.last_name}",
+                        'date': current_date.isoformat(),
+                        'shift_hours': total_shift_hours,
+                        'existing_daily_hours': existing_hours_today,
+                        'total_daily_hours': daily_total_with_shift,
+                        'total_weekly_hours': existing_hours + work_hours,
+                        'message': f"Total {daily_total_with_shift:.1f}h on {current_date} (includes {total_shift_hours}h shift)"
+                    })
+                    logger.debug("⚠️  OVERTIME: %s would work %.1f hours on %s", emp.first_name, daily_total_with_shift, current_date)
+
+                if (existing_hours + work_hours <= emp.weekly_hours and
+                    existing_hours_today + work_hours <= daily_max):
+                    
+                    # ===== NEW: Check 5-shifts-per-week limit with holiday awareness =====
+                    is_valid_shifts, shifts_error = context.check_weekly_shift_limit(emp.id, current_date)
+                    if not is_valid_shifts:
+                        logger.debug("✗ %s failed 5-shifts validation on %s: %s", emp.first_name, current_date, shifts_error)
+                        continue  # Skip this employee for this shift due to weekly shift limit
+                    
+                    logger.debug("✓ Creating schedule for %s on %s", emp.first_name, current_date)
+                    # Create schedule
+                    schedule = Schedule(
+                        department_id=department_id,
+                        employee_id=emp.id,
+                        role_id=shift.role_id,
+                        shift_id=shift.id,
+                        date=current_date,
+                        start_time=shift.start_time,
+                        end_time=shift.end_time,
+                        status="scheduled"
+                    )
+                    new_schedules.append(schedule)
+                    context.add_schedule(schedule)
+                    assigned_count += 1
+                    
+                    if assigned_count >= shift.max_emp:
+                        break  # Max employees for this shift on this day
+                else:
+                    logger.debug("✗ %s failed hours check on %s", emp.first_name, current_date)
+
+            # Ensure minimum employees are assigned
+            if assigned_count < shift.min_emp:
+                feedback.append(f"Warning: {shift.name} on {current_date} has {assigned_count} employees (min: {shift.min_emp})")
+
+        current_date += timedelta(days=1)
+
+    return {
+        "new_schedules": new_schedules,
+        "feedback": feedback,
+        "overtime_warnings": overtime_warnings,
+    }
+
+
+def _shift_runs_on(shift, day_name: str) -> bool:
+    """Whether the shift's schedule_config enables it on day_name"""
+    if not shift.schedule_config or not isinstance(shift.schedule_config, dict):
+        return False
+    day_config = shift.schedule_config.get(day_name, {})
+    return day_config.get('enabled', False) if isinstance(day_config, dict) else False
+
+
+async def run_cpsat(department_id: int, start_date: date, end_date: date, roles, shifts, employees,
+                    eligible_for_shift: Dict[int, list], context: SchedulingContext,
+                    progress: ProgressCallback = _no_progress,
+                    hints: Optional[Dict[Tuple[int, date], int]] = None,
+                    neighborhood: Optional[set] = None,
+                    early_stop: Optional[Dict] = None) -> Dict:
+    """
+    Build one CP-SAT model for the whole range from the prefetched context and
+    solve it once in the solver process pool. Leave and comp-off days are materialized exactly as the
+    greedy engine does; existing schedules enter the model as fixed load.
+
+    hints / neighborhood are passed through to ShiftScheduleGenerator for
+    incremental repair (see run_repair). early_stop ({'accept_gap',
+    'stall_seconds'}) accepts a solution before OPTIMAL; each improving
+    solution is streamed to progress while the models solve.
+
+    Returns: dict with new_schedules, feedback and overtime_warnings (and
+    error when no feasible schedule exists)
+    """
+    new_schedules = []
+    feedback = []
+    overtime_warnings = []
+    roles_by_id = {r.id: r for r in roles}
+
+    # Leave / comp-off entries first, so the model sees those days as taken
+    current_date = start_date
+    while current_date <= end_date:
+        if not context.is_holiday(current_date):
+            day_name = current_date.strftime('%A')
+            for shift in shifts:
+                if not _shift_runs_on(shift, day_name):
+                    continue
+                for emp in eligible_for_shift[shift.id]:
+                    leave_request = context.leave_for(emp.id, current_date)
+                    comp_off_request = context.comp_off_for(emp.id, current_date)
+                    if (leave_request or comp_off_request) and not context.has_schedule_on(emp.id, current_date):
+                        leave_schedule = build_leave_schedule(
+                            department_id, emp, shift, current_date,
+                            leave_request, comp_off_request, context
+                        )
+                        new_schedules.append(leave_schedule)
+                        context.add_schedule(leave_schedule)
+        current_date += timedelta(days=1)
+
+    leave_dates = defaultdict(set)
+    for emp_id, day in list(context.leaves) + list(context.comp_offs):
+        leave_dates[emp_id].add(day)
+
+    blocked_dates = defaultdict(set)
+    for emp_id, day in context.schedules_by_day:
+        if context.has_schedule_on(emp_id, day):
+            blocked_dates[emp_id].add(day)
+
+    existing_load = defaultdict(dict)
+    for emp_id, week_start in list(context.schedules_by_week):
+        existing_load[emp_id][week_start] = context.week_load(emp_id, week_start)
+
+    inputs = dict(
+        employees=[
+            {
+                'id': emp.id,
+                'name': f"{emp.first_name} {emp.last_name}",
+                'role_id': emp.role_id,
+                'weekly_hours': emp.weekly_hours,
+                'daily_max_hours': emp.daily_max_hours,
+                'shifts_per_week': emp.shifts_per_week,
+            }
+            for emp in employees
+        ],
+        roles=[
+            {'id': r.id, 'name': r.name, 'break_minutes': r.break_minutes or 0,
+             'schedule_config': r.schedule_config or {}}
+            for r in roles
+        ],
+        leave_dates=dict(leave_dates),
+        unavailable_dates=context.unavailable_dates(),
+        shifts=[
+            {
+                'id': s.id,
+                'role_id': s.role_id,
+                'name': s.name,
+                'start_time': s.start_time,
+                'end_time': s.end_time,
+                'min_emp': s.min_emp or 0,
+                'max_emp': s.max_emp,
+                'schedule_config': s.schedule_config,
+                'break_minutes': (roles_by_id[s.role_id].break_minutes or 0) if s.role_id in roles_by_id else 0,
+            }
+            for s in shifts
+        ],
+        blocked_dates=dict(blocked_dates),
+        existing_load=dict(existing_load),
+        holidays=set(context.holidays),
+        hints=hints,
+        neighborhood=neighborhood,
+    )
+
+    # Long ranges are solved as a rolling horizon of week-aligned windows; each
+    # committed window becomes fixed load for the next one
+    if settings.ROLLING_HORIZON_AFTER_DAYS and (end_date - start_date).days + 1 > settings.ROLLING_HORIZON_AFTER_DAYS:
+        windows = horizon_windows(start_date, end_date, settings.ROLLING_HORIZON_WINDOW_DAYS)
+    else:
+        windows = [(start_date, end_date)]
+
+    # Independent role/eligibility components are solved as separate models,
+    # concurrently and off the event loop; the pool queues solves beyond its worker count
+    await progress(20, [f"Solving CP-SAT model(s) for {len(employees)} employees and {len(shifts)} shifts"
+                        + (f" in {len(windows)} rolling windows..." if len(windows) > 1 else "...")])
+    schedule = {}
+    window_results = []
+    allocations = []
+    cached_models = 0
+    total_models = 0  # Across all windows; components can differ per window
+    for window_number, (window_start, window_end) in enumerate(windows, start=1):
+        components = decompose_shift_inputs(inputs)
+        total_models += len(components)
+        solved = 0
+        window_started = time.perf_counter()
+
+        async def solve_component(model_number: int, component: Dict) -> Dict:
+            nonlocal solved, cached_models
+            payload = {'inputs': component, 'start_date': window_start, 'end_date': window_end}
+            if early_stop:
+                payload['early_stop'] = early_stop
+            last_reported = 0.0
+
+            async def report_solution(solution: Dict):
+                nonlocal last_reported
+                # Improving solutions can arrive many times a second; report at most every 2s
+                if time.perf_counter() - last_reported < 2.0:
+                    return
+                last_reported = time.perf_counter()
+                done = (window_number - 1) * len(components) + solved
+                await progress(20 + 60 * done // (len(windows) * len(components)), [
+                    f"Model {model_number}/{len(components)}: best objective {solution['objective']:.0f}, "
+                    f"bound {solution['bound']:.0f}, gap {solution['gap']:.1%} after {solution['seconds']:.1f}s"
+                ])
+
+            # Unchanged inputs reuse the stored assignment instead of solving again
+            cache_key = fingerprint(payload)
+            component_result = await solution_cache.get(cache_key)
+            allocation = None
+            if component_result is None:
+                # Threads and time budget come from the process-wide solver budget;
+                # waits here while other generations hold every thread
+                async with solver_resources.allocate() as allocation:
+                    allocations.append(allocation)
+                    component_result = await solver_pool.run(
+                        solve_shift_schedule,
+                        {**payload, 'allocation': {k: allocation[k] for k in ('num_workers', 'time_limit')}},
+                        on_progress=report_solution
+                    )
+                await solution_cache.put(cache_key, department_id, window_start, window_end, component_result)
+            solved += 1
+            cached_models += 1 if component_result.get('cached') else 0
+            role_names = sorted({roles_by_id[s['role_id']].name for s in component['shifts'] if s['role_id'] in roles_by_id})
+            done = (window_number - 1) * len(components) + solved
+            await progress(20 + 60 * done // (len(windows) * len(components)), [
+                f"Solved model {solved}/{len(components)} ({', '.join(role_names)}; "
+                f"{len(component['employees'])} employees)"
+                + (f" for {window_start} to {window_end}" if len(windows) > 1 else "")
+                + (f": {component_result['status']} (cached)" if component_result.get('cached')
+                   else f": {component_result['status']} in {component_result['wall_time']:.2f}s "
+                        f"({allocation['num_workers']} threads, {allocation['time_limit']:.0f}s limit"
+                        + (f", queued {allocation['waited_seconds']:.1f}s)" if allocation['queued'] else ")"))
+            ])
+            return component_result
+
+        result = merge_shift_results(
+            await asyncio.gather(*(
+                solve_component(number, component) for number, component in enumerate(components, start=1)
+            ))
+        )
+        result['window'] = {
+            'start_date': window_start.isoformat(),
+            'end_date': window_end.isoformat(),
+            'status': result['status'],
+            'build_seconds': round(result['build_seconds'], 3),
+            'solve_seconds': round(result['wall_time'], 3),
+            'elapsed_seconds': round(time.perf_counter() - window_started, 3),
+            'objective': result['objective'],
+            'bound': result['bound'],
+            'gap': round(result['gap'], 4) if result['gap'] is not None else None,
+            'stop_reason': result['stop_reason'],
+        }
+        window_results.append(result)
+        if result['error']:
+            break
+        commit_window(inputs, result['schedule'])
+        schedule.update(result['schedule'])
+
+    telemetry = [t for r in window_results for t in r['telemetry']]
+    error = next((r['error'] for r in window_results if r['error']), None)
+    if error:
+        failed = window_results[-1]
+        return {
+            "telemetry": telemetry,
+            "cached_models": cached_models,
+            "new_schedules": [],
+            "feedback": [f"❌ {error}"]
+                        + ([f"Window {failed['window']['start_date']} to {failed['window']['end_date']} is infeasible"] if len(windows) > 1 else [])
+                        + [f['message'] for f in failed['feedback'] if f['severity'] == 'error'],
+            "overtime_warnings": [],
+            "error": error,
+        }
+
+    employees_by_id = {emp.id: emp for emp in employees}
+    weekly_new_hours = defaultdict(float)
+    for date_obj in sorted(schedule):
+        for emp_id, assignment in sorted(schedule[date_obj].items()):
+            emp = employees_by_id[emp_id]
+            sched = Schedule(
+                department_id=department_id,
+                employee_id=emp_id,
+                role_id=assignment['role_id'],
+                shift_id=assignment['shift_id'],
+                date=date_obj,
+                start_time=assignment['start_time'],
+                end_time=assignment['end_time'],
+                status="scheduled"
+            )
+            existing_hours, _ = context.week_hours(emp_id, date_obj)
+            week_key = (emp_id, week_start_of(date_obj))
+            weekly_new_hours[week_key] += assignment['work_hours']
+
+            # ===== Check for overtime (> 9 hours total in a day) =====
+            if assignment['total_hours'] > 9:
+                overtime_warnings.append({
+                    'employee_id': emp_id,
+                    'employee_name': f"{emp.first_name} {emp.last_name}",
+                    'date': date_obj.isoformat(),
+                    'shift_hours': assignment['total_hours'],
+                    'existing_daily_hours': 0,
+                    'total_daily_hours': assignment['total_hours'],
+                    'total_weekly_hours': existing_hours + weekly_new_hours[week_key],
+                    'message': f"Total {assignment['total_hours']:.1f}h on {date_obj} (includes {assignment['total_hours']}h shift)"
+                })
+            new_schedules.append(sched)
+
+    # Coverage below min_emp is reported the same way as the greedy engine
+    for slot in [slot for r in window_results for slot in r['coverage']]:
+        if slot['assigned'] < slot['min_emp']:
+            feedback.append(f"Warning: {slot['shift_name']} on {slot['date']} has {slot['assigned']} employees (min: {slot['min_emp']})")
+
+    if len(windows) > 1:
+        for r in window_results:
+            window = r['window']
+            feedback.append(f"Window {window['start_date']} to {window['end_date']}: {window['status']}, "
+                            f"solve {window['solve_seconds']:.2f}s, total {window['elapsed_seconds']:.2f}s")
+    if allocations:
+        threads = sorted({a['num_workers'] for a in allocations})
+        limits = sorted({round(a['time_limit']) for a in allocations})
+        queued = [a for a in allocations if a['queued']]
+        thread_range = f"{threads[0]}" if len(threads) == 1 else f"{threads[0]}-{threads[-1]}"
+        limit_range = f"{limits[0]}" if len(limits) == 1 else f"{limits[0]}-{limits[-1]}"
+        feedback.append(f"Solver resources: {len(allocations)} solve(s) with {thread_range} thread(s) "
+                        f"and a {limit_range}s limit each"
+                        + (f"; {len(queued)} queued for {sum(a['waited_seconds'] for a in queued):.1f}s "
+                           f"behind other generations" if queued else ""))
+    status = 'OPTIMAL' if all(r['status'] == 'OPTIMAL' for r in window_results) else 'FEASIBLE'
+    feedback.append(f"CP-SAT solver: {status} in {sum(r['wall_time'] for r in window_results):.2f}s "
+                    f"({total_models} independent model(s)"
+                    + (f", {len(windows)} windows)" if len(windows) > 1 else ")"))
+    stopped_early = [r for r in window_results if r['stop_reason']]
+    if stopped_early:
+        worst_gap = max(r['gap'] for r in stopped_early)
+        feedback.append(f"Accepted a feasible schedule early in {len(stopped_early)} solve window(s) "
+                        f"(largest optimality gap {worst_gap:.1%})")
+
+    return {
+        "new_schedules": new_schedules,
+        "feedback": feedback,
+        "overtime_warnings": overtime_warnings,
+        "windows": [r['window'] for r in window_results],
+        "telemetry": telemetry,
+        "cached_models": cached_models,
+    }
+
+
+async def run_repair(db: AsyncSession, department_id: int, start_date: date, end_date: date,
+                     roles, shifts, employees, eligible_for_shift: Dict[int, list],
+                     context: SchedulingContext,
+                     progress: ProgressCallback = _no_progress,
+                     early_stop: Optional[Dict] = None) -> Dict:
+    """
+    Repair the existing schedule after leave, comp-off or unavailability changes
+    instead of regenerating the whole range.
+
+    The range's 'scheduled' rows (except ones with check-ins) become CP-SAT
+    solution hints. An employee-day is affected when its shift now clashes with
+    a leave, comp-off, unavailability or holiday, its shift is no longer valid
+    for the employee, or a leave/comp-off day has no schedule entry yet. Only the
+    neighborhood of those days is re-solved: the affected employees' ISO weeks
+    and, in those weeks, every colleague eligible for the same shifts. All other
+    assignments are pinned to the current schedule.
+
+    Returns: dict with new_schedules, removed_schedules, feedback and
+    overtime_warnings (and error when the repair is infeasible)
+    """
+    shift_ids_for = defaultdict(set)  # emp_id -> shifts the employee is eligible for
+    for shift in shifts:
+        for emp in eligible_for_shift[shift.id]:
+            shift_ids_for[emp.id].add(shift.id)
+    shifts_by_id = {s.id: s for s in shifts}
+
+    # Current work shifts in the range, one per employee-day
+    current = {}  # (emp_id, date) -> Schedule
+    for (emp_id, day), scheds in context.schedules_by_day.items():
+        if start_date <= day <= end_date:
+            for sched in scheds:
+                if sched.status == 'scheduled':
+                    current.setdefault((emp_id, day), sched)
+
+    # Shifts that were already checked into are history, not candidates
+    if current:
+        checkin_result = await db.execute(
+            select(CheckInOut.schedule_id)
+            .where(CheckInOut.schedule_id.in_([s.id for s in current.values()]))
+            .distinct()
+        )
+        checked_in = set(checkin_result.scalars().all())
+        current = {key: s for key, s in current.items() if s.id not in checked_in}
+
+    affected = set()
+    for (emp_id, day), sched in current.items():
+        if (context.leave_for(emp_id, day) or context.comp_off_for(emp_id, day)
+                or (emp_id, day) in context.unavailable or context.is_holiday(day)
+                or sched.shift_id not in shift_ids_for[emp_id]):
+            affected.add((emp_id, day))
+    for emp_id, day in list(context.leaves) + list(context.comp_offs):
+        if context.has_schedule_on(emp_id, day) or context.is_holiday(day):
+            continue
+        day_name = day.strftime('%A')
+        if any(_shift_runs_on(shifts_by_id[sid], day_name) for sid in shift_ids_for[emp_id]):
+            affected.add((emp_id, day))
+
+    if not affected:
+        return {
+            "new_schedules": [],
+            "removed_schedules": [],
+            "feedback": ["No leave, comp-off or unavailability changes affect the current schedule - nothing to repair"],
+            "overtime_warnings": [],
+        }
+
+    neighborhood = set()
+    for emp_id, day in affected:
+        week_start = week_start_of(day)
+        week_days = [
+            week_start + timedelta(days=i) for i in range(7)
+            if start_date <= week_start + timedelta(days=i) <= end_date
+        ]
+        colleagues = {emp_id} | {
+            e.id for shift_id in shift_ids_for[emp_id] for e in eligible_for_shift[shift_id]
+        }
+        for other_id in colleagues:
+            neighborhood.update((other_id, d) for d in week_days)
+
+    # The current work shifts become model variables instead of fixed load
+    for sched in current.values():
+        context.remove_schedule(sched)
+    hints = {key: sched.shift_id for key, sched in current.items()}
+
+    await progress(15, [f"Repairing {len(affected)} affected employee-day(s); "
+                        f"re-solving a neighborhood of {len(neighborhood)} employee-days"])
+    result = await run_cpsat(department_id, start_date, end_date, roles, shifts, employees,
+                             eligible_for_shift, context, progress,
+                             hints=hints, neighborhood=neighborhood, early_stop=early_stop)
+    if result.get('error'):
+        result['feedback'].append("Repair is infeasible with the current schedule pinned - regenerate the range instead")
+        return result
+
+    # Minimal diff: keep assignments the solver left unchanged
+    kept = set()
+    inserts = []
+    for sched in result['new_schedules']:
+        key = (sched.employee_id, sched.date)
+        current_sched = current.get(key)
+        if (sched.status == 'scheduled' and key not in kept
+                and current_sched is not None and current_sched.shift_id == sched.shift_id):
+            kept.add(key)
+            continue
+        inserts.append(sched)
+    removed = [sched for key, sched in current.items() if key not in kept]
+
+    inserted_keys = {(s.employee_id, s.date.isoformat()) for s in inserts}
+    overtime_warnings = [
+        w for w in result['overtime_warnings'] if (w['employee_id'], w['date']) in inserted_keys
+    ]
+
+    feedback = result['feedback']
+    feedback.append(f"Repair diff: {len(inserts)} insert(s), {len(removed)} delete(s), "
+                    f"{len(kept)} shift(s) unchanged")
+    return {
+        "new_schedules": inserts,
+        "removed_schedules": removed,
+        "feedback": feedback,
+        "overtime_warnings": overtime_warnings,
+        "windows": result.get('windows', []),
+        "telemetry": result.get('telemetry', []),
+        "cached_models": result.get('cached_models', 0),
+    }
+
+
+def schedules_fingerprint(schedules) -> str:
+    """Hash of a range's schedule rows; a preview can only be applied while it is unchanged"""
+    rows = sorted(
+        (s.id, s.employee_id, s.date.isoformat(), s.shift_id, s.status, s.start_time, s.end_time)
+        for s in schedules
+    )
+    return hashlib.sha256(repr(rows).encode('utf-8')).hexdigest()
+
+
+def preview_signature(department_id: int, start_date: date, end_date: date,
+                      base_fingerprint: str, diff: Dict[str, list]) -> str:
+    """
+    HMAC of the parts of a dry-run diff that apply_schedule_diff writes, so a
+    preview can only be applied exactly as the server generated it
+    """
+    rows = (
+        department_id, start_date.isoformat(), end_date.isoformat(), base_fingerprint,
+        [(e['employee_id'], str(e['date']), e['role_id'], e.get('shift_id'), e.get('start_time'),
+          e.get('end_time'), e.get('status', 'scheduled'), e.get('notes')) for e in diff.get('added', [])],
+        [e['schedule_id'] for e in diff.get('removed', [])],
+        [(e['schedule_id'], e.get('to_shift_id'), e['role_id'], e.get('start_time'), e.get('end_time'))
+         for e in diff.get('changed', [])],
+    )
+    return hmac.new(settings.SECRET_KEY.encode('utf-8'), repr(rows).encode('utf-8'),
+                    hashlib.sha256).hexdigest()
+
+
+def build_schedule_diff(current: List[Schedule], generated: List[Schedule]) -> Dict[str, list]:
+    """
+    Compare the rows a generation replaces with the rows it produced, per
+    employee and day.
+
+    A generated work shift on an employee-day that already had one is 'changed'
+    (or dropped from the diff when shift, role and times are identical); other
+    generated rows are 'added' and current rows left without a counterpart are
+    'removed'.
+    """
+    current_by_key = defaultdict(list)
+    for sched in current:
+        current_by_key[(sched.employee_id, sched.date, sched.status)].append(sched)
+
+    added, changed = [], []
+    for sched in generated:
+        matches = current_by_key.get((sched.employee_id, sched.date, sched.status))
+        if not matches:
+            added.append({
+                'employee_id': sched.employee_id,
+                'date': sched.date.isoformat(),
+                'role_id': sched.role_id,
+                'shift_id': sched.shift_id,
+                'start_time': sched.start_time,
+                'end_time': sched.end_time,
+                'status': sched.status,
+                'notes': sched.notes,
+            })
+            continue
+        old = matches.pop(0)
+        if (old.shift_id, old.role_id, old.start_time, old.end_time) == \
+                (sched.shift_id, sched.role_id, sched.start_time, sched.end_time):
+            continue
+        changed.append({
+            'schedule_id': old.id,
+            'employee_id': sched.employee_id,
+            'date': sched.date.isoformat(),
+            'from_shift_id': old.shift_id,
+            'to_shift_id': sched.shift_id,
+            'role_id': sched.role_id,
+            'start_time': sched.start_time,
+            'end_time': sched.end_time,
+        })
+
+    removed = [
+        {
+            'schedule_id': sched.id,
+            'employee_id': sched.employee_id,
+            'date': sched.date.isoformat(),
+            'shift_id': sched.shift_id,
+            'start_time': sched.start_time,
+            'end_time': sched.end_time,
+        }
+        for matches in current_by_key.values() for sched in matches
+    ]
+    return {'added': added, 'removed': removed, 'changed': changed}
+
+
+def coverage_summary(shifts, schedules, start_date: date, end_date: date,
+                     context: SchedulingContext) -> List[Dict]:
+    """Assigned headcount per shift and day (against min_emp/max_emp) for a schedule state"""
+    assigned = defaultdict(int)
+    for sched in schedules:
+        if sched.status == 'scheduled' and sched.shift_id is not None:
+            assigned[(sched.date, sched.shift_id)] += 1
+
+    coverage = []
+    current_date = start_date
+    while current_date <= end_date:
+        if not context.is_holiday(current_date):
+            day_name = current_date.strftime('%A')
+            for shift in shifts:
+                if not _shift_runs_on(shift, day_name):
+                    continue
+                count = assigned[(current_date, shift.id)]
+                coverage.append({
+                    'date': current_date.isoformat(),
+                    'shift_id': shift.id,
+                    'shift_name': shift.name,
+                    'assigned': count,
+                    'min_emp': shift.min_emp or 0,
+                    'max_emp': shift.max_emp,
+                    'understaffed': count < (shift.min_emp or 0),
+                })
+        current_date += timedelta(days=1)
+    return coverage
+
+
+async def apply_schedule_diff(db: AsyncSession, department_id: int, start_date: date,
+                              end_date: date, base_fingerprint: str, diff: Dict[str, list],
+                              signature: str) -> Dict:
+    """
+    Commit a diff returned by a dry run in one bulk transaction.
+
+    Only the diff the server generated is accepted (signature, see
+    preview_signature), and its roles and shifts must still belong to the
+    department.
+
+    The diff is only applied while the range still matches the previewed state
+    (base_fingerprint) and none of the shifts it replaces has been checked into;
+    otherwise the response has conflict=True and nothing is written.
+
+    Returns: response dict for POST /schedules/generate/apply
+    """
+    expected = preview_signature(department_id, start_date, end_date, base_fingerprint, diff)
+    if not hmac.compare_digest(expected, signature or ''):
+        return {
+            "success": False,
+            "schedules_created": 0,
+            "feedback": ["The diff does not match a preview generated for this department - run the preview again"],
+        }
+
+    existing_result = await db.execute(
+        select(Schedule)
+        .filter(
+            Schedule.department_id == department_id,
+            Schedule.date >= start_date,
+            Schedule.date <= end_date
+        )
+    )
+    existing = existing_result.scalars().all()
+    if schedules_fingerprint(existing) != base_fingerprint:
+        return {
+            "success": False,
+            "conflict": True,
+            "schedules_created": 0,
+            "feedback": ["Schedules in this range changed since the preview was generated - run the preview again"],
+        }
+
+    replaceable = {s.id for s in existing if s.status == 'scheduled'}
+    touched_ids = [e['schedule_id'] for e in diff.get('removed', []) + diff.get('changed', [])]
+    if not set(touched_ids) <= replaceable or len(touched_ids) != len(set(touched_ids)):
+        return {
+            "success": False,
+            "schedules_created": 0,
+            "feedback": ["The diff references schedules outside this department's work shifts in the range"],
+        }
+
+    # A check-in since the preview makes its shift history; the fingerprint only
+    # covers schedule rows. Locking the rows blocks check-ins until the commit.
+    if touched_ids:
+        await db.execute(
+            select(Schedule.id).where(Schedule.id.in_(touched_ids)).with_for_update()
+        )
+        checkin_result = await db.execute(
+            select(CheckInOut.schedule_id).where(CheckInOut.schedule_id.in_(touched_ids)).limit(1)
+        )
+        if checkin_result.first() is not None:
+            return {
+                "success": False,
+                "conflict": True,
+                "schedules_created": 0,
+                "feedback": ["An employee checked into a shift this preview replaces - run the preview again"],
+            }
+
+    emp_result = await db.execute(
+        select(Employee.id).filter(Employee.department_id == department_id)
+    )
+    department_employees = set(emp_result.scalars().all())
+    # Role -> shift ids of the department (roles or shifts may have moved since the preview)
+    shift_result = await db.execute(
+        select(Role.id, Shift.id)
+        .outerjoin(Shift, Shift.role_id == Role.id)
+        .filter(Role.department_id == department_id)
+    )
+    role_shifts = defaultdict(set)
+    for role_id, shift_id in shift_result.all():
+        role_shifts[role_id].add(shift_id)
+
+    def invalid_assignment(role_id, shift_id) -> bool:
+        return role_id not in role_shifts or (shift_id is not None and shift_id not in role_shifts[role_id])
+
+    for entry in diff.get('changed', []):
+        if invalid_assignment(entry['role_id'], entry.get('to_shift_id')):
+            return {
+                "success": False,
+                "schedules_created": 0,
+                "feedback": [f"Changed schedule {entry['schedule_id']} uses a role or shift "
+                             f"outside this department"],
+            }
+
+    new_schedules = []
+    for entry in diff.get('added', []):
+        entry_date = date.fromisoformat(entry['date'])
+        if entry['employee_id'] not in department_employees or not start_date <= entry_date <= end_date:
+            return {
+                "success": False,
+                "schedules_created": 0,
+                "feedback": [f"Added schedule for employee {entry['employee_id']} on {entry['date']} "
+                             f"is outside this department or date range"],
+            }
+        if (invalid_assignment(entry['role_id'], entry.get('shift_id'))
+                or entry.get('status', 'scheduled') not in GENERATED_STATUSES):
+            return {
+                "success": False,
+                "schedules_created": 0,
+                "feedback": [f"Added schedule for employee {entry['employee_id']} on {entry['date']} "
+                             f"has a role, shift or status this department cannot generate"],
+            }
+        new_schedules.append(Schedule(
+            department_id=department_id,
+            employee_id=entry['employee_id'],
+            role_id=entry['role_id'],
+            shift_id=entry.get('shift_id'),
+            date=entry_date,
+            start_time=entry.get('start_time'),
+            end_time=entry.get('end_time'),
+            status=entry.get('status', 'scheduled'),
+            notes=entry.get('notes')
+        ))
+    updates = [
+        {
+            'id': e['schedule_id'],
+            'shift_id': e['to_shift_id'],
+            'role_id': e['role_id'],
+            'start_time': e['start_time'],
+            'end_time': e['end_time'],
+        }
+        for e in diff.get('changed', [])
+    ]
+
+    written = await write_generated_schedules(
+        db, new_schedules, [e['schedule_id'] for e in diff.get('removed', [])], updates
+    )
+    return {
+        "success": True,
+        "schedules_created": written['inserted'],
+        "schedules_updated": written['updated'],
+        "schedules_removed": written['deleted'],
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+        "feedback": [f"Applied preview: {written['inserted']} added, {written['updated']} changed, "
+                     f"{written['deleted']} removed in {written['seconds']:.2f}s"],
+        "schedules": []
+    }
+
+
+async def generate_department_schedules(
+    db: AsyncSession,
+    department_id: int,
+    start_date: date,
+    end_date: date,
+    regenerate: bool = False,
+    engine: str = 'greedy',
+    progress: Optional[ProgressCallback] = None,
+    repair: bool = False,
+    dry_run: bool = False,
+    accept_gap: Optional[float] = None,
+    stall_seconds: Optional[float] = None
+) -> Dict:
+    """
+    Generate schedules for a department and date range.
+
+    Args:
+        db: Database session
+        department_id: Department to schedule
+        start_date: First day to schedule
+        end_date: Last day to schedule
+        regenerate: Replace existing 'scheduled' rows in the range
+        engine: 'greedy' (day-by-day assignment) or 'cpsat' (one CP-SAT model)
+        progress: Optional async callback receiving (percent, new feedback lines)
+        repair: Incrementally repair the existing schedule around leave, comp-off
+            and unavailability changes (always CP-SAT; regenerate is ignored)
+        dry_run: Run the engine in memory and return the diff against the current
+            schedule (plus coverage) instead of writing it; implies regenerate
+        accept_gap: CP-SAT only - accept a solution within this relative
+            optimality gap instead of waiting for OPTIMAL (default SOLVER_ACCEPT_GAP)
+        stall_seconds: CP-SAT only - accept the best solution once it has not
+            improved for this long (default SOLVER_STALL_SECONDS)
+
+    Returns: response dict for POST /schedules/generate
+    """
+    started = time.perf_counter()
+    regenerate = regenerate or dry_run
+
+    # ===== NEW: Check if schedules already exist in this date range =====
+    existing_schedules_result = await db.execute(
+        select(Schedule)
+        .filter(
+            Schedule.department_id == department_id,
+            Schedule.date >= start_date,
+            Schedule.date <= end_date
+        )
+    )
+    existing_schedules = existing_schedules_result.scalars().all()
+    
+    if existing_schedules and not regenerate and not repair:
+        # Return message asking if user wants to regenerate
+        return {
+            "success": False,
+            "schedules_created": 0,
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "requires_confirmation": True,
+            "existing_count": len(existing_schedules),
+            "feedback": [
+                f"⚠️  Found {len(existing_schedules)} existing schedules for this date range.",
+                "Do you want to regenerate and replace them?"
+            ],
+            "schedules": []
+        }
+    
+    # ===== PRESERVE SCHEDULES WITH CHECK-INS DURING REGENERATION =====
+    # Get schedule IDs that have check-in records - these should NOT be deleted
+    schedules_with_checkins = set()
+    if existing_schedules and regenerate and not repair:
+        checkin_sched_result = await db.execute(
+            select(CheckInOut.schedule_id)
+            .where(CheckInOut.schedule_id != None)
+            .distinct()
+        )
+        schedules_with_checkins = set(checkin_sched_result.scalars().all())
+        
+        if schedules_with_checkins:
+            print(f"[DEBUG] Found {len(schedules_with_checkins)} schedules with check-in records - will skip deletion", flush=True)
+    
+    # If regenerate is True, delete existing schedules first (but PRESERVE leaves, comp-off, and schedules with check-ins)
+    # The rows are deleted together with the insert of the new schedule (one
+    # transaction), so a failed generation leaves the old schedule in place
+    schedules_to_delete_ids = []
+    if existing_schedules and regenerate and not repair:
+        print(f"[DEBUG] Regenerating - deleting {len(existing_schedules)} existing schedules (excluding ones with check-ins)", flush=True)
+        
+        # Get ONLY 'scheduled' schedules to delete (will recreate them)
+        # BUT: Exclude any that have check-in records
+        # Preserve: 'leave', 'leave_half_morning', 'leave_half_afternoon', 'comp_off_earned', 'comp_off_taken'
+        # comp_off_taken is approved leave and should NOT be deleted!
+        # Build filter conditions dynamically
+        filter_conditions = [
+            Schedule.department_id == department_id,
+            Schedule.date >= start_date,
+            Schedule.date <= end_date,
+            Schedule.status == 'scheduled'  # Only delete work shifts, NOT approved leaves or comp-off usage
+        ]
+        # Exclude schedules with check-ins if any exist
+        if schedules_with_checkins:
+            filter_conditions.append(~Schedule.id.in_(list(schedules_with_checkins)))
+        
+        schedules_to_delete_result = await db.execute(
+            select(Schedule.id).filter(*filter_conditions)
+        )
+        schedules_to_delete_ids = schedules_to_delete_result.scalars().all()
+        
+        print(f"[DEBUG] Replacing {len(schedules_to_delete_ids)} work shift schedules (excluding {len(schedules_with_checkins)} with check-ins)", flush=True)
+        feedback = [f"Replacing work shift schedules (preserving comp-off, regular leaves, and schedules with check-ins)..."]
+    else:
+        feedback = []
+
+    # Get all roles in this department
+    roles_result = await db.execute(
+        select(Role)
+        .filter(Role.department_id == department_id, Role.is_active == True)
+    )
+    roles = roles_result.scalars().all()
+    print(f"[DEBUG] Found {len(roles)} roles", flush=True)
+
+    if not roles:
+        return {
+            "success": True,
+            "schedules_created": 0,
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "feedback": ["❌ No active roles found in your department. Create roles first."],
+            "schedules": []
+        }
+
+    # Get all shifts for these roles
+    role_ids = [r.id for r in roles]
+    shifts_result = await db.execute(
+        select(Shift)
+        .filter(Shift.role_id.in_(role_ids), Shift.is_active == True)
+    )
+    shifts = shifts_result.scalars().all()
+    print(f"[DEBUG] Found {len(shifts)} shifts", flush=True)
+
+    # Log shift details and ensure all shifts have schedule_config
+    print(f"[DEBUG] Processing {len(shifts)} shifts for schedule_config validation", flush=True)
+    for shift in shifts:
+        # For backward compatibility:
+        # - If shift has NO schedule_config or empty, assume ALL days are enabled
+        # - If shift has schedule_config, use the configured days
+        if not shift.schedule_config or not isinstance(shift.schedule_config, dict) or len(shift.schedule_config) == 0:
+            print(f"[DEBUG] Shift {shift.id} ({shift.name}) has empty/invalid schedule_config, enabling all days for backward compatibility", flush=True)
+            # Old shift without schedule_config - enable all days for backward compatibility
+            shift.schedule_config = {
+                'Monday': {'enabled': True},
+                'Tuesday': {'enabled': True},
+                'Wednesday': {'enabled': True},
+                'Thursday': {'enabled': True},
+                'Friday': {'enabled': True},
+                'Saturday': {'enabled': True},
+                'Sunday': {'enabled': True}
+            }
+        else:
+            # Ensure all days have proper structure
+            if isinstance(shift.schedule_config, dict):
+                for day in ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']:
+                    if day not in shift.schedule_config or not isinstance(shift.schedule_config[day], dict):
+                        # Missing day or malformed - fix it
+                        shift.schedule_config[day] = {'enabled': False}
+                    elif 'enabled' not in shift.schedule_config[day]:
+                        # Missing 'enabled' key - add it
+                        shift.schedule_config[day]['enabled'] = False
+        
+        enabled_days = [day for day, cfg in shift.schedule_config.items() if isinstance(cfg, dict) and cfg.get('enabled', False)]
+        print(f"[DEBUG] Final Shift: {shift.id} - {shift.name}, enabled_days={enabled_days}", flush=True)
+
+    if not shifts:
+        return {
+            "success": True,
+            "schedules_created": 0,
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "feedback": ["❌ No active shifts found in your roles. Create shifts first."],
+            "schedules": []
+        }
+
+    # Get all employees in the department
+    employees_result = await db.execute(
+        select(Employee)
+        .filter(Employee.department_id == department_id, Employee.is_active == True)
+    )
+    employees = employees_result.scalars().all()
+    print(f"[DEBUG] Found {len(employees)} employees", flush=True)
+
+    # Log employee details
+    for emp in employees:
+        logger.debug("Employee: %s - %s, active=%s, weekly_hours=%s, daily_max=%s, shifts_per_week=%s",
+                     emp.id, emp.first_name, emp.is_active, emp.weekly_hours, emp.daily_max_hours, emp.shifts_per_week)
+
+    if not employees:
+        return {
+            "success": True,
+            "schedules_created": 0,
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "feedback": ["❌ No active employees found in your department. Create employees first."],
+            "schedules": []
+        }
+
+    # Calculate which employees are eligible for each shift (based on role)
+    # Strategy: Assign employees to shifts day-by-day
+    # Each employee gets ONE shift per day maximum (no double shifts)
+    # If shifts are Mon-Friday, all eligible employees get all 5 days
+    eligible_for_shift = {}  # {shift_id: [emp1, emp2, emp3...]} - only eligible employees per shift
+
+    print(f"[DEBUG] Building eligibility matrix for {len(shifts)} shifts and {len(employees)} employees", flush=True)
+    for shift in shifts:
+        eligible_for_shift[shift.id] = []
+        
+        for emp in employees:
+            # Employee is eligible if:
+            # 1. They have no specific role assignment (flexible=True), OR
+            # 2. Their role matches the shift's role
+            is_eligible = (emp.role_id is None) or (emp.role_id == shift.role_id)
+            
+            if is_eligible:
+                eligible_for_shift[shift.id].append(emp)
+                logger.debug("Shift %s (%s): %s (%s) is ELIGIBLE", shift.id, shift.name, emp.id, emp.first_name)
+            else:
+                logger.debug("Shift %s (%s): %s (%s) is NOT eligible (role mismatch: emp.role=%s vs shift.role=%s)",
+                             shift.id, shift.name, emp.id, emp.first_name, emp.role_id, shift.role_id)
+
+    # Prefetch leaves, comp-offs, existing schedules and holidays for the whole
+    # range once; the assignment loop below runs entirely against these indexes
+    context = await SchedulingContext.load(
+        db, department_id, [emp.id for emp in employees], start_date, end_date, roles=roles
+    )
+    print(f"[DEBUG] Scheduling context loaded with {context.query_count} queries: "
+          f"{len(context.leaves)} leave days, {len(context.comp_offs)} comp-offs, "
+          f"{sum(len(s) for s in context.schedules_by_day.values())} existing schedules, "
+          f"{len(context.holidays)} holidays", flush=True)
+
+    # Rows being replaced no longer count as existing load
+    if schedules_to_delete_ids:
+        doomed = set(schedules_to_delete_ids)
+        for scheds in list(context.schedules_by_day.values()):
+            for sched in [s for s in scheds if s.id in doomed]:
+                context.remove_schedule(sched)
+
+    progress = progress or _no_progress
+    await progress(10, [f"Loaded {len(employees)} employees, {len(shifts)} shifts and "
+                        f"{len(context.leaves) + len(context.comp_offs)} leave/comp-off days"])
+
+    early_stop = {
+        key: value for key, value in (('accept_gap', accept_gap), ('stall_seconds', stall_seconds))
+        if value is not None
+    }
+    loaded = time.perf_counter()
+    if repair:
+        result = await run_repair(db, department_id, start_date, end_date, roles, shifts, employees,
+                                  eligible_for_shift, context, progress, early_stop=early_stop)
+    elif engine == 'cpsat':
+        result = await run_cpsat(department_id, start_date, end_date, roles, shifts, employees,
+                                 eligible_for_shift, context, progress, early_stop=early_stop)
+    else:
+        result = await run_greedy(department_id, start_date, end_date, roles, shifts,
+                                  eligible_for_shift, context, progress)
+
+    async def record_telemetry(success: bool, assign_seconds: float, write_seconds: Optional[float] = None):
+        steps = {'load': loaded - started, 'assign': assign_seconds}
+        if write_seconds is not None:
+            steps['persist'] = write_seconds
+        await record_generation(
+            department_id, 'repair' if repair else engine, start_date, end_date,
+            employees=len(employees), shifts=len(shifts), success=success,
+            models=result.get('telemetry', []), cached_models=result.get('cached_models', 0),
+            steps=steps, total_seconds=time.perf_counter() - started
+        )
+
+    if result.get('error'):
+        await record_telemetry(success=False, assign_seconds=time.perf_counter() - loaded)
+        return {
+            "success": False,
+            "schedules_created": 0,
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "feedback": result['feedback'],
+            "overtime_warnings": [],
+            "schedules": []
+        }
+
+    assigned = time.perf_counter()
+
+    removed_schedules = result.get('removed_schedules', [])
+    if repair:
+        schedules_to_delete_ids = [s.id for s in removed_schedules]
+
+    if dry_run:
+        replaced_ids = set(schedules_to_delete_ids)
+        replaced = [s for s in existing_schedules if s.id in replaced_ids]
+        kept = [s for s in existing_schedules if s.id not in replaced_ids]
+        diff = build_schedule_diff(replaced, result['new_schedules'])
+        base_fingerprint = schedules_fingerprint(existing_schedules)
+        feedback = result['feedback']
+        feedback.insert(0, f"Preview: {len(diff['added'])} added, {len(diff['changed'])} changed, "
+                           f"{len(diff['removed'])} removed (nothing saved)")
+        await record_telemetry(success=True, assign_seconds=assigned - loaded)
+        return {
+            "success": True,
+            "dry_run": True,
+            "schedules_created": 0,
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "base_fingerprint": base_fingerprint,
+            "preview_signature": preview_signature(department_id, start_date, end_date,
+                                                   base_fingerprint, diff),
+            "diff": diff,
+            "summary": {key: len(entries) for key, entries in diff.items()},
+            "coverage": coverage_summary(shifts, kept + list(result['new_schedules']),
+                                         start_date, end_date, context),
+            "feedback": feedback,
+            "overtime_warnings": result['overtime_warnings'],
+            "windows": result.get('windows', []),
+            "schedules": []
+        }
+
+    # Replaced rows are deleted in the same transaction as the new rows are written
+    await progress(95, [])
+    written = await write_generated_schedules(db, result['new_schedules'], schedules_to_delete_ids)
+    schedules_created = written['inserted']
+    await record_telemetry(success=True, assign_seconds=assigned - loaded, write_seconds=written['seconds'])
+
+    feedback = result['feedback']
+    overtime_warnings = result['overtime_warnings']
+    if repair:
+        feedback.insert(0, f"Repaired schedule: {schedules_created} added, {len(removed_schedules)} removed")
+    else:
+        feedback.insert(0, f"Successfully generated {schedules_created} schedules")
+    feedback.append(f"Saved {written['inserted']} schedule(s) and removed {written['deleted']} "
+                    f"in {written['seconds']:.2f}s")
+    
+    # Add overtime warnings to feedback
+    if overtime_warnings:
+        feedback.append(f"⚠️  {len(overtime_warnings)} overtime alert(s) - shifts exceed 9 hours on that day")
+
+    return {
+        "success": True,
+        "schedules_created": schedules_created,
+        "schedules_removed": written['deleted'],
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+        "feedback": feedback,
+        "overtime_warnings": overtime_warnings,
+        "windows": result.get('windows', []),
+        "timings": {
+            'load_seconds': round(loaded - started, 3),
+            'assign_seconds': round(assigned - loaded, 3),
+            'build_seconds': round(sum(w['build_seconds'] for w in result.get('windows', [])), 3),
+            'solve_seconds': round(sum(w['solve_seconds'] for w in result.get('windows', [])), 3),
+            'write_seconds': round(written['seconds'], 3),
+            'total_seconds': round(time.perf_counter() - started, 3),
+        },
+        "schedules": []
+    }
+
@@ -10,17 +10,156 @@ Workflow:
 """
 
 import math
+import threading
+import time
 from datetime import datetime, timedelta, date
 from collections import defaultdict
-from typing import List, Dict, Tuple, Optional, Any
+from typing import List, Dict, Tuple, Optional, Any, Callable
+import numpy as np
 from ortools.sat.python import cp_model
 
+from app.config import settings
+from app.holidays_jp import jp_calendar
+from app.solver_resources import solver_resources
+
+
+# Penalty per missing employee below a shift's min_emp (shift model)
+MIN_COVERAGE_PENALTY = 100
+
+
+def relative_gap(objective: float, bound: float) -> float:
+    """Relative distance between a solution's objective and the best proven bound"""
+    return abs(bound - objective) / max(1.0, abs(bound))
+
+
+class StepTimer:
+    """
+    Lap timer for model building: mark(step) charges the time (and the
+    constraints added) since the previous mark to step.
+    """
+
+    def __init__(self, model: cp_model.CpModel):
+        self.model = model
+        self.seconds: Dict[str, float] = {}
+        self.constraints: Dict[str, int] = {}
+        self._last = time.perf_counter()
+        self._last_constraints = 0
+
+    def mark(self, step: str):
+        now = time.perf_counter()
+        constraints = len(self.model.Proto().constraints)
+        self.seconds[step] = self.seconds.get(step, 0.0) + now - self._last
+        if constraints > self._last_constraints:
+            self.constraints[step] = self.constraints.get(step, 0) + constraints - self._last_constraints
+        self._last = now
+        self._last_constraints = constraints
+
+
+def model_telemetry(model: cp_model.CpModel, solver: cp_model.CpSolver,
+                    status: Optional[int], timer: StepTimer, kind: str) -> Dict:
+    """Structured size, timing and search statistics of one CP-SAT run"""
+    proto = model.Proto()
+    solved = status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+    return {
+        'model': kind,
+        'variables': len(proto.variables),
+        'constraints': len(proto.constraints),
+        'constraints_by_family': dict(timer.constraints),
+        'steps': {step: round(seconds, 4) for step, seconds in timer.seconds.items()},
+        'status': solver.StatusName(status) if status is not None else None,
+        'objective': solver.ObjectiveValue() if solved else None,
+        'bound': solver.BestObjectiveBound() if solved else None,
+        'branches': solver.NumBranches() if status is not None else 0,
+        'conflicts': solver.NumConflicts() if status is not None else 0,
+        'wall_time': solver.WallTime() if status is not None else 0.0,
+    }
+
+
+class SolutionRecorder(cp_model.CpSolverSolutionCallback):
+    """
+    Records every improving CP-SAT solution (objective, bound, gap, time) and
+    stops the search early once the gap reaches accept_gap or no better
+    solution has been found for stall_seconds. Either limit is off at 0.
+    The search is also stopped as soon as should_stop() returns True.
+    """
+
+    def __init__(self, accept_gap: float = 0.0, stall_seconds: float = 0.0,
+                 on_solution: Optional[Callable[[Dict], None]] = None,
+                 should_stop: Optional[Callable[[], bool]] = None):
+        super().__init__()
+        self.accept_gap = accept_gap
+        self.stall_seconds = stall_seconds
+        self.on_solution = on_solution
+        self.should_stop = should_stop
+        self.solutions = []
+        self.stop_reason = None
+        self._last_improvement = None
+        self._done = threading.Event()
+
+    def on_solution_callback(self):
+        objective = self.ObjectiveValue()
+        bound = self.BestObjectiveBound()
+        solution = {
+            'objective': objective,
+            'bound': bound,
+            'gap': relative_gap(objective, bound),
+            'seconds': self.WallTime(),
+        }
+        self.solutions.append(solution)
+        self._last_improvement = time.monotonic()
+        if self.on_solution:
+            self.on_solution(solution)
+        if self.accept_gap and solution['gap'] <= self.accept_gap:
+            self.stop_reason = 'gap'
+            self.StopSearch()
+
+    def _watch(self):
+        # Solution callbacks only fire on improvements, so stalls and
+        # cancellation are detected here
+        while not self._done.wait(0.25):
+            if self.should_stop is not None and self.should_stop():
+                self.stop_reason = 'cancelled'
+                self.StopSearch()
+                return
+            if self.stall_seconds and self._last_improvement is not None and \
+                    time.monotonic() - self._last_improvement >= self.stall_seconds:
+                self.stop_reason = 'stall'
+                self.StopSearch()
+                return
+
+    def solve(self, solver: cp_model.CpSolver, model: cp_model.CpModel) -> int:
+        """Solve model with this callback attached (and the watchdog when stalls or cancellation are watched)"""
+        watchdog = None
+        if self.stall_seconds or self.should_stop is not None:
+            watchdog = threading.Thread(target=self._watch, daemon=True)
+            watchdog.start()
+        try:
+            return solver.Solve(model, self)
+        finally:
+            self._done.set()
+            if watchdog is not None:
+                watchdog.join()
+
+    @property
+    def best(self) -> Optional[Dict]:
+        return self.solutions[-1] if self.solutions else None
+
 
 class ShiftScheduleGenerator:
     """Generate optimized schedules using priority-based distribution and OR-Tools"""
 
     def __init__(self, employees: List[Dict], roles: List[Dict], 
-                 leave_dates: Dict[int, set], unavailable_dates: Dict[int, set]):
+                 leave_dates: Dict[int, set], unavailable_dates: Dict[int, set],
+                 shifts: Optional[List[Dict]] = None,
+                 blocked_dates: Optional[Dict[int, set]] = None,
+                 existing_load: Optional[Dict[int, Dict[date, Dict]]] = None,
+                 holidays: Optional[set] = None,
+                 hints: Optional[Dict[Tuple[int, date], int]] = None,
+                 neighborhood: Optional[set] = None,
+                 allocation: Optional[Dict] = None,
+                 early_stop: Optional[Dict] = None,
+                 on_solution: Optional[Callable[[Dict], None]] = None,
+                 cancelled: Optional[Callable[[], bool]] = None):
         """
         Initialize the generator with employees, roles, and blocked dates
         
@@ -29,15 +168,59 @@ class ShiftScheduleGenerator:
             roles: List of role dicts with id, name, priority_percentage, required_count, etc.
             leave_dates: Dict mapping employee_id -> set of leave dates (date objects)
             unavailable_dates: Dict mapping employee_id -> set of unavailable dates
+            shifts: Optional list of shift dicts (id, role_id, name, start_time, end_time,
+                min_emp, max_emp, schedule_config, break_minutes). When given, the model
+                assigns employees to individual shifts instead of roles.
+            blocked_dates: Dict mapping employee_id -> dates that already have a
+                schedule entry (shift model only)
+            existing_load: Dict mapping employee_id -> {week_start: {'weekday', 'weekend',
+                'work_minutes', 'worked_dates'}} for schedules already in the database
+                (shift model only)
+            holidays: Dates on which no shifts run (shift model only)
+            hints: Dict mapping (employee_id, date) -> shift_id of the current
+                schedule, used as a warm start (shift model only)
+            neighborhood: Set of (employee_id, date) pairs to re-solve. When given,
+                every other assignment is pinned to its hint (incremental repair)
+            allocation: {'num_workers', 'time_limit'} granted by the solver
+                resource manager; defaults to the configured per-solve limits
+            early_stop: {'accept_gap', 'stall_seconds'} to stop the shift model
+                before OPTIMAL; defaults to SOLVER_ACCEPT_GAP / SOLVER_STALL_SECONDS
+            on_solution: Called with {'objective', 'bound', 'gap', 'seconds'} for
+                each improving solution of the shift model
+            cancelled: Polled during the shift model's search; the search stops
+                once it returns True
         """
         self.employees = employees
         self.roles = roles
+        self._roles_by_id = {r['id']: r for r in roles}
         self.leave_dates = leave_dates
         self.unavailable_dates = unavailable_dates
+        self.shifts = shifts
+        self.blocked_dates = blocked_dates or {}
+        self.existing_load = existing_load or {}
+        self.holidays = holidays or set()
+        self.hints = hints or {}
+        self.neighborhood = neighborhood
+        self.allocation = allocation or solver_resources.default_allocation()
+        early_stop = early_stop or {}
+        self.recorder = SolutionRecorder(
+            accept_gap=early_stop.get('accept_gap', settings.SOLVER_ACCEPT_GAP),
+            stall_seconds=early_stop.get('stall_seconds', settings.SOLVER_STALL_SECONDS),
+            on_solution=on_solution,
+            should_stop=cancelled
+        )
+        self.coverage = []
+        self.status = None
         self.model = cp_model.CpModel()
         self.solver = cp_model.CpSolver()
+        self.timer = StepTimer(self.model)
         self.feedback = []
 
+    def telemetry(self) -> Dict:
+        """Model size, per-step wall time and solver statistics of the last generate()"""
+        return model_telemetry(self.model, self.solver, self.status, self.timer,
+                               'shift' if self.shifts is not None else 'role')
+
     def add_feedback(self, message: str, severity: str = 'info'):
         """Add feedback message for user visibility"""
         self.feedback.append({'message': message, 'severity': severity})
@@ -86,6 +269,56 @@ class ShiftScheduleGenerator:
         """Check if employee is unavailable on given date"""
         return check_date in self.unavailable_dates.get(employee_id, set())
 
+    def _build_index(self, dates: List[date]) -> Dict[str, Any]:
+        """
+        Precompute lookup tables for the role model over the date index.
+
+        Returns a dict with:
+            roles_by_id: role_id -> role dict
+            role_employees: role_id -> NumPy array of employee indices
+            shifts_per_week: int array [employee] of weekly shift targets (default 5)
+            leave: bool array [employee, date], True when on leave
+            unavailable: bool array [employee, date], True when unavailable
+            enabled: role_id -> bool array [date], True when the role runs that day
+        """
+        date_index = {d: i for i, d in enumerate(dates)}
+        num_employees, num_dates = len(self.employees), len(dates)
+
+        leave = np.zeros((num_employees, num_dates), dtype=bool)
+        unavailable = np.zeros((num_employees, num_dates), dtype=bool)
+        shifts_per_week = np.array(
+            [emp.get('shifts_per_week', 5) for emp in self.employees], dtype=int
+        )
+        role_members = defaultdict(list)
+        for i, emp in enumerate(self.employees):
+            role_members[emp.get('role_id')].append(i)
+            for d in self.leave_dates.get(emp['id'], ()):
+                if d in date_index:
+                    leave[i, date_index[d]] = True
+            for d in self.unavailable_dates.get(emp['id'], ()):
+                if d in date_index:
+                    unavailable[i, date_index[d]] = True
+
+        day_names = [d.strftime('%A') for d in dates]
+        enabled = {}
+        for role in self.roles:
+            schedule_config = role.get('schedule_config') or {}
+            enabled[role['id']] = np.array(
+                [bool(schedule_config.get(day_name, {}).get('enabled', False)) for day_name in day_names],
+                dtype=bool
+            )
+
+        return {
+            'roles_by_id': self._roles_by_id,
+            'role_employees': {
+                role['id']: np.array(role_members.get(role['id'], []), dtype=int) for role in self.roles
+            },
+            'shifts_per_week': shifts_per_week,
+            'leave': leave,
+            'unavailable': unavailable,
+            'enabled': enabled,
+        }
+
     def generate(self, start_date: date, end_date: date) -> Tuple[Optional[Dict], Optional[str]]:
         """
         Generate optimized schedule for date range with unavailability reassignment.
@@ -100,6 +333,9 @@ class ShiftScheduleGenerator:
             Tuple of (schedule_dict, error_message)
             schedule_dict has format: {date: {employee_id: {role_id: [shift_info]}}}
         """
+        if self.shifts is not None:
+            return self._generate_shift_model(start_date, end_date)
+
         # Generate date range
         dates = []
         current = start_date
@@ -107,32 +343,28 @@ class ShiftScheduleGenerator:
             dates.append(current)
             current += timedelta(days=1)
 
-        days_of_week = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 
-                       'Friday', 'Saturday', 'Sunday']
-
         self.add_feedback(f"Generating schedule from {start_date} to {end_date}", 'info')
         self.add_feedback("Note: Unavailable dates will trigger shift reassignment to alternative days", 'info')
 
+        index = self._build_index(dates)
+        roles_by_id = index['roles_by_id']
+        leave = index['leave']
+        unavailable = index['unavailable']
+        self.timer.mark('index')
+
         # ===== STEP 1: Calculate total shifts per role (minus leaves AND unavailability) =====
         self.add_feedback("Step 1: Calculating total shifts per role...", 'info')
 
         role_capacities = {}
         for role in self.roles:
             role_id = role['id']
-            role_employees = [e for e in self.employees 
-                            if e.get('role_id') == role_id]
+            members = index['role_employees'][role_id]
 
             # Sum shifts for all employees in this role
-            total_shifts = sum(
-                e.get('shifts_per_week', 5) * (len(dates) // 7 + 1)
-                for e in role_employees
-            )
+            total_shifts = int(index['shifts_per_week'][members].sum()) * (len(dates) // 7 + 1)
 
             # Subtract leave days (hard block - no reassignment)
-            leave_reduction = sum(
-                sum(1 for d in dates if self._is_on_leave(e['id'], d))
-                for e in role_employees
-            )
+            leave_reduction = int(leave[members].sum())
 
             # Note: Unavailability is handled via reassignment, not capacity reduction
             # The solver will avoid assigning to unavailable days, and reassign instead
@@ -140,23 +372,29 @@ class ShiftScheduleGenerator:
             total_shifts = max(0, total_shifts - leave_reduction)
             role_capacities[role_id] = total_shifts
 
-            unavail_count = sum(
-                sum(1 for d in dates if self._is_unavailable(e['id'], d))
-                for e in role_employees
-            )
+            unavail_count = int(unavailable[members].sum())
 
             self.add_feedback(
                 f"  Role '{role['name']}': {total_shifts} shifts needed "
-                f"({len(role_employees)} employees, -{leave_reduction} leave days, {unavail_count} unavailable slots)",
+                f"({len(members)} employees, -{leave_reduction} leave days, {unavail_count} unavailable slots)",
                 'info'
             )
 
+        self.timer.mark('capacity')
+
         # ===== STEP 2 & 3: Distribute by priority to days =====
         self.add_feedback("Step 2: Distributing shifts by priority...", 'info')
 
         day_role_allocations = {}  # {date: {role_id: count}}
-        
-        for date_obj in dates:
+
+        # Employees of each role not on leave, per date. Unavailable employees
+        # still count (they can be reassigned)
+        available_by_role = {
+            role['id']: len(index['role_employees'][role['id']]) - leave[index['role_employees'][role['id']]].sum(axis=0)
+            for role in self.roles
+        }
+
+        for d, date_obj in enumerate(dates):
             day_name = date_obj.strftime('%A')
             day_role_allocations[date_obj] = {}
 
@@ -169,37 +407,18 @@ class ShiftScheduleGenerator:
                     continue
 
                 # Check if role is configured for this day
-                schedule_config = role.get('schedule_config', {})
-                day_config = schedule_config.get(day_name, {})
-                
-                if not day_config.get('enabled', False):
+                if not index['enabled'][role_id][d]:
                     day_role_allocations[date_obj][role_id] = 0
                     continue
 
-                # Get day priority
-                day_priority = day_config.get('day_priority', 1)
-                
+                day_config = role.get('schedule_config', {}).get(day_name, {})
+
                 # Calculate required count for this role on this day
                 required_count = day_config.get('required_count', 
                                                role.get('required_count', 1))
-                
-                # Count available employees for this role on this date
-                # Only exclude leaves, NOT unavailability (unavailable employees can be reassigned)
-                available_count = sum(
-                    1 for e in self.employees
-                    if e.get('role_id') == role_id and
-                    not self._is_on_leave(e['id'], date_obj)
-                )
-
-                # Also exclude employees who cannot work this day due to shift type schedule
-                role_emp_can_work = sum(
-                    1 for e in self.employees
-                    if e.get('role_id') == role_id and
-                    not self._is_on_leave(e['id'], date_obj) and
-                    self._can_work_role_on_day(e['id'], role_id, day_name)
-                )
 
                 # Allocation is minimum of required and available
+                role_emp_can_work = int(available_by_role[role_id][d])
                 allocation = min(required_count, role_emp_can_work) if role_emp_can_work > 0 else 0
                 day_role_allocations[date_obj][role_id] = allocation
 
@@ -209,61 +428,51 @@ class ShiftScheduleGenerator:
                     'info'
                 )
 
+        self.timer.mark('allocation')
+
         # ===== STEP 4: Create decision variables =====
         self.add_feedback("Step 3: Creating assignment variables...", 'info')
 
         # assignments[emp_id][date][role_id] = BoolVar
         assignments = {}
         
-        for emp in self.employees:
+        for i, emp in enumerate(self.employees):
             emp_id = emp['id']
-            assignments[emp_id] = {}
-
-            for date_obj in dates:
-                assignments[emp_id][date_obj] = {}
-                day_name = date_obj.strftime('%A')
-
-                # Skip if employee is on LEAVE (hard block)
-                if self._is_on_leave(emp_id, date_obj):
-                    continue
-
-                # For unavailability: still create variable, but strongly discourage it
-                # We'll use a soft constraint that prefers other days
-
-                # Create variable for each role employee can work
-                role_id = emp.get('role_id')
-                if role_id:
-                    schedule_config = next(
-                        (r.get('schedule_config', {}) for r in self.roles 
-                         if r['id'] == role_id),
-                        {}
-                    )
-                    day_config = schedule_config.get(day_name, {})
+            assignments[emp_id] = {date_obj: {} for date_obj in dates}
+
+            # Create variable for each role employee can work
+            role_id = emp.get('role_id')
+            if role_id not in index['enabled']:
+                continue
+
+            # Skip days the employee is on LEAVE (hard block) or the role is off.
+            # For unavailability: still create variable, but strongly discourage it
+            workable = index['enabled'][role_id] & ~leave[i]
+            for d in np.flatnonzero(workable):
+                date_obj = dates[d]
+                var = self.model.NewBoolVar(
+                    f'assign_e{emp_id}_d{date_obj}_r{role_id}'
+                )
+                assignments[emp_id][date_obj][role_id] = var
 
-                    if day_config.get('enabled', False):
-                        var = self.model.NewBoolVar(
-                            f'assign_e{emp_id}_d{date_obj}_r{role_id}'
-                        )
-                        assignments[emp_id][date_obj][role_id] = var
+        self.timer.mark('variables')
 
         # ===== CONSTRAINTS =====
         self.add_feedback("Step 4: Adding constraints...", 'info')
 
         # Constraint 1: Each role must have required employees per day
-        for date_obj in dates:
-            for role in self.roles:
-                role_id = role['id']
+        for role in self.roles:
+            role_id = role['id']
+            role_emp_ids = [self.employees[i]['id'] for i in index['role_employees'][role_id]]
+            for date_obj in dates:
                 required = day_role_allocations[date_obj].get(role_id, 0)
 
                 if required > 0:
-                    day_assignments = []
-                    for emp in self.employees:
-                        if (emp.get('role_id') == role_id and
-                            date_obj in assignments.get(emp['id'], {})):
-                            if role_id in assignments[emp['id']][date_obj]:
-                                day_assignments.append(
-                                    assignments[emp['id']][date_obj][role_id]
-                                )
+                    day_assignments = [
+                        assignments[emp_id][date_obj][role_id]
+                        for emp_id in role_emp_ids
+                        if role_id in assignments[emp_id][date_obj]
+                    ]
 
                     if day_assignments:
                         self.model.Add(sum(day_assignments) >= required)
@@ -276,17 +485,16 @@ class ShiftScheduleGenerator:
                     self.model.Add(sum(day_shifts) <= 1)
 
         # Constraint 3: Employees work assigned shifts per week
+        self.timer.mark('role_constraints')
         self.add_feedback("Step 5: Applying shift distribution constraints...", 'info')
 
-        for emp in self.employees:
-            emp_id = emp['id']
-            shifts_per_week = emp.get('shifts_per_week', 5)
+        # Available days (not on leave) per employee
+        available_days_by_emp = len(dates) - leave.sum(axis=1)
 
-            # Count available days (not on leave)
-            available_days = sum(
-                1 for d in dates
-                if not self._is_on_leave(emp_id, d)
-            )
+        for i, emp in enumerate(self.employees):
+            emp_id = emp['id']
+            shifts_per_week = int(index['shifts_per_week'][i])
+            available_days = int(available_days_by_emp[i])
 
             # Target shifts (proportional to available days)
             weeks_count = len(dates) / 7.0
@@ -309,50 +517,49 @@ class ShiftScheduleGenerator:
                     )
 
         # Constraint 4: No more than 5 consecutive shifts
+        self.timer.mark('distribution_constraints')
         self.add_feedback("Step 6: Applying consecutive shift limits...", 'info')
 
         for emp in self.employees:
             emp_id = emp['id']
+            day_vars = [list(assignments[emp_id][date_obj].values()) for date_obj in dates]
             # For each 6-day window, ensure no more than 5 shifts
             for i in range(len(dates) - 5):
-                window_dates = dates[i:i+6]
-                window_shifts = []
-                
-                for date_obj in window_dates:
-                    for role_id in assignments.get(emp_id, {}).get(date_obj, {}):
-                        window_shifts.append(
-                            assignments[emp_id][date_obj][role_id]
-                        )
-
+                window_shifts = [var for vars_on_day in day_vars[i:i+6] for var in vars_on_day]
                 if window_shifts:
                     self.model.Add(sum(window_shifts) <= 5)
 
         # Objective: Maximize coverage + prefer non-unavailable days
+        self.timer.mark('consecutive_constraints')
         self.add_feedback("Step 7: Setting optimization objective...", 'info')
 
         objective_terms = []
-        for emp_id in assignments:
-            for date_obj in assignments[emp_id]:
-                for role_id in assignments[emp_id][date_obj]:
-                    var = assignments[emp_id][date_obj][role_id]
+        for i, emp in enumerate(self.employees):
+            emp_id = emp['id']
+            for d, date_obj in enumerate(dates):
+                for var in assignments[emp_id][date_obj].values():
                     # Base score for assignment
                     objective_terms.append(var)
                     
                     # Bonus if NOT on unavailable day (prefers available days)
-                    if not self._is_unavailable(emp_id, date_obj):
+                    if not unavailable[i, d]:
                         objective_terms.append(var)  # Extra weight for available days
 
         if objective_terms:
             self.model.Maximize(sum(objective_terms))
 
+        self.timer.mark('objective')
+
         # ===== SOLVE =====
         self.add_feedback("Step 8: Solving with OR-Tools CP-SAT...", 'info')
 
-        self.solver.parameters.max_time_in_seconds = 90.0
-        self.solver.parameters.num_search_workers = 8
+        self.solver.parameters.max_time_in_seconds = self.allocation['time_limit']
+        self.solver.parameters.num_search_workers = self.allocation['num_workers']
         self.solver.parameters.log_search_progress = False
 
         status = self.solver.Solve(self.model)
+        self.status = status
+        self.timer.mark('solve')
 
         if status not in [cp_model.OPTIMAL, cp_model.FEASIBLE]:
             error_msg = "Could not generate feasible schedule. Try adjusting constraints."
@@ -367,10 +574,9 @@ class ShiftScheduleGenerator:
         for emp in self.employees:
             emp_id = emp['id']
             for date_obj in dates:
-                for role_id in assignments.get(emp_id, {}).get(date_obj, {}):
-                    var = assignments[emp_id][date_obj][role_id]
+                for role_id, var in assignments[emp_id][date_obj].items():
                     if self.solver.Value(var) == 1:
-                        role = next((r for r in self.roles if r['id'] == role_id), None)
+                        role = roles_by_id.get(role_id)
                         if role:
                             schedule[date_obj][emp_id] = {
                                 'role_id': role_id,
@@ -379,14 +585,430 @@ class ShiftScheduleGenerator:
                                 'end_time': role.get('end_time', '17:00'),
                             }
 
+        self.timer.mark('extraction')
         return dict(schedule), None
 
-    def _can_work_role_on_day(self, emp_id: int, role_id: int, day_name: str) -> bool:
-        """Check if employee can work a specific role on a specific day"""
-        role = next((r for r in self.roles if r['id'] == role_id), None)
-        if not role:
-            return False
-        
-        schedule_config = role.get('schedule_config', {})
-        day_config = schedule_config.get(day_name, {})
-        return day_config.get('enabled', False)
+    # ===== SHIFT MODEL =====
+
+    @staticmethod
+    def _work_minutes(shift: Dict) -> Tuple[int, int]:
+        """Return (total_minutes, work_minutes) for a shift, work excluding breaks"""
+        try:
+            start = datetime.strptime(shift['start_time'], '%H:%M')
+            end = datetime.strptime(shift['end_time'], '%H:%M')
+        except (KeyError, ValueError, TypeError):
+            return 0, 0
+        total = int((end - start).total_seconds() // 60)
+        return total, total - int(shift.get('break_minutes') or 0)
+
+    def _generate_shift_model(self, start_date: date, end_date: date) -> Tuple[Optional[Dict], Optional[str]]:
+        """
+        Build and solve one model assigning employees to individual shifts.
+
+        Applies the same rules as the greedy generator: one shift per employee per
+        day, shift min_emp/max_emp, weekly hours, daily max hours, the holiday-aware
+        weekly shift requirement and at most 5 consecutive worked days per ISO week.
+        Existing schedules enter the model as constants via existing_load.
+
+        Returns:
+            Tuple of (schedule_dict, error_message)
+            schedule_dict has format: {date: {employee_id: shift_assignment}}
+        """
+        dates = []
+        current = start_date
+        while current <= end_date:
+            dates.append(current)
+            current += timedelta(days=1)
+
+        self.add_feedback(f"Generating shift schedule from {start_date} to {end_date} "
+                          f"({len(self.employees)} employees, {len(self.shifts)} shifts)", 'info')
+
+        shifts_by_id = {s['id']: s for s in self.shifts}
+        shift_minutes = {s['id']: self._work_minutes(s) for s in self.shifts}
+        self.timer.mark('setup')
+
+        # ===== Decision variables: x[emp, date, shift] =====
+        assignments = {}  # (emp_id, date, shift_id) -> BoolVar
+        by_emp_day = defaultdict(list)
+        by_day_shift = {}  # (date, shift_id) -> [BoolVar], one entry per enabled shift-day
+        by_emp_week = defaultdict(lambda: {'weekday': [], 'weekend': [], 'minutes': [],
+                                           'by_date': defaultdict(list)})
+        for date_obj in dates:
+            if date_obj in self.holidays:
+                continue
+            day_name = date_obj.strftime('%A')
+            for shift in self.shifts:
+                day_config = (shift.get('schedule_config') or {}).get(day_name, {})
+                if not (isinstance(day_config, dict) and day_config.get('enabled', False)):
+                    continue
+                _, work_minutes = shift_minutes[shift['id']]
+                slot_vars = by_day_shift.setdefault((date_obj, shift['id']), [])
+                week_start = date_obj - timedelta(days=date_obj.weekday())
+                for emp in self.employees:
+                    emp_id = emp['id']
+                    if emp.get('role_id') is not None and emp['role_id'] != shift['role_id']:
+                        continue
+                    if self._is_on_leave(emp_id, date_obj) or date_obj in self.blocked_dates.get(emp_id, set()):
+                        continue
+                    daily_max = emp.get('daily_max_hours') or 8
+                    if work_minutes > daily_max * 60:
+                        continue
+                    var = self.model.NewBoolVar(f'x_e{emp_id}_d{date_obj}_s{shift["id"]}')
+                    assignments[(emp_id, date_obj, shift['id'])] = var
+                    by_emp_day[(emp_id, date_obj)].append(var)
+                    slot_vars.append(var)
+                    week = by_emp_week[(emp_id, week_start)]
+                    week['weekend' if date_obj.weekday() >= 5 else 'weekday'].append(var)
+                    week['minutes'].append((max(0, work_minutes), var))
+                    week['by_date'][date_obj].append(var)
+
+        self.add_feedback(f"  Created {len(assignments)} assignment variables", 'info')
+        self.timer.mark('variables')
+
+        # Warm start from the current schedule; in repair mode pin everything
+        # outside the neighborhood to it
+        # A hint the model can no longer express (leave, disabled shift, role
+        # change) leaves its employee-day free instead of pinned to "off"
+        stale_hints = {
+            key for key, shift_id in self.hints.items()
+            if (key[0], key[1], shift_id) not in assignments
+        }
+        pinned = 0
+        for (emp_id, date_obj, shift_id), var in assignments.items():
+            hinted = self.hints.get((emp_id, date_obj)) == shift_id
+            if self.hints:
+                self.model.AddHint(var, 1 if hinted else 0)
+            if (self.neighborhood is not None and (emp_id, date_obj) not in self.neighborhood
+                    and (emp_id, date_obj) not in stale_hints):
+                self.model.Add(var == (1 if hinted else 0))
+                pinned += 1
+        if self.neighborhood is not None:
+            self.add_feedback(f"  Re-solving {len(assignments) - pinned} variables, {pinned} pinned", 'info')
+
+        self.timer.mark('hints')
+
+        # One shift per employee per day
+        for day_vars in by_emp_day.values():
+            if len(day_vars) > 1:
+                self.model.AddAtMostOne(day_vars)
+        self.timer.mark('one_shift_per_day')
+
+        # Shift coverage: max_emp is hard, min_emp is soft (shortfall is penalized)
+        shortfalls = {}
+        for (date_obj, shift_id), slot_vars in by_day_shift.items():
+            if not slot_vars:
+                continue
+            shift = shifts_by_id[shift_id]
+            max_emp = shift.get('max_emp') or len(slot_vars)
+            self.model.Add(sum(slot_vars) <= max_emp)
+            min_emp = min(shift.get('min_emp') or 0, max_emp)
+            if min_emp > 0:
+                shortfall = self.model.NewIntVar(0, min_emp, f'short_d{date_obj}_s{shift_id}')
+                self.model.Add(sum(slot_vars) + shortfall >= min_emp)
+                shortfalls[(date_obj, shift_id)] = shortfall
+        self.timer.mark('coverage_constraints')
+
+        # Weekly limits per employee and ISO week
+        required_by_week = {}
+        employees_by_id = {e['id']: e for e in self.employees}
+        for (emp_id, week_start), week in by_emp_week.items():
+            emp = employees_by_id[emp_id]
+            if week_start not in required_by_week:
+                required_by_week[week_start] = jp_calendar.get_shifts_required_for_week(week_start)
+            required = required_by_week[week_start]
+            load = self.existing_load.get(emp_id, {}).get(week_start, {})
+            existing_weekday = load.get('weekday', 0)
+            existing_weekend = load.get('weekend', 0)
+
+            # Weekday coverage (shifts, leaves, comp-offs) may not exceed the requirement
+            if week['weekday']:
+                self.model.Add(sum(week['weekday']) <= max(0, required - existing_weekday))
+
+            # A weekend shift is only allowed while the week's total stays within it
+            week_vars = week['weekday'] + week['weekend']
+            for var in week['weekend']:
+                self.model.Add(
+                    sum(week_vars) <= required - existing_weekday - existing_weekend
+                ).OnlyEnforceIf(var)
+
+            # Weekly hours (minutes, excluding breaks)
+            weekly_minutes = int((emp.get('weekly_hours') or 40) * 60) - load.get('work_minutes', 0)
+            self.model.Add(
+                sum(minutes * var for minutes, var in week['minutes']) <= max(0, weekly_minutes)
+            )
+
+            # At most 5 consecutive worked days within the week
+            worked_dates = load.get('worked_dates', set())
+            for offset in range(2):
+                window = [week_start + timedelta(days=offset + i) for i in range(6)]
+                fixed = sum(1 for d in window if d in worked_dates)
+                window_vars = [v for d in window for v in week['by_date'].get(d, [])]
+                if window_vars:
+                    self.model.Add(sum(window_vars) <= max(0, 5 - fixed))
+        self.timer.mark('weekly_constraints')
+
+        # Objective: maximize coverage, prefer available days, avoid min_emp shortfalls
+        objective_terms = []
+        for (emp_id, date_obj, _), var in assignments.items():
+            objective_terms.append(2 * var if not self._is_unavailable(emp_id, date_obj) else var)
+        objective_terms.extend(-MIN_COVERAGE_PENALTY * s for s in shortfalls.values())
+        if objective_terms:
+            self.model.Maximize(sum(objective_terms))
+
+        self.timer.mark('objective')
+        self.add_feedback("Solving shift model with OR-Tools CP-SAT...", 'info')
+        self.solver.parameters.max_time_in_seconds = self.allocation['time_limit']
+        self.solver.parameters.num_search_workers = self.allocation['num_workers']
+        self.solver.parameters.log_search_progress = False
+
+        status = self.recorder.solve(self.solver, self.model)
+        self.status = status
+        self.timer.mark('solve')
+
+        if status not in [cp_model.OPTIMAL, cp_model.FEASIBLE]:
+            error_msg = "Could not generate feasible schedule. Try adjusting constraints."
+            self.add_feedback(error_msg, 'error')
+            return None, error_msg
+
+        self.add_feedback(
+            f"✅ {'OPTIMAL' if status == cp_model.OPTIMAL else 'FEASIBLE'} shift schedule found!",
+            'success'
+        )
+        best = self.recorder.best
+        if best and status == cp_model.FEASIBLE:
+            reason = {'gap': 'optimality gap reached', 'stall': 'no improvement'}.get(self.recorder.stop_reason)
+            self.add_feedback(
+                f"Accepted after {len(self.recorder.solutions)} improving solution(s): objective "
+                f"{best['objective']:.0f}, bound {best['bound']:.0f}, gap {best['gap']:.1%}"
+                + (f" (stopped early: {reason})" if reason else ""),
+                'info'
+            )
+
+        # ===== EXTRACT SOLUTION =====
+        roles_by_id = {r['id']: r for r in self.roles}
+        schedule = defaultdict(dict)
+        for (emp_id, date_obj, shift_id), var in assignments.items():
+            if self.solver.Value(var) == 1:
+                shift = shifts_by_id[shift_id]
+                total_minutes, work_minutes = shift_minutes[shift_id]
+                schedule[date_obj][emp_id] = {
+                    'role_id': shift['role_id'],
+                    'role_name': roles_by_id.get(shift['role_id'], {}).get('name'),
+                    'shift_id': shift_id,
+                    'shift_name': shift['name'],
+                    'start_time': shift['start_time'],
+                    'end_time': shift['end_time'],
+                    'total_hours': total_minutes / 60,
+                    'work_hours': work_minutes / 60,
+                }
+
+        self.coverage = []
+        for (date_obj, shift_id), slot_vars in sorted(by_day_shift.items(), key=lambda kv: (kv[0][0], kv[0][1])):
+            shift = shifts_by_id[shift_id]
+            self.coverage.append({
+                'date': date_obj,
+                'shift_id': shift_id,
+                'shift_name': shift['name'],
+                'assigned': sum(self.solver.Value(v) for v in slot_vars),
+                'min_emp': shift.get('min_emp') or 0,
+                'max_emp': shift.get('max_emp'),
+            })
+
+        self.timer.mark('extraction')
+        return dict(schedule), None
+
+
+def solve_shift_schedule(payload: Dict) -> Dict:
+    """
+    Process-pool entry point: build a ShiftScheduleGenerator from plain,
+    picklable inputs, solve it and return a picklable result.
+
+    Args:
+        payload: {'inputs': ShiftScheduleGenerator kwargs, 'start_date', 'end_date',
+            optional 'allocation' from the solver resource manager, 'early_stop'
+            limits, 'progress_queue' receiving each improving solution and
+            'cancel_event' that stops the search when set}
+    """
+    started = time.perf_counter()
+    progress_queue = payload.get('progress_queue')
+    cancel_event = payload.get('cancel_event')
+    generator = ShiftScheduleGenerator(
+        **payload['inputs'],
+        allocation=payload.get('allocation'),
+        early_stop=payload.get('early_stop'),
+        on_solution=progress_queue.put if progress_queue is not None else None,
+        cancelled=cancel_event.is_set if cancel_event is not None else None
+    )
+    schedule, error = generator.generate(payload['start_date'], payload['end_date'])
+    elapsed = time.perf_counter() - started
+    best = generator.recorder.best
+    return {
+        'schedule': schedule,
+        'error': error,
+        'feedback': generator.feedback,
+        'coverage': generator.coverage,
+        'status': generator.solver.StatusName(generator.status) if generator.status is not None else None,
+        'wall_time': generator.solver.WallTime(),
+        # Model construction and solution extraction (everything but the search)
+        'build_seconds': max(0.0, elapsed - generator.solver.WallTime()),
+        'objective': best['objective'] if best else None,
+        'bound': best['bound'] if best else None,
+        'gap': best['gap'] if best else None,
+        'solutions': len(generator.recorder.solutions),
+        'stop_reason': generator.recorder.stop_reason,
+        'telemetry': [generator.telemetry()],
+    }
+
+
+def horizon_windows(start_date: date, end_date: date, window_days: int) -> List[Tuple[date, date]]:
+    """
+    Split a date range into consecutive solve windows for rolling-horizon
+    generation. Windows that are a whole number of weeks end on Sundays, so
+    each ISO week is solved inside a single window.
+    """
+    window_days = max(1, window_days)
+    windows = []
+    current = start_date
+    while current <= end_date:
+        if window_days % 7 == 0:
+            window_end = current - timedelta(days=current.weekday()) + timedelta(days=window_days - 1)
+        else:
+            window_end = current + timedelta(days=window_days - 1)
+        window_end = min(window_end, end_date)
+        windows.append((current, window_end))
+        current = window_end + timedelta(days=1)
+    return windows
+
+
+def commit_window(inputs: Dict, schedule: Dict) -> None:
+    """
+    Fold a solved window into shift-model inputs so later windows treat it as
+    fixed: its days become blocked and its shifts count toward the weekly
+    load (weekday/weekend counts, worked minutes, worked dates for the
+    consecutive-day rule).
+    """
+    blocked_dates = inputs.setdefault('blocked_dates', {})
+    existing_load = inputs.setdefault('existing_load', {})
+    for date_obj, day_assignments in schedule.items():
+        week_start = date_obj - timedelta(days=date_obj.weekday())
+        for emp_id, assignment in day_assignments.items():
+            blocked_dates.setdefault(emp_id, set()).add(date_obj)
+            load = existing_load.setdefault(emp_id, {}).setdefault(week_start, {})
+            day_kind = 'weekend' if date_obj.weekday() >= 5 else 'weekday'
+            load[day_kind] = load.get(day_kind, 0) + 1
+            load['work_minutes'] = load.get('work_minutes', 0) + int(round(assignment['work_hours'] * 60))
+            load.setdefault('worked_dates', set()).add(date_obj)
+
+
+def _select_employees(by_employee: Optional[Dict], emp_ids: set) -> Dict:
+    """Restrict an employee_id-keyed dict to emp_ids"""
+    return {emp_id: value for emp_id, value in (by_employee or {}).items() if emp_id in emp_ids}
+
+
+def decompose_shift_inputs(inputs: Dict) -> List[Dict]:
+    """
+    Split shift-model generator inputs into independent subproblems.
+
+    An employee and a shift are connected when the employee may work the shift
+    (same role, or no role at all). Connected components share no variable or
+    constraint, so each one can be built and solved as its own model.
+
+    Args:
+        inputs: ShiftScheduleGenerator kwargs for the shift model
+
+    Returns: list of ShiftScheduleGenerator kwargs, one per component
+    """
+    parent = {}
+
+    def find(node):
+        parent.setdefault(node, node)
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    def union(a, b):
+        parent[find(a)] = find(b)
+
+    shifts = inputs['shifts']
+    for shift in shifts:
+        find(('shift', shift['id']))
+    for emp in inputs['employees']:
+        for shift in shifts:
+            if emp.get('role_id') is None or emp['role_id'] == shift['role_id']:
+                union(('emp', emp['id']), ('shift', shift['id']))
+
+    # Employees without any eligible shift get no variables and are left out
+    members = defaultdict(lambda: {'employees': [], 'shifts': []})
+    for shift in shifts:
+        members[find(('shift', shift['id']))]['shifts'].append(shift)
+    for emp in inputs['employees']:
+        root = find(('emp', emp['id']))
+        if root in members:
+            members[root]['employees'].append(emp)
+
+    neighborhood = inputs.get('neighborhood')
+    components = []
+    for group in members.values():
+        emp_ids = {e['id'] for e in group['employees']}
+        components.append(dict(
+            inputs,
+            employees=group['employees'],
+            shifts=group['shifts'],
+            leave_dates=_select_employees(inputs.get('leave_dates'), emp_ids),
+            unavailable_dates=_select_employees(inputs.get('unavailable_dates'), emp_ids),
+            blocked_dates=_select_employees(inputs.get('blocked_dates'), emp_ids),
+            existing_load=_select_employees(inputs.get('existing_load'), emp_ids),
+            hints={k: v for k, v in (inputs.get('hints') or {}).items() if k[0] in emp_ids},
+            neighborhood=None if neighborhood is None else {k for k in neighborhood if k[0] in emp_ids},
+        ))
+    return components
+
+
+def merge_shift_results(results: List[Dict]) -> Dict:
+    """
+    Combine solve_shift_schedule results of independent components into one
+    result of the same shape. Fails if any component failed.
+    """
+    merged = {
+        'schedule': {},
+        'error': None,
+        'feedback': [],
+        'coverage': [],
+        'status': 'OPTIMAL',
+        'wall_time': 0.0,
+        'build_seconds': 0.0,
+        'objective': None,
+        'bound': None,
+        'gap': None,
+        'solutions': 0,
+        'stop_reason': None,
+        'telemetry': [],
+    }
+    for result in results:
+        merged['telemetry'].extend(result.get('telemetry', []))
+        merged['feedback'].extend(result['feedback'])
+        # Components share no variables, so objectives and bounds add up
+        if result.get('objective') is not None:
+            merged['objective'] = (merged['objective'] or 0) + result['objective']
+            merged['bound'] = (merged['bound'] or 0) + result['bound']
+        merged['solutions'] += result.get('solutions', 0)
+        merged['stop_reason'] = merged['stop_reason'] or result.get('stop_reason')
+        merged['coverage'].extend(result['coverage'])
+        # Components run concurrently, so the slowest one bounds the run
+        merged['wall_time'] = max(merged['wall_time'], result['wall_time'])
+        merged['build_seconds'] = max(merged['build_seconds'], result['build_seconds'])
+        if result['error']:
+            merged['error'] = merged['error'] or result['error']
+            merged['status'] = result['status']
+        elif result['status'] != 'OPTIMAL' and not merged['error']:
+            merged['status'] = result['status']
+        for date_obj, day_assignments in (result['schedule'] or {}).items():
+            merged['schedule'].setdefault(date_obj, {}).update(day_assignments)
+    if merged['error']:
+        merged['schedule'] = None
+    merged['coverage'].sort(key=lambda slot: (slot['date'], slot['shift_id']))
+    if merged['objective'] is not None:
+        merged['gap'] = relative_gap(merged['objective'], merged['bound'])
+    return merged
+
@@ -0,0 +1,125 @@
+"""
+Batch Schedule Validation
+
+Checks proposed (employee, date, shift) assignments against the weekly shift
+requirement (including the weekend rule) and the consecutive-day limit. The
+counters of every affected employee-week are read from the employee_week_stats
+read model by primary key (one lookup per employee-week) and all rules are
+evaluated in memory. Proposals accepted earlier in a batch count toward the
+later ones, so a batch is validated as if it were saved in order.
+"""
+
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.employee_week_stats import load_weeks, tally, max_consecutive as week_max_consecutive, span_hours
+from app.holidays_jp import jp_calendar
+from app.models import Schedule
+from app.scheduling_context import week_start_of, weekly_shift_verdict, WORK_STATUSES
+
+
+MAX_CONSECUTIVE_SHIFTS = 5
+
+
+async def validate_assignments(
+    db: AsyncSession,
+    proposals: Sequence[Dict],
+    max_consecutive: int = MAX_CONSECUTIVE_SHIFTS,
+    removed_schedule_ids: Iterable[int] = ()
+) -> List[Dict]:
+    """
+    Validate proposed assignments against the weekly and consecutive-day rules.
+
+    Args:
+        db: Database session
+        proposals: Dicts with employee_id, date, optional shift_id, optional
+            status (default 'scheduled'), optional start_time / end_time and
+            optional exclude_schedule_id (the row being moved, when validating
+            an update)
+        max_consecutive: Longest allowed run of consecutive days in a week
+        removed_schedule_ids: Rows deleted in the same batch; they no longer count
+
+    Returns: one verdict per proposal, in order:
+        {'employee_id', 'date', 'shift_id', 'valid', 'errors', 'daily_hours',
+        'weekly_hours'} (worked hours, including the proposal)
+    """
+    if not proposals:
+        return []
+
+    excluded = {p['exclude_schedule_id'] for p in proposals if p.get('exclude_schedule_id')}
+    excluded.update(removed_schedule_ids)
+    week_starts = {week_start_of(p['date']) for p in proposals}
+    weeks = await load_weeks(db, {(p['employee_id'], week_start_of(p['date'])) for p in proposals})
+
+    # Rows being moved or deleted no longer count toward their week
+    if excluded:
+        result = await db.execute(
+            select(Schedule.employee_id, Schedule.date, Schedule.status,
+                   Schedule.start_time, Schedule.end_time)
+            .filter(Schedule.id.in_(excluded))
+        )
+        for employee_id, sched_date, status, start_time, end_time in result.all():
+            week = weeks.get((employee_id, week_start_of(sched_date)))
+            if week is not None:
+                tally(week, sched_date, status, start_time, end_time, sign=-1)
+
+    required_by_week = {ws: jp_calendar.get_shifts_required_for_week(ws) for ws in week_starts}
+    info_by_week = {ws: jp_calendar.get_week_info(ws) for ws in week_starts}
+
+    verdicts = []
+    for proposal in proposals:
+        employee_id = proposal['employee_id']
+        target_date = proposal['date']
+        status = proposal.get('status') or 'scheduled'
+        week_start = week_start_of(target_date)
+        week = weeks[(employee_id, week_start)]
+        errors = []
+
+        is_valid, error_msg = weekly_shift_verdict(
+            target_date, week['weekday_coverage'], week['weekend_regular'],
+            required_by_week[week_start], info_by_week[week_start]
+        )
+        if not is_valid:
+            errors.append(error_msg)
+
+        consecutive = week_max_consecutive(week, week_start, extra_day=target_date)
+        if consecutive > max_consecutive:
+            errors.append(f"Cannot create {consecutive} consecutive shifts. "
+                          f"Maximum allowed is {max_consecutive} consecutive shifts.")
+
+        # Accepted proposals count toward the rest of the batch
+        pending = 0.0
+        if not errors:
+            tally(week, target_date, status, proposal.get('start_time'), proposal.get('end_time'))
+        elif status in WORK_STATUSES:
+            pending = span_hours(proposal.get('start_time'), proposal.get('end_time'))
+        verdicts.append({
+            'employee_id': employee_id,
+            'date': target_date.isoformat(),
+            'shift_id': proposal.get('shift_id'),
+            'valid': not errors,
+            'errors': errors,
+            'daily_hours': week['day_hours'][target_date.weekday()] + pending,
+            'weekly_hours': week['work_hours'] + pending,
+        })
+    return verdicts
+
+
+async def validate_assignment(
+    db: AsyncSession,
+    employee_id: int,
+    target_date: date,
+    exclude_schedule_id: Optional[int] = None,
+    shift_id: Optional[int] = None
+) -> Dict:
+    """Validate a single assignment (a batch of one)"""
+    verdicts = await validate_assignments(db, [{
+        'employee_id': employee_id,
+        'date': target_date,
+        'shift_id': shift_id,
+        'exclude_schedule_id': exclude_schedule_id,
+    }])
+    return verdicts[0]
@@ -0,0 +1,109 @@
+"""
+Bulk Schedule Writer
+
+Persists the output of schedule generation in one transaction: the work
+shifts a regeneration (or repair) replaces are deleted, changed rows from an
+applied preview are updated in bulk by primary key, and the new rows are
+written with multi-row INSERT ... VALUES statements instead of one ORM
+unit-of-work object per schedule. The employee-weeks it touched are
+recomputed in employee_week_stats before the commit, and the daily rosters
+they touch are invalidated once it lands.
+"""
+
+import time
+from datetime import timedelta
+from typing import Dict, Iterable, List, Sequence
+
+from sqlalchemy import delete, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Schedule, CompOffRequest, Attendance
+from app.employee_week_stats import schedule_week_keys, refresh_weeks
+from app.scheduling_context import week_start_of
+from app import roster_cache
+
+
+# Rows per INSERT statement (keeps bind parameters well below driver limits)
+INSERT_BATCH_SIZE = 1000
+
+# Schedule columns set by the generators
+SCHEDULE_COLUMNS = (
+    'department_id', 'employee_id', 'role_id', 'shift_id', 'date',
+    'start_time', 'end_time', 'status', 'notes'
+)
+
+
+def _chunks(items: Sequence, size: int) -> Iterable[Sequence]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+async def write_generated_schedules(
+    db: AsyncSession,
+    new_schedules: List[Schedule],
+    delete_ids: Sequence[int] = (),
+    updates: Sequence[Dict] = ()
+) -> Dict:
+    """
+    Delete replaced work shifts and insert generated schedules, then commit once.
+
+    Comp-off requests and attendance rows pointing at a deleted schedule are
+    kept with their schedule reference nulled.
+
+    Args:
+        db: Database session
+        new_schedules: Transient Schedule objects built by the generation engine
+        delete_ids: Ids of 'scheduled' rows being replaced
+        updates: Column values for rows changed in place, each keyed by 'id'
+
+    Returns: {'inserted', 'updated', 'deleted', 'seconds'}
+    """
+    started = time.perf_counter()
+    delete_ids = list(delete_ids)
+    updates = list(updates)
+
+    # Statement writes bypass the flush events that maintain employee_week_stats
+    touched_weeks = await schedule_week_keys(db, delete_ids + [u['id'] for u in updates])
+    touched_weeks.update((sched.employee_id, week_start_of(sched.date)) for sched in new_schedules)
+    # ... and the flush events that invalidate cached daily rosters
+    for employee_id, week_start in touched_weeks:
+        roster_cache.touch_employee(db, employee_id, week_start, week_start + timedelta(days=6))
+    for sched in new_schedules:
+        roster_cache.touch(db, sched.department_id, sched.date)
+    for values in updates:
+        if values.get('department_id') and values.get('date'):
+            roster_cache.touch(db, values['department_id'], values['date'])
+
+    for ids in _chunks(delete_ids, INSERT_BATCH_SIZE):
+        # IMPORTANT: Do NOT touch check-in records - they are historical data
+        await db.execute(
+            update(CompOffRequest)
+            .where(CompOffRequest.schedule_id.in_(ids))
+            .values(schedule_id=None)
+        )
+        await db.execute(
+            update(Attendance)
+            .where(Attendance.schedule_id.in_(ids))
+            .values(schedule_id=None)
+        )
+        await db.execute(
+            delete(Schedule)
+            .where(Schedule.id.in_(ids))
+            .execution_options(synchronize_session=False)
+        )
+
+    for batch in _chunks(updates, INSERT_BATCH_SIZE):
+        await db.execute(update(Schedule), list(batch))
+
+    rows = [{column: getattr(sched, column) for column in SCHEDULE_COLUMNS} for sched in new_schedules]
+    for batch in _chunks(rows, INSERT_BATCH_SIZE):
+        await db.execute(insert(Schedule).values(list(batch)))
+
+    await refresh_weeks(db, touched_weeks)
+    await db.commit()
+    return {
+        'inserted': len(rows),
+        'updated': len(updates),
+        'deleted': len(delete_ids),
+        'seconds': time.perf_counter() - started,
+    }
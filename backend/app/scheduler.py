@@ -10,6 +10,9 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional
 import math
 
+from app.schedule_generator import StepTimer, model_telemetry
+from app.solver_resources import solver_resources
+
 
 class ShiftSchedulerV5:
     """
@@ -22,18 +25,26 @@ class ShiftSchedulerV5:
     
     def __init__(self, employees: List[Dict], roles: List[Dict], 
                  role_shifts: Dict, leave_requests: Dict, 
-                 unavailability: Dict, week_dates: List[str]):
+                 unavailability: Dict, week_dates: List[str],
+                 allocation: Optional[Dict] = None):
         self.employees = employees
         self.roles = roles
         self.role_shifts = role_shifts  # role_id -> [shifts]
         self.leave_requests = leave_requests  # "emp_id-date" -> True
         self.unavailability = unavailability  # "emp_id-date" -> True
         self.week_dates = week_dates
+        self.allocation = allocation or solver_resources.default_allocation()  # num_workers, time_limit
         self.model = cp_model.CpModel()
         self.solver = cp_model.CpSolver()
+        self.timer = StepTimer(self.model)
+        self.status = None
         self.feedback = []
         self.days_of_week = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
     
+    def telemetry(self) -> Dict:
+        """Model size, per-step wall time and solver statistics of the last generate_schedule()"""
+        return model_telemetry(self.model, self.solver, self.status, self.timer, 'v5')
+
     def add_feedback(self, message: str, severity: str = 'info'):
         """Add feedback message"""
         self.feedback.append({'message': message, 'severity': severity})
@@ -105,6 +116,8 @@ class ShiftSchedulerV5:
                     'info'
                 )
         
+        self.timer.mark('availability')
+
         # Step 2: Calculate total shifts per role
         role_capacities = {}
         for role in self.roles:
@@ -130,6 +143,8 @@ class ShiftSchedulerV5:
                 'info'
             )
         
+        self.timer.mark('capacity')
+
         # Step 3: Create assignment variables and apply constraints
         assignments = {}
         for emp in self.employees:
@@ -153,6 +168,8 @@ class ShiftSchedulerV5:
                         var = self.model.NewBoolVar(f'e{emp_id}_d{date}_s{shift["id"]}')
                         assignments[emp_id][date][shift['id']] = var
         
+        self.timer.mark('variables')
+
         # Constraint 1: Each employee works exact shifts (minus leaves)
         for emp in self.employees:
             emp_id = emp['id']
@@ -175,6 +192,8 @@ class ShiftSchedulerV5:
             elif week_shifts:
                 self.model.Add(sum(week_shifts) == 0)
         
+        self.timer.mark('weekly_shift_constraints')
+
         # Constraint 2: One shift per day maximum
         for emp in self.employees:
             emp_id = emp['id']
@@ -183,6 +202,8 @@ class ShiftSchedulerV5:
                 if len(day_shifts) > 1:
                     self.model.Add(sum(day_shifts) <= 1)
         
+        self.timer.mark('one_shift_per_day')
+
         # Objective: Maximize coverage
         objective_terms = []
         for emp_id in assignments:
@@ -193,19 +214,25 @@ class ShiftSchedulerV5:
         if objective_terms:
             self.model.Maximize(sum(objective_terms))
         
+        self.timer.mark('objective')
+
         # Solve
         self.add_feedback("Solving schedule with OR-Tools CP-SAT...", 'info')
-        self.solver.parameters.max_time_in_seconds = 90.0
-        self.solver.parameters.num_search_workers = 8
+        self.solver.parameters.max_time_in_seconds = self.allocation['time_limit']
+        self.solver.parameters.num_search_workers = self.allocation['num_workers']
         
         status = self.solver.Solve(self.model)
+        self.status = status
+        self.timer.mark('solve')
         
         if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
             self.add_feedback(
                 f"✅ {'OPTIMAL' if status == cp_model.OPTIMAL else 'FEASIBLE'} solution found!",
                 'success'
             )
-            return self._extract_solution(assignments), None
+            schedule = self._extract_solution(assignments)
+            self.timer.mark('extraction')
+            return schedule, None
         else:
             return None, "Cannot generate schedule. Please review constraints."
     
@@ -0,0 +1,401 @@
+"""
+Scheduling Context - Prefetched state for schedule generation
+
+Loads everything the generation engines need for a department and date range
+(approved leaves, approved comp-offs, unavailability, existing schedules with
+their roles and Japanese holidays) in a handful of set-based queries, then
+answers the engines' questions from in-memory indexes keyed by
+(employee, date) and (employee, ISO week) instead of issuing a query per
+employee/shift/day slot.
+"""
+
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.models import Schedule, LeaveRequest, CompOffRequest, LeaveStatus, Unavailability
+from app.holidays_jp import jp_calendar
+
+
+# Statuses that count as worked time (hours, consecutive-day limit)
+WORK_STATUSES = ('scheduled', 'completed', 'comp_off_earned')
+
+# Statuses that mark a leave day (fulfil the weekly requirement, no hours)
+LEAVE_STATUSES = ('leave', 'leave_half_morning', 'leave_half_afternoon', 'comp_off_taken')
+
+# Statuses counted toward the Mon-Fri weekly requirement
+WEEKDAY_COVERAGE_STATUSES = (
+    'scheduled', 'leave', 'comp_off_taken', 'comp_off_earned',
+    'leave_half_morning', 'leave_half_afternoon'
+)
+
+# Statuses counted as regular Sat-Sun shifts
+WEEKEND_REGULAR_STATUSES = ('scheduled', 'leave', 'leave_half_morning', 'leave_half_afternoon')
+
+
+def week_start_of(target_date: date) -> date:
+    """Return the Monday of the ISO week containing target_date"""
+    return target_date - timedelta(days=target_date.weekday())
+
+
+def count_week_coverage(entries: Iterable[Tuple[date, str]]) -> Tuple[int, int]:
+    """(Mon-Fri coverage, Sat-Sun regular shifts) for an employee-week's (date, status) pairs"""
+    weekday_coverage = 0
+    weekend_regular_shifts = 0
+    for day, status in entries:
+        if day.weekday() < 5:
+            if status in WEEKDAY_COVERAGE_STATUSES:
+                weekday_coverage += 1
+        elif status in WEEKEND_REGULAR_STATUSES:
+            weekend_regular_shifts += 1
+    return weekday_coverage, weekend_regular_shifts
+
+
+def weekly_shift_verdict(target_date: date, weekday_coverage: int, weekend_regular_shifts: int,
+                         required_shifts: int, week_info: Dict) -> Tuple[bool, str]:
+    """
+    Weekly shift requirement for one more shift on target_date:
+    - Mon-Fri coverage (shifts, leaves, comp-offs) may not exceed the week's
+      requirement (5 minus weekday public holidays)
+    - A Sat-Sun shift is only allowed while the weekday requirement is unmet
+      and the week's total stays below it
+
+    Returns: (is_valid, error_message)
+    """
+    week_start = week_start_of(target_date)
+    week_end = week_start + timedelta(days=6)
+    holiday_str = ""
+    if week_info['weekday_holiday_count'] > 0:
+        holiday_names = [day['holiday_name'] for day in week_info['days'] if day['holiday_name']]
+        holiday_str = f" (Contains {week_info['weekday_holiday_count']} weekday holiday(s): {', '.join(holiday_names)})"
+
+    if target_date.weekday() >= 5:
+        if weekday_coverage >= required_shifts:
+            return False, f"Cannot assign weekend shift on {target_date} - weekday requirement already met. Employee has {weekday_coverage} weekday shifts/comp-offs (required: {required_shifts}){holiday_str}"
+        total_shifts = weekday_coverage + weekend_regular_shifts
+        if total_shifts >= required_shifts:
+            return False, f"Cannot assign more than {required_shifts} shifts per week. Employee has {weekday_coverage} weekday + {weekend_regular_shifts} weekend shifts (total: {total_shifts}){holiday_str}"
+    else:
+        if weekday_coverage >= required_shifts:
+            return False, f"Cannot assign more than {required_shifts} weekday shifts per week. Employee already has {weekday_coverage} weekday shifts/comp-offs (required: {required_shifts}){holiday_str} (Mon-Sun: {week_start} to {week_end})"
+
+    return True, ""
+
+
+def longest_consecutive_run(dates: Iterable[date]) -> int:
+    """Length of the longest run of consecutive calendar days"""
+    ordered = sorted(set(dates))
+    if not ordered:
+        return 0
+    max_consecutive = 1
+    current_consecutive = 1
+    for i in range(1, len(ordered)):
+        if (ordered[i] - ordered[i - 1]).days == 1:
+            current_consecutive += 1
+            max_consecutive = max(max_consecutive, current_consecutive)
+        else:
+            current_consecutive = 1
+    return max_consecutive
+
+
+def shift_hours(start_time: Optional[str], end_time: Optional[str],
+                break_minutes: Optional[int]) -> Tuple[float, float]:
+    """
+    Calculate (total_hours, work_hours) for an HH:MM time range.
+    Work hours subtract the role's break time. Returns (0, 0) for missing or
+    malformed times.
+    """
+    if not start_time or not end_time:
+        return 0.0, 0.0
+    try:
+        start = datetime.strptime(start_time, '%H:%M')
+        end = datetime.strptime(end_time, '%H:%M')
+    except (ValueError, TypeError):
+        return 0.0, 0.0
+    total_hours = (end - start).total_seconds() / 3600
+    return total_hours, total_hours - (break_minutes or 0) / 60
+
+
+class SchedulingContext:
+    """In-memory view of a department's scheduling state for a date range"""
+
+    def __init__(self, department_id: int, start_date: date, end_date: date):
+        self.department_id = department_id
+        self.start_date = start_date
+        self.end_date = end_date
+        # Schedules are loaded for whole ISO weeks so weekly rules see the full week
+        self.window_start = week_start_of(start_date)
+        self.window_end = week_start_of(end_date) + timedelta(days=6)
+
+        self.leaves: Dict[Tuple[int, date], LeaveRequest] = {}
+        self.comp_offs: Dict[Tuple[int, date], CompOffRequest] = {}
+        self.unavailable: set = set()  # {(employee_id, date)}
+        self.schedules_by_day: Dict[Tuple[int, date], List[Schedule]] = defaultdict(list)
+        self.schedules_by_week: Dict[Tuple[int, date], List[Schedule]] = defaultdict(list)
+        self.holidays: Dict[date, str] = {}
+        self.break_minutes: Dict[int, int] = {}
+        # (employee_id, weekday) -> most recent worked Schedule on that weekday
+        self.latest_by_weekday: Dict[Tuple[int, int], Schedule] = {}
+        self._required_shifts: Dict[date, int] = {}
+        self._week_info: Dict[date, Dict] = {}
+        self.query_count = 0
+
+    @classmethod
+    async def load(
+        cls,
+        db: AsyncSession,
+        department_id: int,
+        employee_ids: Iterable[int],
+        start_date: date,
+        end_date: date,
+        roles: Iterable = ()
+    ) -> 'SchedulingContext':
+        """
+        Prefetch all scheduling state for the given employees and date range.
+
+        Args:
+            db: Database session
+            department_id: Department being scheduled
+            employee_ids: Employees to load state for
+            start_date: First day of the generation range
+            end_date: Last day of the generation range
+            roles: Department Role rows (seeds the break-minutes index)
+        """
+        ctx = cls(department_id, start_date, end_date)
+        employee_ids = list(employee_ids)
+        for role in roles:
+            ctx.break_minutes[role.id] = role.break_minutes or 0
+
+        ctx.holidays = jp_calendar.get_holidays_in_range(start_date, end_date)
+
+        if not employee_ids:
+            return ctx
+
+        # Approved leaves overlapping the range
+        leave_result = await db.execute(
+            select(LeaveRequest)
+            .filter(
+                LeaveRequest.employee_id.in_(employee_ids),
+                LeaveRequest.start_date <= end_date,
+                LeaveRequest.end_date >= start_date,
+                LeaveRequest.status == LeaveStatus.APPROVED
+            )
+            .order_by(LeaveRequest.id)
+        )
+        ctx.query_count += 1
+        for leave in leave_result.scalars().all():
+            day = max(leave.start_date, start_date)
+            last = min(leave.end_date, end_date)
+            while day <= last:
+                ctx.leaves.setdefault((leave.employee_id, day), leave)
+                day += timedelta(days=1)
+
+        # Approved comp-offs inside the range
+        comp_off_result = await db.execute(
+            select(CompOffRequest)
+            .filter(
+                CompOffRequest.employee_id.in_(employee_ids),
+                CompOffRequest.comp_off_date >= start_date,
+                CompOffRequest.comp_off_date <= end_date,
+                CompOffRequest.status == LeaveStatus.APPROVED
+            )
+            .order_by(CompOffRequest.id)
+        )
+        ctx.query_count += 1
+        for comp_off in comp_off_result.scalars().all():
+            ctx.comp_offs.setdefault((comp_off.employee_id, comp_off.comp_off_date), comp_off)
+
+        # Unavailability inside the range
+        unavailability_result = await db.execute(
+            select(Unavailability.employee_id, Unavailability.date)
+            .filter(
+                Unavailability.employee_id.in_(employee_ids),
+                Unavailability.date >= start_date,
+                Unavailability.date <= end_date
+            )
+        )
+        ctx.query_count += 1
+        ctx.unavailable = {(emp_id, day) for emp_id, day in unavailability_result.all()}
+
+        # Existing schedules (with roles) for every ISO week touched by the range
+        schedules_result = await db.execute(
+            select(Schedule)
+            .filter(
+                Schedule.employee_id.in_(employee_ids),
+                Schedule.date >= ctx.window_start,
+                Schedule.date <= ctx.window_end
+            )
+            .options(selectinload(Schedule.role))
+            .order_by(Schedule.date, Schedule.id)
+        )
+        ctx.query_count += 2
+        for sched in schedules_result.scalars().all():
+            if sched.role is not None:
+                ctx.break_minutes.setdefault(sched.role_id, sched.role.break_minutes or 0)
+            ctx._index(sched)
+
+        # Shift times for comp-off earned days fall back to the employee's most
+        # recent shift on the same weekday, which may lie outside the window
+        comp_off_employee_ids = sorted({emp_id for emp_id, _ in ctx.comp_offs})
+        if comp_off_employee_ids:
+            history_result = await db.execute(
+                select(Schedule)
+                .filter(
+                    Schedule.employee_id.in_(comp_off_employee_ids),
+                    Schedule.status.in_(WORK_STATUSES)
+                )
+                .order_by(Schedule.date.desc())
+            )
+            ctx.query_count += 1
+            for sched in history_result.scalars().all():
+                key = (sched.employee_id, sched.date.weekday())
+                current = ctx.latest_by_weekday.get(key)
+                if current is None or sched.date > current.date:
+                    ctx.latest_by_weekday[key] = sched
+
+        return ctx
+
+    # ----- index maintenance -----
+
+    def _index(self, sched: Schedule):
+        self.schedules_by_day[(sched.employee_id, sched.date)].append(sched)
+        self.schedules_by_week[(sched.employee_id, week_start_of(sched.date))].append(sched)
+        if sched.status in WORK_STATUSES:
+            key = (sched.employee_id, sched.date.weekday())
+            current = self.latest_by_weekday.get(key)
+            if current is None or sched.date >= current.date:
+                self.latest_by_weekday[key] = sched
+
+    def add_schedule(self, sched: Schedule):
+        """Register a schedule created during generation so later checks see it"""
+        self._index(sched)
+
+    def remove_schedule(self, sched: Schedule):
+        """Drop a schedule from the indexes (incremental repair re-solves it)"""
+        day_scheds = self.schedules_by_day.get((sched.employee_id, sched.date), [])
+        if sched in day_scheds:
+            day_scheds.remove(sched)
+        week_scheds = self.schedules_by_week.get((sched.employee_id, week_start_of(sched.date)), [])
+        if sched in week_scheds:
+            week_scheds.remove(sched)
+
+    # ----- lookups -----
+
+    def is_holiday(self, target_date: date) -> bool:
+        return target_date in self.holidays
+
+    def holiday_name(self, target_date: date) -> Optional[str]:
+        return self.holidays.get(target_date)
+
+    def leave_for(self, employee_id: int, target_date: date) -> Optional[LeaveRequest]:
+        return self.leaves.get((employee_id, target_date))
+
+    def comp_off_for(self, employee_id: int, target_date: date) -> Optional[CompOffRequest]:
+        return self.comp_offs.get((employee_id, target_date))
+
+    def unavailable_dates(self) -> Dict[int, set]:
+        """employee_id -> set of unavailable dates"""
+        result = defaultdict(set)
+        for emp_id, day in self.unavailable:
+            result[emp_id].add(day)
+        return dict(result)
+
+    def has_schedule_on(self, employee_id: int, target_date: date) -> bool:
+        return bool(self.schedules_by_day.get((employee_id, target_date)))
+
+    def week_schedules(self, employee_id: int, target_date: date,
+                       statuses: Optional[Iterable[str]] = None) -> List[Schedule]:
+        """Schedules in target_date's ISO week, optionally filtered by status"""
+        scheds = self.schedules_by_week.get((employee_id, week_start_of(target_date)), [])
+        if statuses is None:
+            return list(scheds)
+        return [s for s in scheds if s.status in statuses]
+
+    def required_shifts_for_week(self, week_start: date) -> int:
+        if week_start not in self._required_shifts:
+            self._required_shifts[week_start] = jp_calendar.get_shifts_required_for_week(week_start)
+        return self._required_shifts[week_start]
+
+    def week_info(self, week_start: date) -> Dict:
+        if week_start not in self._week_info:
+            self._week_info[week_start] = jp_calendar.get_week_info(week_start)
+        return self._week_info[week_start]
+
+    def week_load(self, employee_id: int, week_start: date) -> Dict:
+        """
+        Existing load for an employee-week: weekday coverage, weekend regular
+        shifts, worked minutes (minus breaks) and the set of worked dates.
+        """
+        load = {'weekday': 0, 'weekend': 0, 'work_minutes': 0, 'worked_dates': set()}
+        for sched in self.schedules_by_week.get((employee_id, week_start), []):
+            if sched.date.weekday() < 5:
+                if sched.status in WEEKDAY_COVERAGE_STATUSES:
+                    load['weekday'] += 1
+            elif sched.status in WEEKEND_REGULAR_STATUSES:
+                load['weekend'] += 1
+            if sched.status in WORK_STATUSES:
+                _, work_hours = shift_hours(
+                    sched.start_time, sched.end_time, self.break_minutes.get(sched.role_id, 0)
+                )
+                load['work_minutes'] += int(round(work_hours * 60))
+                load['worked_dates'].add(sched.date)
+        return load
+
+    # ----- rule evaluation -----
+
+    def max_consecutive_with(self, employee_id: int, target_date: date) -> int:
+        """Longest run of consecutive worked days in the week if target_date is added"""
+        week_dates = {s.date for s in self.week_schedules(employee_id, target_date, WORK_STATUSES)}
+        week_dates.add(target_date)
+        return longest_consecutive_run(week_dates)
+
+    def week_hours(self, employee_id: int, target_date: date) -> Tuple[float, float]:
+        """Worked hours (minus breaks) in the week and on target_date"""
+        existing_hours = 0.0
+        existing_hours_today = 0.0
+        for sched in self.week_schedules(employee_id, target_date, WORK_STATUSES):
+            _, work_hours = shift_hours(
+                sched.start_time, sched.end_time, self.break_minutes.get(sched.role_id, 0)
+            )
+            existing_hours += work_hours
+            if sched.date == target_date:
+                existing_hours_today += work_hours
+        return existing_hours, existing_hours_today
+
+    def check_weekly_shift_limit(self, employee_id: int, target_date: date) -> Tuple[bool, str]:
+        """
+        In-memory weekly shift requirement check (see weekly_shift_verdict).
+        Returns: (is_valid, error_message)
+        """
+        week_start = week_start_of(target_date)
+        weekday_coverage, weekend_regular_shifts = count_week_coverage(
+            (s.date, s.status) for s in self.schedules_by_week.get((employee_id, week_start), [])
+        )
+        return weekly_shift_verdict(
+            target_date, weekday_coverage, weekend_regular_shifts,
+            self.required_shifts_for_week(week_start), self.week_info(week_start)
+        )
+
+    def comp_off_shift_times(self, employee_id: int, target_date: date) -> Tuple[str, str]:
+        """
+        Shift times for a comp-off earned day: the first worked shift in the same
+        week, else the most recent shift on the same weekday, else the full day.
+        """
+        week_shifts = [
+            s for s in self.week_schedules(employee_id, target_date, WORK_STATUSES)
+            if s.date != target_date
+        ]
+        if week_shifts:
+            week_sched = min(week_shifts, key=lambda s: s.date)
+            if week_sched.start_time and week_sched.end_time:
+                return week_sched.start_time, week_sched.end_time
+
+        same_day_sched = self.latest_by_weekday.get((employee_id, target_date.weekday()))
+        if same_day_sched and same_day_sched.start_time and same_day_sched.end_time:
+            return same_day_sched.start_time, same_day_sched.end_time
+
+        return "00:00", "23:59"
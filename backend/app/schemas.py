@@ -383,6 +383,36 @@ class ScheduleCreate(BaseModel):
     notes: Optional[str] = None
 
 
+class ScheduleAssignmentProposal(BaseModel):
+    employee_id: int
+    date: date
+    shift_id: Optional[int] = None
+    status: str = 'scheduled'
+    start_time: Optional[str] = None
+    end_time: Optional[str] = None
+    exclude_schedule_id: Optional[int] = None  # Row being moved, when validating an update
+
+
+class ScheduleValidationRequest(BaseModel):
+    assignments: List[ScheduleAssignmentProposal]
+
+
+class ScheduleBulkOperation(BaseModel):
+    op: str  # create, move, delete
+    schedule_id: Optional[int] = None  # move / delete
+    employee_id: Optional[int] = None
+    role_id: Optional[int] = None
+    shift_id: Optional[int] = None
+    date: Optional[date] = None
+    start_time: Optional[str] = None
+    end_time: Optional[str] = None
+    notes: Optional[str] = None
+
+
+class ScheduleBulkRequest(BaseModel):
+    operations: List[ScheduleBulkOperation]
+
+
 class ScheduleUpdate(BaseModel):
     employee_id: Optional[int] = None
     role_id: Optional[int] = None
@@ -509,6 +539,69 @@ class ScheduleGenerationResponse(BaseModel):
     error: Optional[str] = None
 
 
+class ScheduleGenerationJobResponse(BaseModel):
+    job_id: str
+    status: str  # queued, running, completed, failed
+    progress: int
+    start_date: date
+    end_date: date
+    engine: str
+    repair: bool = False
+    dry_run: bool = False
+    feedback: List[str] = []
+    overtime_warnings: List[Dict] = []
+    schedules_created: int = 0
+    result: Optional[Dict] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+class ScheduleDiffAdded(BaseModel):
+    employee_id: int
+    date: date
+    role_id: int
+    shift_id: Optional[int] = None
+    start_time: Optional[str] = None
+    end_time: Optional[str] = None
+    status: str = 'scheduled'
+    notes: Optional[str] = None
+
+
+class ScheduleDiffRemoved(BaseModel):
+    schedule_id: int
+    employee_id: Optional[int] = None
+    date: Optional[date] = None
+    shift_id: Optional[int] = None
+
+
+class ScheduleDiffChanged(BaseModel):
+    schedule_id: int
+    employee_id: Optional[int] = None
+    date: Optional[date] = None
+    from_shift_id: Optional[int] = None
+    to_shift_id: Optional[int] = None
+    role_id: int
+    start_time: Optional[str] = None
+    end_time: Optional[str] = None
+
+
+class ScheduleDiff(BaseModel):
+    added: List[ScheduleDiffAdded] = []
+    removed: List[ScheduleDiffRemoved] = []
+    changed: List[ScheduleDiffChanged] = []
+
+
+class ScheduleDiffApply(BaseModel):
+    """A dry-run preview (POST /schedules/generate?dry_run=true) to commit as-is"""
+    start_date: date
+    end_date: date
+    base_fingerprint: str
+    preview_signature: str
+    diff: ScheduleDiff
+
+
 # Shift Request (for employee shift swap requests)
 class ShiftRequestCreate(BaseModel):
     from_employee_id: int
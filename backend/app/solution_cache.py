@@ -0,0 +1,165 @@
+"""
+Schedule Solution Cache
+
+Stores solved CP-SAT assignments in the schedule_solution_cache table, keyed
+by a SHA-256 fingerprint of the solver inputs: employees, roles and shifts
+(with schedule_config), leave, unavailability, blocked days, existing load,
+hints and the date range. Only results proven OPTIMAL are stored. Re-running
+generation with unchanged inputs returns the stored assignment without
+building or solving a model; any change to the
+inputs produces a different key, so stale entries are simply never hit and
+age out. Entries expire after SOLUTION_CACHE_TTL_HOURS and the table is kept
+to SOLUTION_CACHE_MAX_ENTRIES by least-recent use.
+"""
+
+import hashlib
+import json
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy import delete, select
+
+from app.config import settings
+from app.database import async_session_maker
+from app.models import ScheduleSolutionCache
+from app.schedule_generator import relative_gap
+
+
+# Bump when the model or the result format changes so old entries are never reused
+CACHE_VERSION = 1
+
+
+def _canonical(value: Any) -> Any:
+    """Convert solver inputs to a JSON-serializable form with a stable order"""
+    if isinstance(value, dict):
+        items = [[_canonical(k), _canonical(v)] for k, v in value.items()]
+        return sorted(items, key=lambda item: json.dumps(item[0], sort_keys=True))
+    if isinstance(value, (set, frozenset)):
+        return sorted((_canonical(v) for v in value), key=lambda v: json.dumps(v, sort_keys=True))
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def fingerprint(payload: Dict) -> str:
+    """Stable hash of a solve_shift_schedule payload"""
+    canonical = json.dumps([CACHE_VERSION, _canonical(payload)], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def _serialize(result: Dict) -> Dict:
+    return {
+        'schedule': [
+            [date_obj.isoformat(), emp_id, assignment]
+            for date_obj, day_assignments in (result['schedule'] or {}).items()
+            for emp_id, assignment in day_assignments.items()
+        ],
+        'coverage': [dict(slot, date=slot['date'].isoformat()) for slot in result['coverage']],
+        'feedback': result['feedback'],
+        'status': result['status'],
+        'objective': result.get('objective'),
+        'bound': result.get('bound'),
+    }
+
+
+def _deserialize(stored: Dict) -> Dict:
+    schedule = {}
+    for day, emp_id, assignment in stored['schedule']:
+        schedule.setdefault(date.fromisoformat(day), {})[emp_id] = assignment
+    return {
+        'schedule': schedule,
+        'error': None,
+        'feedback': stored['feedback'],
+        'coverage': [dict(slot, date=date.fromisoformat(slot['date'])) for slot in stored['coverage']],
+        'status': stored['status'],
+        'wall_time': 0.0,
+        'build_seconds': 0.0,
+        'objective': stored.get('objective'),
+        'bound': stored.get('bound'),
+        'gap': relative_gap(stored['objective'], stored['bound']) if stored.get('objective') is not None else None,
+        'solutions': 0,
+        'stop_reason': None,
+        'cached': True,
+    }
+
+
+class SolutionCache:
+    """DB-backed cache of solve results with age and LRU eviction"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.SOLUTION_CACHE_MAX_ENTRIES > 0
+
+    async def get(self, key: str) -> Optional[Dict]:
+        """Cached result for key, or None when missing or expired"""
+        if not self.enabled:
+            return None
+        try:
+            async with async_session_maker() as db:
+                entry = await db.get(ScheduleSolutionCache, key)
+                if entry is None:
+                    self.misses += 1
+                    return None
+                if entry.created_at < datetime.utcnow() - timedelta(hours=settings.SOLUTION_CACHE_TTL_HOURS):
+                    await db.delete(entry)
+                    await db.commit()
+                    self.misses += 1
+                    return None
+                entry.hit_count = (entry.hit_count or 0) + 1
+                entry.last_used_at = datetime.utcnow()
+                result = _deserialize(entry.result)
+                await db.commit()
+                self.hits += 1
+                return result
+        except Exception as e:
+            print(f"[DEBUG] Solution cache lookup failed: {e}", flush=True)
+            return None
+
+    async def put(self, key: str, department_id: int, start_date: date, end_date: date, result: Dict):
+        """Store a proven-optimal result and evict expired / least recently used entries"""
+        # A FEASIBLE result depends on the time budget (shrunk under contention) and
+        # early stops, neither of which is in the key; replaying it would pin a weaker schedule
+        if not self.enabled or result.get('error') or result.get('status') != 'OPTIMAL':
+            return
+        try:
+            async with async_session_maker() as db:
+                now = datetime.utcnow()
+                await db.merge(ScheduleSolutionCache(
+                    key=key,
+                    department_id=department_id,
+                    start_date=start_date,
+                    end_date=end_date,
+                    result=_serialize(result),
+                    hit_count=0,
+                    created_at=now,
+                    last_used_at=now
+                ))
+                await db.execute(
+                    delete(ScheduleSolutionCache)
+                    .where(ScheduleSolutionCache.created_at < now - timedelta(hours=settings.SOLUTION_CACHE_TTL_HOURS))
+                )
+                keep = (
+                    select(ScheduleSolutionCache.key)
+                    .order_by(ScheduleSolutionCache.last_used_at.desc())
+                    .limit(settings.SOLUTION_CACHE_MAX_ENTRIES)
+                )
+                await db.execute(
+                    delete(ScheduleSolutionCache)
+                    .where(~ScheduleSolutionCache.key.in_(keep))
+                )
+                await db.commit()
+        except Exception as e:
+            print(f"[DEBUG] Solution cache store failed: {e}", flush=True)
+
+    def stats(self) -> Dict:
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+# Global instance
+solution_cache = SolutionCache()
@@ -0,0 +1,164 @@
+"""
+Solver Execution Service
+
+Runs CP-SAT solves in a bounded process pool so a long solve never blocks the
+FastAPI event loop (and with it every check-in and dashboard request served by
+the same uvicorn worker). Callers ship plain, picklable model inputs to a
+module-level solve function and await the result. Intermediate solutions are
+streamed back through a manager queue when the caller asks for them. When the
+awaiting coroutine is cancelled the solve is told to stop through a manager
+event, and its slot stays taken until the worker process has actually exited
+the solve.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.config import settings
+
+
+# Seconds between polls of a solve's progress queue
+PROGRESS_POLL_SECONDS = 0.5
+
+
+def _drain(queue) -> list:
+    items = []
+    while not queue.empty():
+        items.append(queue.get_nowait())
+    return items
+
+
+class SolverPool:
+    """Bounded process pool for CP-SAT solves with queue/in-flight accounting"""
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers or settings.SOLVER_POOL_WORKERS or max(1, (os.cpu_count() or 2) // 2)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._manager = None
+        self.queued = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.total_solve_seconds = 0.0
+
+    def _ensure_started(self):
+        if self._executor is None:
+            # spawn: never fork a process that holds the event loop and DB connections
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+
+    def _shared(self):
+        if self._manager is None:
+            self._manager = multiprocessing.get_context('spawn').Manager()
+        return self._manager
+
+    def _release(self, started: float):
+        self.total_solve_seconds += time.perf_counter() - started
+        self.in_flight -= 1
+        self._slots.release()
+
+    async def _forward(self, queue, future, on_progress: Callable[[Dict], Awaitable[None]]):
+        """Pass items a running solve puts on its queue to on_progress until it finishes"""
+        loop = asyncio.get_running_loop()
+        while True:
+            finished = future.done()
+            for item in await loop.run_in_executor(None, _drain, queue):
+                await on_progress(item)
+            if finished:
+                return
+            await asyncio.sleep(PROGRESS_POLL_SECONDS)
+
+    async def run(self, fn: Callable[[Dict], Any], payload: Dict,
+                  on_progress: Optional[Callable[[Dict], Awaitable[None]]] = None) -> Any:
+        """
+        Run fn(payload) in the pool and await its result.
+
+        fn must be a module-level function and payload must be picklable.
+        Requests beyond max_workers wait in a queue rather than oversubscribing
+        the host. With on_progress, payload['progress_queue'] is a queue the
+        solve can put intermediate results on; each item is passed to
+        on_progress while the solve runs. payload['cancel_event'] is set when
+        the awaiting coroutine is cancelled; fn should stop its search then.
+        """
+        self._ensure_started()
+        self.queued += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.queued -= 1
+
+        self.in_flight += 1
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        submitted = None
+        try:
+            cancel_event = self._shared().Event()
+            job = {**payload, 'cancel_event': cancel_event}
+            if on_progress is not None:
+                job['progress_queue'] = self._shared().Queue()
+            submitted = self._executor.submit(fn, job)
+            future = asyncio.wrap_future(submitted)
+            forwarder = None
+            if on_progress is not None:
+                forwarder = asyncio.ensure_future(self._forward(job['progress_queue'], future, on_progress))
+            try:
+                result = await future
+            except asyncio.CancelledError:
+                # Cancelling the asyncio future does not touch a running
+                # process; ask the solve to stop so the worker frees up
+                cancel_event.set()
+                submitted.cancel()
+                self.cancelled += 1
+                raise
+            finally:
+                if forwarder is not None:
+                    if future.cancelled():
+                        forwarder.cancel()
+                    else:
+                        await forwarder
+            self.completed += 1
+            return result
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            if submitted is None or submitted.done():
+                self._release(started)
+            else:
+                # Keep the slot until the stopped solve has left the worker
+                submitted.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release, started))
+
+    def stats(self) -> Dict:
+        """Queue depth, in-flight solves and totals for monitoring"""
+        return {
+            'max_workers': self.max_workers,
+            'queue_depth': self.queued,
+            'in_flight': self.in_flight,
+            'completed': self.completed,
+            'failed': self.failed,
+            'cancelled': self.cancelled,
+            'total_solve_seconds': round(self.total_solve_seconds, 3),
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+        self._slots = None
+
+
+# Global instance
+solver_pool = SolverPool()
@@ -0,0 +1,110 @@
+"""
+Solver Resource Manager
+
+Process-wide budget of CP-SAT search threads. Every solve asks for an
+allocation before it runs and gets a worker count and time limit sized to the
+host (os.cpu_count() or SOLVER_MAX_THREADS), the number of solves running or
+waiting, and the configured per-solve limits. When every thread is handed out
+the request waits until a running solve releases its share, so concurrent
+generations queue instead of oversubscribing the CPUs.
+"""
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict
+
+from app.config import settings
+
+
+class SolverResourceManager:
+    """Hands out CP-SAT worker threads and time budgets from a shared pool"""
+
+    def __init__(self):
+        self.total_threads = settings.SOLVER_MAX_THREADS or os.cpu_count() or 2
+        self.free_threads = self.total_threads
+        self.active = 0
+        self.waiting = 0
+        self.granted = 0
+        self.total_wait_seconds = 0.0
+        self._changed: asyncio.Condition = None
+
+    def _condition(self) -> asyncio.Condition:
+        if self._changed is None:
+            self._changed = asyncio.Condition()
+        return self._changed
+
+    def _share(self) -> int:
+        """Fair thread share for the next solve given current demand (waiting includes it)"""
+        demand = max(1, self.active + self.waiting)
+        share = -(-self.total_threads // demand)
+        return max(1, min(share, self.free_threads, settings.SOLVER_MAX_WORKERS_PER_SOLVE))
+
+    def _time_limit(self) -> float:
+        """Shrink the time budget in proportion to oversubscription so the queue drains"""
+        demand = self.active + self.waiting
+        limit = settings.SOLVER_TIME_LIMIT_SECONDS * min(1.0, self.total_threads / max(1, demand))
+        return float(max(settings.SOLVER_MIN_TIME_LIMIT_SECONDS, limit))
+
+    @asynccontextmanager
+    async def allocate(self) -> AsyncIterator[Dict]:
+        """
+        Reserve threads for one solve for the duration of the block.
+
+        Yields: {'num_workers', 'time_limit', 'waited_seconds', 'queued'}
+        """
+        changed = self._condition()
+        requested = time.perf_counter()
+        self.waiting += 1
+        try:
+            # Let solves started in the same batch (asyncio.gather) register
+            # their demand before the first one sizes its share
+            await asyncio.sleep(0)
+            async with changed:
+                queued = self.free_threads < 1
+                await changed.wait_for(lambda: self.free_threads >= 1)
+                num_workers = self._share()
+                time_limit = self._time_limit()
+                self.free_threads -= num_workers
+                self.active += 1
+                self.granted += 1
+        finally:
+            self.waiting -= 1
+        waited = time.perf_counter() - requested
+        self.total_wait_seconds += waited
+
+        try:
+            yield {
+                'num_workers': num_workers,
+                'time_limit': time_limit,
+                'waited_seconds': waited,
+                'queued': queued,
+            }
+        finally:
+            async with changed:
+                self.free_threads += num_workers
+                self.active -= 1
+                changed.notify_all()
+
+    def default_allocation(self) -> Dict:
+        """Allocation for a solve that runs outside allocate() (synchronous callers)"""
+        return {
+            'num_workers': max(1, min(self.total_threads, settings.SOLVER_MAX_WORKERS_PER_SOLVE)),
+            'time_limit': float(settings.SOLVER_TIME_LIMIT_SECONDS),
+        }
+
+    def stats(self) -> Dict:
+        """Thread budget usage for monitoring"""
+        return {
+            'total_threads': self.total_threads,
+            'free_threads': self.free_threads,
+            'active_solves': self.active,
+            'waiting_solves': self.waiting,
+            'granted': self.granted,
+            'total_wait_seconds': round(self.total_wait_seconds, 3),
+        }
+
+
+# Global instance
+solver_resources = SolverResourceManager()
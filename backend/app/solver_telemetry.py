@@ -0,0 +1,144 @@
+"""
+Solver Telemetry
+
+Persists one solver_run_telemetry row per schedule generation: model size
+(variables and constraints, also per constraint family), wall time per step
+(load, assign, each model-building step, solve, extraction, persist), the
+solver status, objective, best bound, branches and conflicts. The admin
+summary aggregates it per department to show which departments' models are
+growing and where their generation time goes.
+"""
+
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import async_session_maker
+from app.models import SolverRunTelemetry, Department
+
+
+# Worst status first; a run reports the worst status of its models
+STATUS_SEVERITY = ('MODEL_INVALID', 'INFEASIBLE', 'UNKNOWN', 'FEASIBLE', 'OPTIMAL')
+
+
+def summarize_models(models: List[Dict]) -> Dict:
+    """Add up per-model telemetry (generator.telemetry()) into run totals"""
+    totals = {
+        'variables': 0, 'constraints': 0, 'branches': 0, 'conflicts': 0,
+        'objective': None, 'best_bound': None, 'status': None, 'steps': defaultdict(float),
+    }
+    for model in models:
+        totals['variables'] += model['variables']
+        totals['constraints'] += model['constraints']
+        totals['branches'] += model['branches']
+        totals['conflicts'] += model['conflicts']
+        if model['objective'] is not None:
+            totals['objective'] = (totals['objective'] or 0) + model['objective']
+            totals['best_bound'] = (totals['best_bound'] or 0) + model['bound']
+        # Models of one run solve concurrently, so step times are summed CPU-side work
+        for step, seconds in model['steps'].items():
+            totals['steps'][step] += seconds
+        status = model['status']
+        if status in STATUS_SEVERITY and (
+                totals['status'] is None or STATUS_SEVERITY.index(status) < STATUS_SEVERITY.index(totals['status'])):
+            totals['status'] = status
+    totals['steps'] = dict(totals['steps'])
+    return totals
+
+
+async def record_generation(department_id: int, engine: str, start_date: date, end_date: date,
+                            employees: int, shifts: int, success: bool, models: List[Dict],
+                            cached_models: int, steps: Dict[str, float], total_seconds: float):
+    """
+    Store telemetry for one generation run. Uses its own session so a failed
+    insert never affects the generation's transaction.
+    """
+    totals = summarize_models(models)
+    all_steps = {**totals['steps'], **steps}
+    try:
+        async with async_session_maker() as db:
+            db.add(SolverRunTelemetry(
+                department_id=department_id,
+                engine=engine,
+                start_date=start_date,
+                end_date=end_date,
+                employees=employees,
+                shifts=shifts,
+                success=success,
+                status=totals['status'] or ('greedy' if engine == 'greedy' else None),
+                models=len(models),
+                cached_models=cached_models,
+                variables=totals['variables'],
+                constraints=totals['constraints'],
+                objective=totals['objective'],
+                best_bound=totals['best_bound'],
+                branches=totals['branches'],
+                conflicts=totals['conflicts'],
+                steps={step: round(seconds, 4) for step, seconds in all_steps.items()},
+                model_details=models,
+                total_seconds=round(total_seconds, 3)
+            ))
+            await db.commit()
+    except Exception as e:
+        print(f"[DEBUG] Solver telemetry insert failed: {e}", flush=True)
+
+
+async def department_summary(db: AsyncSession, days: int = 30,
+                             department_id: Optional[int] = None) -> List[Dict]:
+    """
+    Per-department aggregates of the last `days` days of generations, largest
+    models first.
+    """
+    query = (
+        select(SolverRunTelemetry, Department.name)
+        .join(Department, Department.id == SolverRunTelemetry.department_id)
+        .where(SolverRunTelemetry.created_at >= datetime.utcnow() - timedelta(days=days))
+        .order_by(SolverRunTelemetry.created_at)
+    )
+    if department_id is not None:
+        query = query.where(SolverRunTelemetry.department_id == department_id)
+    result = await db.execute(query)
+
+    runs_by_department = defaultdict(list)
+    names = {}
+    for run, name in result.all():
+        runs_by_department[run.department_id].append(run)
+        names[run.department_id] = name
+
+    summary = []
+    for dept_id, runs in runs_by_department.items():
+        solved = [r for r in runs if r.models]
+        step_totals = defaultdict(float)
+        for run in runs:
+            for step, seconds in (run.steps or {}).items():
+                step_totals[step] += seconds
+        statuses = defaultdict(int)
+        for run in runs:
+            statuses[run.status or 'unknown'] += 1
+        summary.append({
+            'department_id': dept_id,
+            'department_name': names[dept_id],
+            'runs': len(runs),
+            'failed_runs': sum(1 for r in runs if not r.success),
+            'engines': sorted({r.engine for r in runs}),
+            'statuses': dict(statuses),
+            'avg_variables': round(sum(r.variables for r in solved) / len(solved)) if solved else 0,
+            'max_variables': max((r.variables for r in solved), default=0),
+            'avg_constraints': round(sum(r.constraints for r in solved) / len(solved)) if solved else 0,
+            'max_constraints': max((r.constraints for r in solved), default=0),
+            # Latest vs first model size in the window; > 1 means the model is growing
+            'variables_growth': round(solved[-1].variables / solved[0].variables, 2)
+                                if solved and solved[0].variables else None,
+            'avg_total_seconds': round(sum(r.total_seconds for r in runs) / len(runs), 3),
+            'max_total_seconds': round(max(r.total_seconds for r in runs), 3),
+            'avg_step_seconds': {step: round(seconds / len(runs), 4) for step, seconds in step_totals.items()},
+            'avg_branches': round(sum(r.branches for r in solved) / len(solved)) if solved else 0,
+            'avg_conflicts': round(sum(r.conflicts for r in solved) / len(solved)) if solved else 0,
+            'cache_hit_models': sum(r.cached_models for r in runs),
+            'last_run_at': runs[-1].created_at,
+        })
+    summary.sort(key=lambda d: d['max_variables'], reverse=True)
+    return summary
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Schedule Generation Benchmark
+
+Builds synthetic departments in the local database, runs the schedule
+generation engines against them and reports:
+- model-build, solve, DB-write and total time
+- SQL query count
+- peak RSS (this process and the solver processes)
+
+Scenarios:
+- small:  50 employees, 3 roles
+- medium: 500 employees, 8 roles
+- large:  5,000 employees, 20 roles
+
+Each role gets 1-2 shifts (weekday and weekend patterns), ~2% approved leave
+days and ~1.5% unavailable days. The default range (May 2025) contains the
+Golden Week holidays.
+
+Results can be stored as JSON baselines and compared on later runs:
+    python benchmark_schedule_generation.py --scenario small --save-baseline
+    python benchmark_schedule_generation.py --scenario small --compare
+
+Peak RSS is a high-water mark for the whole process, so run one scenario per
+invocation when comparing memory.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import math
+import os
+import random
+import resource
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import delete, event, insert, select
+
+from app.database import engine, async_session_maker
+from app.models import (
+    Department, Role, Shift, Employee, Schedule, LeaveRequest, LeaveStatus, Unavailability
+)
+from app.schedule_engine import generate_department_schedules, ENGINES
+from app.solver_pool import solver_pool
+
+
+SCENARIOS = {
+    'small': {'employees': 50, 'roles': 3},
+    'medium': {'employees': 500, 'roles': 8},
+    'large': {'employees': 5000, 'roles': 20},
+}
+
+LEAVE_DENSITY = 0.02
+UNAVAILABILITY_DENSITY = 0.015
+
+SHIFT_PATTERNS = [
+    ('Day', '09:00', '18:00', ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']),
+    ('Early', '07:00', '16:00', ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']),
+    ('Late', '13:00', '22:00', ['Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']),
+]
+
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks', 'baselines')
+
+# Metrics compared against the baseline (lower is better)
+COMPARED_METRICS = ('build_seconds', 'solve_seconds', 'write_seconds', 'total_seconds', 'query_count')
+
+
+class QueryCounter:
+    """Counts SQL statements executed through the app engine"""
+
+    def __init__(self):
+        self.count = 0
+        event.listen(engine.sync_engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+def peak_rss_mb() -> dict:
+    """High-water RSS of this process and of finished/running child processes"""
+    self_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children_kb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is in KB on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return {'self': round(self_kb / scale, 1), 'children': round(children_kb / scale, 1)}
+
+
+async def create_department(db, scenario: str, start_date: date, end_date: date, seed: int) -> dict:
+    """Create a synthetic department with roles, shifts, employees, leaves and unavailability"""
+    rng = random.Random(seed)
+    spec = SCENARIOS[scenario]
+    # Unique per run so kept departments never collide with a new one
+    tag = os.urandom(2).hex()[:3]
+
+    used_dept_ids = set((await db.execute(select(Department.dept_id))).scalars().all())
+    dept_code = next(f"{n:03d}" for n in range(999, 0, -1) if f"{n:03d}" not in used_dept_ids)
+    department = Department(dept_id=dept_code, name=f"Benchmark {scenario} {tag}",
+                            description="Synthetic department for generation benchmarks")
+    db.add(department)
+    await db.flush()
+
+    roles = []
+    for r in range(spec['roles']):
+        role = Role(name=f"Bench Role {r + 1}", department_id=department.id, break_minutes=60,
+                    schedule_config={day: {'enabled': True} for day in DAYS})
+        db.add(role)
+        roles.append(role)
+    await db.flush()
+
+    per_role = spec['employees'] // spec['roles']
+    shift_count = 0
+    for r, role in enumerate(roles):
+        patterns = SHIFT_PATTERNS[:1 + r % 2] if r % 3 else SHIFT_PATTERNS[1:]
+        max_emp = max(1, math.ceil(per_role * 0.7 / len(patterns)))
+        for name, start, end, days in patterns:
+            db.add(Shift(
+                role_id=role.id, name=f"{name} {r + 1}", start_time=start, end_time=end,
+                min_emp=max(1, int(max_emp * 0.6)), max_emp=max_emp,
+                schedule_config={day: {'enabled': day in days} for day in DAYS}
+            ))
+            shift_count += 1
+    await db.flush()
+
+    employee_rows = [
+        {
+            'employee_id': f"B{tag}{i:05d}",
+            'first_name': f"Bench{i}",
+            'last_name': scenario.capitalize(),
+            'email': f"bench-{tag}-{i}@example.invalid",
+            'department_id': department.id,
+            'role_id': roles[i % len(roles)].id,
+            'weekly_hours': 40,
+            'daily_max_hours': 8,
+            'shifts_per_week': 5,
+            'is_active': True,
+        }
+        for i in range(spec['employees'])
+    ]
+    # Chunked to stay under the driver's bind-parameter limit
+    for i in range(0, len(employee_rows), 1000):
+        await db.execute(insert(Employee).values(employee_rows[i:i + 1000]))
+    employee_ids = (await db.execute(
+        select(Employee.id).filter(Employee.department_id == department.id)
+    )).scalars().all()
+
+    days = (end_date - start_date).days + 1
+    leave_rows, unavailability_rows = [], []
+    for emp_id in employee_ids:
+        # Leaves come in 1-3 day blocks
+        remaining = int(round(rng.random() * 2 * LEAVE_DENSITY * days))
+        while remaining > 0:
+            length = min(remaining, rng.randint(1, 3))
+            leave_start = start_date + timedelta(days=rng.randrange(days))
+            leave_rows.append({
+                'employee_id': emp_id, 'start_date': leave_start,
+                'end_date': min(end_date, leave_start + timedelta(days=length - 1)),
+                'leave_type': 'paid', 'duration_type': 'full_day',
+                'status': LeaveStatus.APPROVED, 'reason': 'benchmark',
+            })
+            remaining -= length
+        for offset in rng.sample(range(days), int(round(rng.random() * 2 * UNAVAILABILITY_DENSITY * days))):
+            unavailability_rows.append({
+                'employee_id': emp_id, 'date': start_date + timedelta(days=offset), 'reason': 'benchmark'
+            })
+    for rows, model in ((leave_rows, LeaveRequest), (unavailability_rows, Unavailability)):
+        for i in range(0, len(rows), 1000):
+            await db.execute(insert(model).values(rows[i:i + 1000]))
+
+    await db.commit()
+    return {
+        'department_id': department.id,
+        'employee_ids': list(employee_ids),
+        'roles': len(roles),
+        'shifts': shift_count,
+        'leaves': len(leave_rows),
+        'unavailable_days': len(unavailability_rows),
+    }
+
+
+async def drop_department(db, department: dict):
+    """Remove everything create_department() wrote"""
+    employee_ids = department['employee_ids']
+    for i in range(0, len(employee_ids), 1000):
+        ids = employee_ids[i:i + 1000]
+        await db.execute(delete(Schedule).where(Schedule.employee_id.in_(ids)))
+        await db.execute(delete(LeaveRequest).where(LeaveRequest.employee_id.in_(ids)))
+        await db.execute(delete(Unavailability).where(Unavailability.employee_id.in_(ids)))
+    await db.execute(delete(Employee).where(Employee.department_id == department['department_id']))
+    role_ids = select(Role.id).where(Role.department_id == department['department_id'])
+    await db.execute(delete(Shift).where(Shift.role_id.in_(role_ids)))
+    await db.execute(delete(Role).where(Role.department_id == department['department_id']))
+    await db.execute(delete(Department).where(Department.id == department['department_id']))
+    await db.commit()
+
+
+async def run_engine(department: dict, engine_name: str, start_date: date, end_date: date,
+                     counter: QueryCounter) -> dict:
+    """Generate the range from scratch with one engine and collect metrics"""
+    async with async_session_maker() as db:
+        await db.execute(delete(Schedule).where(Schedule.department_id == department['department_id']))
+        await db.commit()
+
+    queries_before = counter.count
+    started = time.perf_counter()
+    # The engines log every decision; keep the benchmark output readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        async with async_session_maker() as db:
+            result = await generate_department_schedules(
+                db, department['department_id'], start_date, end_date,
+                regenerate=True, engine=engine_name
+            )
+    elapsed = time.perf_counter() - started
+
+    timings = result.get('timings', {})
+    return {
+        'success': result.get('success', False),
+        'schedules_created': result.get('schedules_created', 0),
+        'build_seconds': timings.get('build_seconds', 0.0),
+        'solve_seconds': timings.get('solve_seconds', 0.0),
+        'assign_seconds': timings.get('assign_seconds', 0.0),
+        'write_seconds': timings.get('write_seconds', 0.0),
+        'total_seconds': round(elapsed, 3),
+        'query_count': counter.count - queries_before,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def baseline_path(scenario: str) -> str:
+    return os.path.join(BASELINE_DIR, f"{scenario}.json")
+
+
+def compare_to_baseline(scenario: str, results: dict, tolerance: float) -> list:
+    """Return regression messages for metrics worse than baseline by more than tolerance"""
+    path = baseline_path(scenario)
+    if not os.path.exists(path):
+        return [f"No baseline for '{scenario}' at {path}"]
+    with open(path) as f:
+        baseline = json.load(f)
+
+    regressions = []
+    for engine_name, metrics in results['engines'].items():
+        base = baseline.get('engines', {}).get(engine_name)
+        if not base:
+            continue
+        for metric in COMPARED_METRICS:
+            old, new = base.get(metric, 0), metrics.get(metric, 0)
+            # Ignore noise on sub-100ms timings
+            if metric.endswith('_seconds') and new < 0.1:
+                continue
+            if new > old * (1 + tolerance):
+                regressions.append(f"{scenario}/{engine_name}: {metric} {old} -> {new}")
+    return regressions
+
+
+async def run_scenario(scenario: str, engines: list, start_date: date, end_date: date,
+                       seed: int, keep: bool, counter: QueryCounter) -> dict:
+    print(f"\n=== {scenario}: {SCENARIOS[scenario]['employees']} employees, "
+          f"{SCENARIOS[scenario]['roles']} roles, {start_date} to {end_date} ===")
+    setup_started = time.perf_counter()
+    async with async_session_maker() as db:
+        department = await create_department(db, scenario, start_date, end_date, seed)
+    print(f"  Seeded {department['shifts']} shifts, {department['leaves']} leaves and "
+          f"{department['unavailable_days']} unavailable days in {time.perf_counter() - setup_started:.1f}s")
+
+    results = {
+        'scenario': scenario,
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'employees': SCENARIOS[scenario]['employees'],
+        'roles': department['roles'],
+        'shifts': department['shifts'],
+        'recorded_at': datetime.utcnow().isoformat(),
+        'engines': {},
+    }
+    try:
+        for engine_name in engines:
+            metrics = await run_engine(department, engine_name, start_date, end_date, counter)
+            results['engines'][engine_name] = metrics
+            print(f"  {engine_name:7s} created={metrics['schedules_created']:6d} "
+                  f"build={metrics['build_seconds']:.2f}s solve={metrics['solve_seconds']:.2f}s "
+                  f"write={metrics['write_seconds']:.2f}s total={metrics['total_seconds']:.2f}s "
+                  f"queries={metrics['query_count']} rss={metrics['peak_rss_mb']['self']}MB "
+                  f"(solvers {metrics['peak_rss_mb']['children']}MB)")
+    finally:
+        if not keep:
+            async with async_session_maker() as db:
+                await drop_department(db, department)
+    return results
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark schedule generation against synthetic departments")
+    parser.add_argument('--scenario', choices=list(SCENARIOS) + ['all'], default='small')
+    parser.add_argument('--engines', default=','.join(ENGINES), help="Comma-separated engines to run")
+    parser.add_argument('--start', type=date.fromisoformat, default=date(2025, 5, 1))
+    parser.add_argument('--days', type=int, default=31)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--save-baseline', action='store_true', help="Store results as the new baseline")
+    parser.add_argument('--compare', action='store_true', help="Fail on regressions against the baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed slowdown before a regression (0.25 = 25%%)")
+    parser.add_argument('--keep', action='store_true', help="Keep the synthetic department afterwards")
+    args = parser.parse_args()
+
+    engines = [e for e in args.engines.split(',') if e]
+    unknown = set(engines) - set(ENGINES)
+    if unknown:
+        parser.error(f"Unknown engine(s): {', '.join(sorted(unknown))}")
+
+    scenarios = list(SCENARIOS) if args.scenario == 'all' else [args.scenario]
+    start_date = args.start
+    end_date = start_date + timedelta(days=args.days - 1)
+    counter = QueryCounter()
+
+    regressions = []
+    try:
+        for scenario in scenarios:
+            results = await run_scenario(scenario, engines, start_date, end_date, args.seed, args.keep, counter)
+            if args.compare:
+                regressions.extend(compare_to_baseline(scenario, results, args.tolerance))
+            if args.save_baseline:
+                os.makedirs(BASELINE_DIR, exist_ok=True)
+                with open(baseline_path(scenario), 'w') as f:
+                    json.dump(results, f, indent=2)
+                print(f"  Baseline saved to {baseline_path(scenario)}")
+    finally:
+        solver_pool.shutdown()
+        await engine.dispose()
+
+    if regressions:
+        print("\n❌ Regressions:")
+        for message in regressions:
+            print(f"  {message}")
+        sys.exit(1)
+    if args.compare:
+        print("\n✅ No regressions against baseline")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,95 @@
+"""
+Calendar HTTP Caching Test
+Checks ETag computation, If-None-Match matching and the 304 / 200 choice of
+the calendar endpoints (no database or server needed)
+Run: python test_calendar_etag.py
+"""
+
+import json
+
+from app import calendar_cache
+from app.calendar_cache import compute_etag, etag_matches, conditional_response
+
+
+class FakeRequest:
+    """Just the request headers (lower-case names, as Starlette looks them up)"""
+
+    def __init__(self, **headers):
+        self.headers = {name.replace('_', '-'): value for name, value in headers.items()}
+
+
+def test_compute_etag():
+    """Strong, quoted ETag that only depends on the payload's content"""
+    print("\n🧪 compute_etag")
+    etag = compute_etag({'year': 2026, 'month': 5, 'holidays': {}})
+    assert etag.startswith('"') and etag.endswith('"') and len(etag) == 34
+    assert compute_etag({'holidays': {}, 'month': 5, 'year': 2026}) == etag
+    assert compute_etag({'year': 2026, 'month': 6, 'holidays': {}}) != etag
+    print("   ✅ Quoted, independent of key order, changes with the content")
+
+
+def test_etag_matches():
+    """If-None-Match lists, weak tags and * match; anything else does not"""
+    print("\n🧪 etag_matches")
+    etag = '"abc123"'
+    cases = [
+        (None, False),
+        ('', False),
+        ('"abc123"', True),
+        ('"other", "abc123"', True),
+        ('"other","abc123"', True),
+        ('W/"abc123"', True),  # Weak comparison
+        ('*', True),
+        ('"abc"', False),
+        ('abc123', False),  # Unquoted is a different tag
+    ]
+    for header, expected in cases:
+        request = FakeRequest() if header is None else FakeRequest(if_none_match=header)
+        assert etag_matches(request, etag) == expected, header
+    print(f"   ✅ {len(cases)} If-None-Match headers")
+
+
+def test_conditional_response():
+    """304 without a body when the client is current, otherwise 200 with the payload"""
+    print("\n🧪 conditional_response")
+    payload, etag = calendar_cache.month_holidays(2026, 5)
+    cache_control = calendar_cache.calendar_cache_control()
+
+    response = conditional_response(FakeRequest(), payload, cache_control, etag)
+    assert response.status_code == 200
+    assert json.loads(response.body) == payload
+    assert response.headers['etag'] == etag
+    assert response.headers['cache-control'] == cache_control
+    print("   ✅ First request: 200 with payload, ETag and Cache-Control")
+
+    response = conditional_response(FakeRequest(if_none_match=etag), payload, cache_control, etag)
+    assert response.status_code == 304
+    assert not response.body
+    assert response.headers['etag'] == etag
+    print("   ✅ Revalidation with the ETag: bodiless 304")
+
+    response = conditional_response(FakeRequest(if_none_match='"stale"'), payload, cache_control)
+    assert response.status_code == 200 and response.headers['etag'] == compute_etag(payload)
+    print("   ✅ Stale ETag: 200; ETag computed from the payload when not given")
+
+    assert calendar_cache.month_holidays(2026, 5) is calendar_cache.month_holidays(2026, 5)
+    print("   ✅ Payload and ETag are memoized per argument set")
+
+
+def main():
+    """Run all tests"""
+    print("\n" + "="*70)
+    print("🧪 CALENDAR HTTP CACHING TEST SUITE")
+    print("="*70)
+
+    test_compute_etag()
+    test_etag_matches()
+    test_conditional_response()
+
+    print("\n" + "="*70)
+    print("✅ ALL CHECKS PASSED")
+    print("="*70)
+
+
+if __name__ == "__main__":
+    main()
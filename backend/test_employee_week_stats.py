@@ -0,0 +1,92 @@
+"""
+Employee Week Stats Counter Test
+Checks how one schedule row adds to / removes from the per-employee weekly
+counters (tally, span_hours) and the consecutive-day count (max_consecutive)
+(no database needed)
+Run: python test_employee_week_stats.py
+"""
+
+from datetime import date, timedelta
+
+from app.employee_week_stats import empty_week, tally, max_consecutive, span_hours
+
+
+WEEK_START = date(2026, 3, 2)  # Monday
+
+
+def day(offset):
+    return WEEK_START + timedelta(days=offset)
+
+
+def test_span_hours():
+    """Shift length in hours, wrapping past midnight"""
+    print("\n🧪 span_hours")
+    assert span_hours('09:00', '17:30') == 8.5
+    assert span_hours('22:00', '06:00') == 8.0
+    assert span_hours(None, '17:00') == 0.0 and span_hours('9am', '17:00') == 0.0
+    print("   ✅ Day shift, overnight shift and malformed times")
+
+
+def test_tally():
+    """Each status feeds the counters it belongs to"""
+    print("\n🧪 tally")
+    week = empty_week()
+    tally(week, day(0), 'scheduled', '09:00', '17:00')  # Monday shift
+    tally(week, day(1), 'leave', '09:00', '17:00')  # Tuesday leave: coverage, no hours
+    tally(week, day(2), 'leave_half_morning', '09:00', '12:00')  # Wednesday half day
+    tally(week, day(3), 'comp_off_earned', '09:00', '17:00')  # Thursday: worked, not occupying
+    tally(week, day(5), 'scheduled', '10:00', '14:00')  # Saturday shift
+    tally(week, day(6), 'comp_off_taken', None, None)  # Sunday comp-off: not a weekend shift
+
+    assert week['weekday_coverage'] == 4
+    assert week['weekend_regular'] == 1
+    assert week['work_hours'] == 8 + 8 + 4
+    assert week['leave_days'] == 1 + 0.5 + 1
+    assert week['day_occupancy'] == [1, 1, 1, 0, 0, 1, 1]
+    assert week['day_hours'] == [8.0, 0.0, 0.0, 8.0, 0.0, 4.0, 0.0]
+    print("   ✅ Coverage, weekend shifts, hours, leave days and occupancy per status")
+
+    before = {k: (list(v) if isinstance(v, list) else v) for k, v in week.items()}
+    tally(week, day(4), 'scheduled', '22:00', '06:00')
+    tally(week, day(4), 'scheduled', '22:00', '06:00', sign=-1)
+    assert week == before
+    print("   ✅ sign=-1 exactly undoes a row (moves and deletes)")
+
+
+def test_max_consecutive():
+    """Longest run of occupied days, optionally with one more day"""
+    print("\n🧪 max_consecutive")
+    week = empty_week()
+    assert max_consecutive(week, WEEK_START) == 0
+    for offset in (0, 1, 2, 4, 5):
+        tally(week, day(offset), 'scheduled', '09:00', '17:00')
+    assert max_consecutive(week, WEEK_START) == 3
+    print("   ✅ Mon-Wed + Fri-Sat: longest run 3")
+
+    assert max_consecutive(week, WEEK_START, extra_day=day(3)) == 6
+    assert max_consecutive(week, WEEK_START, extra_day=day(6)) == 3
+    print("   ✅ Adding Thursday bridges the runs (6); adding Sunday extends Fri-Sun (3)")
+
+    tally(week, day(1), 'scheduled', '09:00', '17:00')  # Two rows on Tuesday
+    tally(week, day(1), 'scheduled', '09:00', '17:00', sign=-1)
+    assert max_consecutive(week, WEEK_START) == 3
+    print("   ✅ A day stays occupied while any row remains on it")
+
+
+def main():
+    """Run all tests"""
+    print("\n" + "="*70)
+    print("🧪 EMPLOYEE WEEK STATS COUNTER TEST SUITE")
+    print("="*70)
+
+    test_span_hours()
+    test_tally()
+    test_max_consecutive()
+
+    print("\n" + "="*70)
+    print("✅ ALL CHECKS PASSED")
+    print("="*70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Japanese Calendar Tables Test
+Checks the precomputed holiday bitsets, name tables and week info of
+JapaneseCalendar day by day against holidays.Japan() (no database needed)
+Run: python test_holiday_tables.py
+"""
+
+from datetime import date, timedelta
+
+import holidays as holidays_lib
+
+from app.holidays_jp import JapaneseCalendar
+
+
+YEARS = range(2024, 2028)
+
+
+def each_day(start_date, end_date):
+    current = start_date
+    while current <= end_date:
+        yield current
+        current += timedelta(days=1)
+
+
+def test_day_lookups(calendar, reference):
+    """is_holiday / get_holiday_name match the library for every day"""
+    print("\n🧪 day lookups")
+    days = list(each_day(date(YEARS[0], 1, 1), date(YEARS[-1], 12, 31)))
+    for day in days:
+        assert calendar.is_holiday(day) == (day in reference), day
+        assert calendar.get_holiday_name(day) == reference.get(day), day
+        assert calendar.is_weekend_or_holiday(day) == (day.weekday() >= 5 or day in reference), day
+    print(f"   ✅ {len(days)} days, {sum(1 for day in days if day in reference)} holidays match")
+
+
+def test_ranges(calendar, reference):
+    """Range queries (bitset slices) match a day-by-day scan, across year boundaries"""
+    print("\n🧪 range queries")
+    ranges = [
+        (date(2024, 1, 1), date(2024, 12, 31)),
+        (date(2024, 12, 20), date(2025, 1, 15)),  # Across New Year
+        (date(2025, 4, 28), date(2025, 5, 6)),  # Golden Week
+        (date(2026, 9, 21), date(2026, 9, 21)),  # Single day
+        (date(2027, 3, 5), date(2027, 3, 1)),  # Empty (end before start)
+    ]
+    for start_date, end_date in ranges:
+        expected = {day: reference[day] for day in each_day(start_date, end_date) if day in reference}
+        holidays_found = calendar.get_holidays_in_range(start_date, end_date)
+        assert holidays_found == expected, (start_date, end_date)
+        assert list(holidays_found) == sorted(holidays_found)
+
+        expected_non_working = {}
+        for day in each_day(start_date, end_date):
+            if day.weekday() >= 5:
+                expected_non_working[day] = day.strftime('%A')
+            elif day in reference:
+                expected_non_working[day] = reference[day]
+        assert calendar.get_non_working_days_in_range(start_date, end_date) == expected_non_working
+    print(f"   ✅ {len(ranges)} ranges: holidays and non-working days")
+
+
+def test_week_info(calendar, reference):
+    """Memoized week info matches counts from the library"""
+    print("\n🧪 week info")
+    week_start = date(YEARS[0], 1, 1) - timedelta(days=date(YEARS[0], 1, 1).weekday())
+    weeks = 0
+    while week_start.year <= YEARS[-1]:
+        info = calendar.get_week_info(week_start)
+        days = [week_start + timedelta(days=i) for i in range(7)]
+        weekday_holidays = sum(1 for day in days if day in reference and day.weekday() < 5)
+        assert info['holiday_count'] == sum(1 for day in days if day in reference), week_start
+        assert info['weekday_holiday_count'] == weekday_holidays, week_start
+        assert info['required_shifts'] == max(4, 5 - weekday_holidays), week_start
+        assert calendar.get_shifts_required_for_week(week_start) == info['required_shifts']
+        assert calendar.get_week_info(week_start) is info  # Shared, not rebuilt
+        week_start += timedelta(days=7)
+        weeks += 1
+    print(f"   ✅ {weeks} weeks: holiday counts and required shifts")
+
+
+def test_outside_window():
+    """Years outside the precomputed window are tabulated on first use"""
+    print("\n🧪 years outside the window")
+    calendar = JapaneseCalendar(years=[2025])
+    reference = holidays_lib.Japan(years=2030)
+    for day in each_day(date(2030, 1, 1), date(2030, 12, 31)):
+        assert calendar.get_holiday_name(day) == reference.get(day), day
+    assert 2030 in calendar._holiday_bits
+    print("   ✅ 2030 built on demand and matches the library")
+
+
+def main():
+    """Run all tests"""
+    print("\n" + "="*70)
+    print("🧪 JAPANESE CALENDAR TABLES TEST SUITE")
+    print("="*70)
+
+    calendar = JapaneseCalendar(years=YEARS)
+    # One extra year each side: the first and last weeks cross the year boundary
+    reference = holidays_lib.Japan(years=list(range(YEARS[0] - 1, YEARS[-1] + 2)))
+
+    test_day_lookups(calendar, reference)
+    test_ranges(calendar, reference)
+    test_week_info(calendar, reference)
+    test_outside_window()
+
+    print("\n" + "="*70)
+    print("✅ ALL CHECKS PASSED")
+    print("="*70)
+
+
+if __name__ == "__main__":
+    main()
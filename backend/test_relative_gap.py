@@ -0,0 +1,53 @@
+"""
+Relative Gap Test
+Checks the optimality gap used for the early-accept threshold and for the
+progress messages of streamed CP-SAT solutions (no database needed)
+Run: python test_relative_gap.py
+"""
+
+from app.schedule_generator import relative_gap
+
+
+def close(a, b):
+    return abs(a - b) < 1e-9
+
+
+def test_relative_gap():
+    """Gap is |bound - objective| relative to the bound, never divided by less than 1"""
+    print("\n🧪 relative_gap")
+    assert relative_gap(100, 100) == 0.0
+    print("   ✅ Proven optimal solution has gap 0")
+
+    assert close(relative_gap(110, 100), 0.10)
+    assert close(relative_gap(90, 100), 0.10)
+    print("   ✅ Objective above or below the bound gives the same gap")
+
+    assert close(relative_gap(-90, -100), 0.10)
+    print("   ✅ Negative bounds use their magnitude")
+
+    assert relative_gap(3, 0) == 3.0
+    assert close(relative_gap(0.5, 0.25), 0.25)
+    print("   ✅ Bounds below 1 are not divided by (no blow-up near 0)")
+
+    # The early-accept rule: stop once the gap is at or below the threshold
+    accept_gap = 0.05
+    assert relative_gap(104, 100) <= accept_gap
+    assert not relative_gap(106, 100) <= accept_gap
+    print("   ✅ 4% gap is accepted and 6% is not at accept_gap=0.05")
+
+
+def main():
+    """Run all tests"""
+    print("\n" + "="*70)
+    print("🧪 RELATIVE GAP TEST SUITE")
+    print("="*70)
+
+    test_relative_gap()
+
+    print("\n" + "="*70)
+    print("✅ ALL CHECKS PASSED")
+    print("="*70)
+
+
+if __name__ == "__main__":
+    main()
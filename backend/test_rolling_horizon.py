@@ -0,0 +1,73 @@
+"""
+Rolling Horizon Test
+Checks how long-range generation is split into solve windows and how a solved
+window is carried into the next one (no database needed)
+Run: python test_rolling_horizon.py
+"""
+
+from datetime import date
+
+from app.schedule_generator import horizon_windows, commit_window
+
+
+def test_horizon_windows():
+    """Windows tile the range; whole-week windows end on Sundays"""
+    print("\n🧪 horizon_windows")
+    start, end = date(2026, 1, 7), date(2026, 1, 31)  # Wednesday .. Saturday
+    windows = horizon_windows(start, end, 7)
+    assert windows == [
+        (date(2026, 1, 7), date(2026, 1, 11)),  # Partial first week, ends Sunday
+        (date(2026, 1, 12), date(2026, 1, 18)),
+        (date(2026, 1, 19), date(2026, 1, 25)),
+        (date(2026, 1, 26), date(2026, 1, 31)),  # Clipped to the range end
+    ], windows
+    print("   ✅ 7-day windows follow ISO weeks")
+
+    windows = horizon_windows(start, end, 10)
+    assert windows == [
+        (date(2026, 1, 7), date(2026, 1, 16)),
+        (date(2026, 1, 17), date(2026, 1, 26)),
+        (date(2026, 1, 27), date(2026, 1, 31)),
+    ], windows
+    print("   ✅ 10-day windows are consecutive and clipped")
+
+    assert horizon_windows(start, end, 60) == [(start, end)]
+    assert horizon_windows(start, start, 0) == [(start, start)]
+    print("   ✅ Large window covers the range; window_days < 1 counts as 1")
+
+
+def test_commit_window():
+    """A solved window becomes blocked days and weekly load for later windows"""
+    print("\n🧪 commit_window")
+    saturday, monday = date(2026, 1, 10), date(2026, 1, 12)
+    inputs = {'existing_load': {1: {date(2026, 1, 5): {'weekday': 2, 'work_minutes': 960}}}}
+    commit_window(inputs, {
+        saturday: {1: {'work_hours': 8}, 2: {'work_hours': 4.5}},
+        monday: {1: {'work_hours': 7.5}},
+    })
+    assert inputs['blocked_dates'] == {1: {saturday, monday}, 2: {saturday}}
+    load = inputs['existing_load']
+    assert load[1][date(2026, 1, 5)] == {
+        'weekday': 2, 'weekend': 1, 'work_minutes': 960 + 480, 'worked_dates': {saturday}
+    }
+    assert load[1][date(2026, 1, 12)] == {'weekday': 1, 'work_minutes': 450, 'worked_dates': {monday}}
+    assert load[2][date(2026, 1, 5)] == {'weekend': 1, 'work_minutes': 270, 'worked_dates': {saturday}}
+    print("   ✅ Days blocked; load added to the existing week and carried into the next")
+
+
+def main():
+    """Run all tests"""
+    print("\n" + "="*70)
+    print("🧪 ROLLING HORIZON TEST SUITE")
+    print("="*70)
+
+    test_horizon_windows()
+    test_commit_window()
+
+    print("\n" + "="*70)
+    print("✅ ALL CHECKS PASSED")
+    print("="*70)
+
+
+if __name__ == "__main__":
+    main()
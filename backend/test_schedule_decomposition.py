@@ -0,0 +1,126 @@
+"""
+Schedule Decomposition Test
+Checks the per-role model decomposition behind CP-SAT generation (no database
+needed): component splitting and merging the component results back
+Run: python test_schedule_decomposition.py
+"""
+
+from datetime import date
+
+from app.schedule_generator import decompose_shift_inputs, merge_shift_results
+
+
+def shift_result(schedule, objective, bound, status='OPTIMAL', error=None, coverage=()):
+    """solve_shift_schedule-shaped result of one component"""
+    return {
+        'schedule': schedule,
+        'error': error,
+        'feedback': [f"component {objective}"],
+        'coverage': list(coverage),
+        'status': status,
+        'wall_time': objective / 10,
+        'build_seconds': objective / 100,
+        'objective': objective,
+        'bound': bound,
+        'solutions': 1,
+        'stop_reason': None,
+        'telemetry': [{'objective': objective}],
+    }
+
+
+def test_decompose_shift_inputs():
+    """Employees and shifts split into role components; inputs follow their employees"""
+    print("\n🧪 decompose_shift_inputs")
+    day = date(2026, 1, 7)
+    inputs = {
+        'shifts': [
+            {'id': 10, 'role_id': 1}, {'id': 11, 'role_id': 1},
+            {'id': 20, 'role_id': 2},
+            {'id': 30, 'role_id': 3},  # Nobody can work it
+        ],
+        'employees': [
+            {'id': 1, 'role_id': 1}, {'id': 2, 'role_id': 1},
+            {'id': 3, 'role_id': 2},
+            {'id': 4, 'role_id': 9},  # No eligible shift
+        ],
+        'leave_dates': {1: {day}, 3: {day}},
+        'hints': {(1, day): 10, (3, day): 20},
+        'neighborhood': {(2, day), (3, day)},
+        'max_time_seconds': 5,
+    }
+    components = decompose_shift_inputs(inputs)
+    by_shifts = {tuple(s['id'] for s in c['shifts']): c for c in components}
+    assert set(by_shifts) == {(10, 11), (20,), (30,)}, by_shifts.keys()
+
+    role_1 = by_shifts[(10, 11)]
+    assert [e['id'] for e in role_1['employees']] == [1, 2]
+    assert role_1['leave_dates'] == {1: {day}}
+    assert role_1['hints'] == {(1, day): 10}
+    assert role_1['neighborhood'] == {(2, day)}
+    assert role_1['max_time_seconds'] == 5  # Other inputs are passed through
+    assert [e['id'] for e in by_shifts[(20,)]['employees']] == [3]
+    assert by_shifts[(30,)]['employees'] == []
+    assert all(e['id'] != 4 for c in components for e in c['employees'])
+    print("   ✅ 3 components, employee 4 left out, per-employee inputs split")
+
+    # An employee without a role may work every shift, joining all components
+    inputs['employees'].append({'id': 5, 'role_id': None})
+    components = decompose_shift_inputs(inputs)
+    assert len(components) == 1
+    assert sorted(s['id'] for s in components[0]['shifts']) == [10, 11, 20, 30]
+    print("   ✅ Role-less employee connects everything into 1 component")
+
+
+def test_merge_shift_results():
+    """Merged result has the single-model shape: schedules united, objectives summed"""
+    print("\n🧪 merge_shift_results")
+    day = date(2026, 1, 7)
+    first = shift_result({day: {1: {'shift_id': 10}}}, objective=4, bound=3,
+                         coverage=[{'date': day, 'shift_id': 20}])
+    second = shift_result({day: {3: {'shift_id': 20}}}, objective=6, bound=6, status='FEASIBLE',
+                          coverage=[{'date': day, 'shift_id': 10}])
+    merged = merge_shift_results([first, second])
+    assert merged['schedule'] == {day: {1: {'shift_id': 10}, 3: {'shift_id': 20}}}
+    assert merged['error'] is None and merged['status'] == 'FEASIBLE'
+    assert (merged['objective'], merged['bound']) == (10, 9)
+    assert abs(merged['gap'] - 1 / 9) < 1e-9
+    assert merged['wall_time'] == 0.6  # Slowest component
+    assert merged['solutions'] == 2 and len(merged['telemetry']) == 2
+    assert [slot['shift_id'] for slot in merged['coverage']] == [10, 20]
+    print("   ✅ Schedules united, objective/bound summed, status and coverage merged")
+
+    # Round trip: splitting inputs and merging per-component results loses nobody
+    inputs = {
+        'shifts': [{'id': 10, 'role_id': 1}, {'id': 20, 'role_id': 2}],
+        'employees': [{'id': 1, 'role_id': 1}, {'id': 3, 'role_id': 2}],
+    }
+    results = [
+        shift_result({day: {e['id']: {'shift_id': c['shifts'][0]['id']} for e in c['employees']}}, 1, 1)
+        for c in decompose_shift_inputs(inputs)
+    ]
+    assert merge_shift_results(results)['schedule'] == {day: {1: {'shift_id': 10}, 3: {'shift_id': 20}}}
+    print("   ✅ decompose -> solve -> merge round trip keeps every employee")
+
+    failed = shift_result(None, objective=0, bound=0, status='INFEASIBLE', error='No solution')
+    merged = merge_shift_results([first, failed])
+    assert merged['schedule'] is None
+    assert merged['error'] == 'No solution' and merged['status'] == 'INFEASIBLE'
+    print("   ✅ A failed component fails the merged result")
+
+
+def main():
+    """Run all tests"""
+    print("\n" + "="*70)
+    print("🧪 SCHEDULE DECOMPOSITION TEST SUITE")
+    print("="*70)
+
+    test_decompose_shift_inputs()
+    test_merge_shift_results()
+
+    print("\n" + "="*70)
+    print("✅ ALL CHECKS PASSED")
+    print("="*70)
+
+
+if __name__ == "__main__":
+    main()
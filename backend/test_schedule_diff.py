@@ -0,0 +1,105 @@
+"""
+Schedule Preview Diff Test
+Checks dry-run diff classification and the preview signature that limits
+POST /schedules/generate/apply to the diff the server generated (no database
+needed)
+Run: python test_schedule_diff.py
+"""
+
+from datetime import date
+from types import SimpleNamespace
+
+from app.schedule_engine import build_schedule_diff, preview_signature
+
+
+def test_build_schedule_diff():
+    """Generated rows classified as added / changed / removed; identical rows dropped"""
+    print("\n🧪 build_schedule_diff")
+    day, next_day = date(2026, 1, 7), date(2026, 1, 8)
+
+    def sched(id, employee_id, date_obj, shift_id, status='scheduled', start='09:00', end='17:00'):
+        return SimpleNamespace(id=id, employee_id=employee_id, date=date_obj, role_id=1,
+                               shift_id=shift_id, start_time=start, end_time=end,
+                               status=status, notes=None)
+
+    current = [
+        sched(1, 1, day, 10),       # Regenerated identically
+        sched(2, 1, next_day, 10),  # Moved to another shift
+        sched(3, 2, day, 10),       # Not regenerated
+    ]
+    generated = [
+        sched(None, 1, day, 10),
+        sched(None, 1, next_day, 11, start='13:00', end='21:00'),
+        sched(None, 3, day, 10),
+        sched(None, 2, next_day, 10, status='leave'),
+    ]
+    diff = build_schedule_diff(current, generated)
+
+    assert [(e['employee_id'], e['date'], e['status']) for e in diff['added']] == [
+        (3, day.isoformat(), 'scheduled'), (2, next_day.isoformat(), 'leave')
+    ], diff['added']
+    assert diff['changed'] == [{
+        'schedule_id': 2, 'employee_id': 1, 'date': next_day.isoformat(),
+        'from_shift_id': 10, 'to_shift_id': 11, 'role_id': 1,
+        'start_time': '13:00', 'end_time': '21:00',
+    }], diff['changed']
+    assert [e['schedule_id'] for e in diff['removed']] == [3], diff['removed']
+    print("   ✅ 2 added, 1 changed, 1 removed, identical row left out")
+
+    assert build_schedule_diff(current, current) == {'added': [], 'removed': [], 'changed': []}
+    print("   ✅ Regenerating the same schedule gives an empty diff")
+
+
+def test_preview_signature():
+    """Signature covers what apply writes and nothing else"""
+    print("\n🧪 preview_signature")
+    start, end = date(2026, 1, 5), date(2026, 1, 11)
+    diff = {
+        'added': [{'employee_id': 3, 'date': '2026-01-07', 'role_id': 1, 'shift_id': 10,
+                   'start_time': '09:00', 'end_time': '17:00', 'status': 'scheduled', 'notes': None}],
+        'removed': [{'schedule_id': 3, 'employee_id': 2, 'date': '2026-01-07', 'shift_id': 10,
+                     'start_time': '09:00', 'end_time': '17:00'}],
+        'changed': [{'schedule_id': 2, 'employee_id': 1, 'date': '2026-01-08', 'from_shift_id': 10,
+                     'to_shift_id': 11, 'role_id': 1, 'start_time': '13:00', 'end_time': '21:00'}],
+    }
+    signature = preview_signature(1, start, end, 'base', diff)
+
+    # The apply request drops display-only fields (e.g. times of removed rows)
+    echoed = {
+        'added': [dict(diff['added'][0])],
+        'removed': [{'schedule_id': 3, 'employee_id': 2, 'date': '2026-01-07', 'shift_id': 10}],
+        'changed': [dict(diff['changed'][0])],
+    }
+    assert preview_signature(1, start, end, 'base', echoed) == signature
+    print("   ✅ Same signature for the diff echoed back by the client")
+
+    tampered = [
+        ('status', lambda d: d['added'][0].update(status='completed')),
+        ('shift', lambda d: d['changed'][0].update(to_shift_id=99)),
+        ('removed row', lambda d: d['removed'].append({'schedule_id': 7})),
+    ]
+    for name, change in tampered:
+        copy = {key: [dict(e) for e in entries] for key, entries in echoed.items()}
+        change(copy)
+        assert preview_signature(1, start, end, 'base', copy) != signature, name
+    assert preview_signature(2, start, end, 'base', echoed) != signature
+    assert preview_signature(1, start, end, 'other', echoed) != signature
+    print("   ✅ Changed status, shift, rows, department or base state invalidate it")
+
+
+def main():
+    """Run all tests"""
+    print("\n" + "="*70)
+    print("🧪 SCHEDULE PREVIEW DIFF TEST SUITE")
+    print("="*70)
+
+    test_build_schedule_diff()
+    test_preview_signature()
+
+    print("\n" + "="*70)
+    print("✅ ALL CHECKS PASSED")
+    print("="*70)
+
+
+if __name__ == "__main__":
+    main()
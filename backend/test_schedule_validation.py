@@ -0,0 +1,146 @@
+"""
+Batch Schedule Validation Test
+Checks validate_assignments against in-memory week counters: proposals are
+judged in order with accepted ones counting toward the rest of the batch, and
+excluded / removed rows stop counting (no database needed - the read model
+lookup is replaced with prepared weeks)
+Run: python test_schedule_validation.py
+"""
+
+import asyncio
+from datetime import date, timedelta
+
+import app.schedule_validation as schedule_validation
+from app.employee_week_stats import empty_week, tally
+from app.schedule_validation import validate_assignments
+
+
+WEEK_START = date(2026, 3, 2)  # Monday of a week without public holidays
+DAY = {name: WEEK_START + timedelta(days=i) for i, name in enumerate(
+    ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun'))}
+
+
+def week_with(*days):
+    """Week counters of 09:00-17:00 shifts on the given days"""
+    week = empty_week()
+    for day in days:
+        tally(week, DAY[day], 'scheduled', '09:00', '17:00')
+    return week
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+
+class FakeSession:
+    """Answers the excluded-rows query with the given schedule rows"""
+
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+        self.queries = 0
+
+    async def execute(self, statement):
+        self.queries += 1
+        return FakeResult(self.rows)
+
+
+def use_weeks(weeks):
+    """Serve load_weeks from prepared counters (fresh copies per call)"""
+    async def load_weeks(db, keys):
+        return {key: _copy(weeks.get(key, empty_week())) for key in keys}
+    schedule_validation.load_weeks = load_weeks
+
+
+def _copy(week):
+    return dict(week, day_occupancy=list(week['day_occupancy']), day_hours=list(week['day_hours']))
+
+
+def proposal(employee_id, day, **extra):
+    return dict(employee_id=employee_id, date=DAY[day], start_time='09:00', end_time='17:00', **extra)
+
+
+async def test_batch_order():
+    """Accepted proposals count toward later ones in the same batch"""
+    print("\n🧪 batch ordering")
+    use_weeks({(1, WEEK_START): week_with('mon', 'tue', 'wed', 'thu')})
+    verdicts = await validate_assignments(FakeSession(), [
+        proposal(1, 'fri'),  # 5th weekday shift - meets the requirement
+        proposal(1, 'sat'),  # Requirement already met
+        proposal(1, 'fri'),  # 6th weekday shift
+    ])
+    assert [v['valid'] for v in verdicts] == [True, False, False], verdicts
+    assert 'weekday requirement already met' in verdicts[1]['errors'][0]
+    assert verdicts[0]['weekly_hours'] == 40.0 and verdicts[0]['daily_hours'] == 8.0
+    # A rejected proposal reports its hours on top of the accepted ones
+    assert verdicts[2]['weekly_hours'] == 48.0 and verdicts[2]['daily_hours'] == 16.0
+    print("   ✅ Friday accepted, then Saturday and a 6th weekday rejected")
+
+    verdicts = await validate_assignments(FakeSession(), [proposal(1, 'sat'), proposal(1, 'fri')])
+    assert [v['valid'] for v in verdicts] == [True, False], verdicts
+    print("   ✅ Reversed order: Saturday accepted, then Friday exceeds the week")
+
+
+async def test_exclude():
+    """Moved and removed rows no longer count toward their week"""
+    print("\n🧪 exclude semantics")
+    use_weeks({(1, WEEK_START): week_with('mon', 'tue', 'wed', 'thu', 'fri')})
+    thursday_row = [(1, DAY['thu'], 'scheduled', '09:00', '17:00')]
+
+    verdicts = await validate_assignments(FakeSession(), [proposal(1, 'sat')])
+    assert not verdicts[0]['valid']
+    print("   ✅ Full week: Saturday rejected")
+
+    session = FakeSession(thursday_row)
+    verdicts = await validate_assignments(session, [proposal(1, 'sat', exclude_schedule_id=7)])
+    assert verdicts[0]['valid'], verdicts
+    assert verdicts[0]['weekly_hours'] == 40.0
+    assert session.queries == 1
+    print("   ✅ Moving Thursday's row to Saturday is allowed")
+
+    session = FakeSession(thursday_row)
+    verdicts = await validate_assignments(session, [proposal(1, 'sat')], removed_schedule_ids=[7])
+    assert verdicts[0]['valid'], verdicts
+    print("   ✅ Row deleted in the same batch frees its day")
+
+    session = FakeSession()
+    await validate_assignments(session, [proposal(1, 'mon', exclude_schedule_id=None)])
+    assert session.queries == 0
+    print("   ✅ No excluded rows - no schedule query")
+
+
+async def test_consecutive():
+    """Consecutive-day limit counts the proposal and accepted batch entries"""
+    print("\n🧪 consecutive days")
+    use_weeks({(2, WEEK_START): week_with('mon', 'tue')})
+    verdicts = await validate_assignments(FakeSession(), [
+        proposal(2, 'wed'),  # Mon-Wed: 3 in a row
+        proposal(2, 'thu'),  # Mon-Tue + Thu: longest run 2
+        proposal(2, 'wed'),  # Now Mon-Thu: 4 in a row
+    ], max_consecutive=2)
+    assert [v['valid'] for v in verdicts] == [False, True, False], verdicts
+    assert 'Cannot create 3 consecutive' in verdicts[0]['errors'][0]
+    assert 'Cannot create 4 consecutive' in verdicts[2]['errors'][0]
+    print("   ✅ Wednesday rejected; Thursday accepted, then Wednesday would join a 4-day run")
+
+
+async def main():
+    """Run all tests"""
+    print("\n" + "="*70)
+    print("🧪 BATCH SCHEDULE VALIDATION TEST SUITE")
+    print("="*70)
+
+    await test_batch_order()
+    await test_exclude()
+    await test_consecutive()
+
+    print("\n" + "="*70)
+    print("✅ ALL CHECKS PASSED")
+    print("="*70)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
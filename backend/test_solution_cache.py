@@ -0,0 +1,108 @@
+"""
+Solution Cache Fingerprint Test
+Checks that the cache key of a solve payload ignores dict/set ordering but not
+content, and that a stored result reads back in solve_shift_schedule shape
+(no database needed)
+Run: python test_solution_cache.py
+"""
+
+from datetime import date
+
+from app.solution_cache import fingerprint, _serialize, _deserialize
+
+
+def payload(employees, leave_dates, hints, shift_config):
+    return {
+        'inputs': {
+            'employees': employees,
+            'shifts': [{'id': 10, 'role_id': 1, 'schedule_config': shift_config}],
+            'leave_dates': leave_dates,
+            'hints': hints,
+        },
+        'start_date': date(2026, 1, 5),
+        'end_date': date(2026, 1, 11),
+    }
+
+
+def test_fingerprint_ordering():
+    """Reordered dicts and sets give the same key"""
+    print("\n🧪 fingerprint ordering")
+    monday, tuesday = date(2026, 1, 5), date(2026, 1, 6)
+    first = payload(
+        employees=[{'id': 1, 'role_id': 1}, {'id': 2, 'role_id': 1}],
+        leave_dates={1: {monday, tuesday}, 2: set()},
+        hints={(1, monday): 10, (2, tuesday): 10},
+        shift_config={'days': ['Monday', 'Tuesday'], 'min_rest': 11},
+    )
+    reordered = payload(
+        employees=[{'role_id': 1, 'id': 1}, {'role_id': 1, 'id': 2}],
+        leave_dates={2: set(), 1: {tuesday, monday}},
+        hints={(2, tuesday): 10, (1, monday): 10},
+        shift_config={'min_rest': 11, 'days': ['Monday', 'Tuesday']},
+    )
+    assert fingerprint(first) == fingerprint(reordered)
+    print("   ✅ Dict keys and set members in any order give the same fingerprint")
+
+    # frozensets canonicalize like sets
+    frozen = dict(first, inputs=dict(first['inputs'], leave_dates={1: frozenset({tuesday, monday}), 2: frozenset()}))
+    assert fingerprint(frozen) == fingerprint(first)
+    print("   ✅ frozenset and set of the same dates match")
+
+
+def test_fingerprint_content():
+    """Any change to the inputs gives a different key"""
+    print("\n🧪 fingerprint content")
+    monday = date(2026, 1, 5)
+    base = payload([{'id': 1, 'role_id': 1}], {1: {monday}}, {}, {'min_rest': 11})
+    variants = {
+        'employee role': payload([{'id': 1, 'role_id': 2}], {1: {monday}}, {}, {'min_rest': 11}),
+        'leave day': payload([{'id': 1, 'role_id': 1}], {1: {date(2026, 1, 6)}}, {}, {'min_rest': 11}),
+        'hint': payload([{'id': 1, 'role_id': 1}], {1: {monday}}, {(1, monday): 10}, {'min_rest': 11}),
+        'shift config': payload([{'id': 1, 'role_id': 1}], {1: {monday}}, {}, {'min_rest': 12}),
+        'date range': dict(base, end_date=date(2026, 1, 12)),
+        'early stop': dict(base, early_stop={'accept_gap': 0.05}),
+    }
+    keys = {name: fingerprint(variant) for name, variant in variants.items()}
+    for name, key in keys.items():
+        assert key != fingerprint(base), name
+    assert len(set(keys.values())) == len(keys)
+    print(f"   ✅ {len(keys)} single-field changes give {len(keys)} distinct fingerprints")
+
+
+def test_serialize_round_trip():
+    """A stored result reads back with date keys and the solver result fields"""
+    print("\n🧪 _serialize / _deserialize")
+    monday = date(2026, 1, 5)
+    result = {
+        'schedule': {monday: {1: {'shift_id': 10, 'work_hours': 8.0}}},
+        'coverage': [{'date': monday, 'shift_id': 10, 'assigned': 1}],
+        'feedback': ['Solved'],
+        'status': 'OPTIMAL',
+        'objective': 12.0,
+        'bound': 12.0,
+    }
+    restored = _deserialize(_serialize(result))
+    assert restored['schedule'] == result['schedule']
+    assert restored['coverage'] == result['coverage']
+    assert restored['status'] == 'OPTIMAL' and restored['error'] is None
+    assert restored['gap'] == 0.0 and restored['cached'] is True
+    print("   ✅ Schedule, coverage and status survive the round trip")
+
+
+def main():
+    """Run all tests"""
+    print("\n" + "="*70)
+    print("🧪 SOLUTION CACHE FINGERPRINT TEST SUITE")
+    print("="*70)
+
+    test_fingerprint_ordering()
+    test_fingerprint_content()
+    test_serialize_round_trip()
+
+    print("\n" + "="*70)
+    print("✅ ALL CHECKS PASSED")
+    print("="*70)
+
+
+if __name__ == "__main__":
+    main()
@@ -186,15 +186,57 @@ export const getSchedules = (startDate, endDate) => {
 };
 export const createSchedule = (scheduleData) => api.post('/schedules', scheduleData);
 export const updateSchedule = (id, scheduleData) => api.put(`/schedules/${id}`, scheduleData);
+export const validateScheduleAssignments = (assignments) => api.post('/schedules/validate', { assignments });
+export const bulkUpdateSchedules = (operations) => api.post('/schedules/bulk', { operations });
 export const deleteSchedule = (id) => api.delete(`/schedules/${id}`);
-export const generateSchedule = (startDate, endDate, regenerate = false) => {
+export const generateSchedule = (startDate, endDate, regenerate = false, engine = 'greedy') => {
   const params = new URLSearchParams();
   params.append('start_date', startDate);
   params.append('end_date', endDate);
   params.append('regenerate', regenerate);
+  params.append('engine', engine);
   return api.post(`/schedules/generate?${params.toString()}`);
 };
 
+export const startScheduleGenerationJob = (startDate, endDate, regenerate = false, engine = 'greedy') => {
+  const params = new URLSearchParams();
+  params.append('start_date', startDate);
+  params.append('end_date', endDate);
+  params.append('regenerate', regenerate);
+  params.append('engine', engine);
+  params.append('run_async', true);
+  return api.post(`/schedules/generate?${params.toString()}`);
+};
+
+export const repairSchedule = (startDate, endDate) => {
+  const params = new URLSearchParams();
+  params.append('start_date', startDate);
+  params.append('end_date', endDate);
+  params.append('repair', true);
+  return api.post(`/schedules/generate?${params.toString()}`);
+};
+
+export const previewSchedule = (startDate, endDate, engine = 'greedy', repair = false) => {
+  const params = new URLSearchParams();
+  params.append('start_date', startDate);
+  params.append('end_date', endDate);
+  params.append('engine', engine);
+  params.append('repair', repair);
+  params.append('dry_run', true);
+  return api.post(`/schedules/generate?${params.toString()}`);
+};
+
+// Commit a preview as returned by previewSchedule (409 if the range changed since)
+export const applySchedulePreview = (preview) => api.post('/schedules/generate/apply', {
+  start_date: preview.start_date,
+  end_date: preview.end_date,
+  base_fingerprint: preview.base_fingerprint,
+  preview_signature: preview.preview_signature,
+  diff: preview.diff,
+});
+
+export const getScheduleGenerationJob = (jobId) => api.get(`/schedules/generate/${jobId}`);
+
 // Attendance
 export const recordAttendance = (attendanceData) => 
   api.post('/attendance/record', attendanceData);
@@ -217,6 +259,67 @@ export const getWeeklyAttendance = (employeeId, startDate) => {
   if (startDate) params.append('start_date', startDate);
   return api.get(`/attendance/weekly/${employeeId}?${params.toString()}`);
 };
+export const getTodaysAttendance = () => api.get('/attendance/today');
+
+// Live attendance board: onBoard(board) on connect / resync, onChange(event) per check-in or check-out.
+// Returns an object with .close() to stop.
+// The stream is opened with a short-lived stream token (EventSource cannot send
+// the Authorization header). When the session expires or the connection drops it
+// reconnects with a fresh token, waiting twice as long after each failed attempt
+// (reset once a board arrives). It stops for good when access is revoked or the
+// token request is refused (400/401/403), or when close() is called.
+const STREAM_RETRY_MIN_MS = 1000;
+const STREAM_RETRY_MAX_MS = 60000;
+const STREAM_TOKEN_FINAL_STATUSES = [400, 401, 403];
+
+export const subscribeTodaysAttendance = (onBoard, onChange) => {
+  let source = null;
+  let closed = false;
+  let timer = null;
+  let delay = STREAM_RETRY_MIN_MS;
+
+  const stop = () => {
+    closed = true;
+    clearTimeout(timer);
+    if (source) source.close();
+  };
+
+  const reconnect = () => {
+    if (source) source.close();
+    if (closed) return;
+    timer = setTimeout(open, delay);
+    delay = Math.min(delay * 2, STREAM_RETRY_MAX_MS);
+  };
+
+  const open = async () => {
+    let token;
+    try {
+      token = (await api.post('/attendance/today/stream-token')).data.token;
+    } catch (error) {
+      // Not a manager (any more) or logged out (the interceptor handles 401): retrying won't help
+      if (STREAM_TOKEN_FINAL_STATUSES.includes(error.response?.status)) stop();
+      else reconnect();
+      return;
+    }
+    if (closed) return;
+    source = new EventSource(`${API_URL}/attendance/today/stream?token=${encodeURIComponent(token)}`);
+    source.addEventListener('board', (e) => {
+      delay = STREAM_RETRY_MIN_MS;
+      onBoard(JSON.parse(e.data));
+    });
+    source.addEventListener('check_in', (e) => onChange(JSON.parse(e.data)));
+    source.addEventListener('check_out', (e) => onChange(JSON.parse(e.data)));
+    source.addEventListener('end', (e) => {
+      if (JSON.parse(e.data).reason === 'access_revoked') stop();
+      else reconnect();
+    });
+    // EventSource hides the HTTP status; a refused stream is caught by the next token request
+    source.onerror = reconnect;
+  };
+
+  open();
+  return { close: stop };
+};
 
 // Attendance Export Functions
 export const exportMonthlyAttendance = (departmentId, year, month) => {
@@ -238,8 +341,26 @@ export const exportWeeklyAttendance = (departmentId, startDate, endDate) => {
 };
 
 // Calendar & Holidays
-export const getHolidays = (year, month) => {
-  return api.get(`/calendar/holidays?year=${year}&month=${month}`);
+// Full-year calendars are fetched once per year and shared by every calendar view
+const calendarYears = {};
+
+export const getCalendarYear = (year) => {
+  if (!calendarYears[year]) {
+    calendarYears[year] = api.get(`/calendar/year?year=${year}`).catch((error) => {
+      delete calendarYears[year];
+      throw error;
+    });
+  }
+  return calendarYears[year];
+};
+
+export const getHolidays = async (year, month) => {
+  const response = await getCalendarYear(year);
+  const prefix = `${year}-${String(month).padStart(2, '0')}-`;
+  const holidays = Object.fromEntries(
+    Object.entries(response.data.holidays || {}).filter(([key]) => key.startsWith(prefix))
+  );
+  return { ...response, data: { year, month, holidays } };
 };
 
 export const getWeekInfo = (year, month, weekNumber) => {
@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+"""
+Check-in / check-out load test
+
+Reproduces the shift-start rush: every employee checks in at once with up to
+--concurrency requests in flight, then everyone checks out the same way. Each
+burst is timed and reported (throughput, p50 / p95 / p99 / max latency, status
+codes and an error breakdown). Several concurrency levels can be swept in one
+run.
+
+Employees come from one of:
+  --seed N                 create N load-test employees (department 999) with a
+                           shift today, and mint their JWTs with
+                           create_access_token (no /token round trips)
+  --usernames / --usernames-file
+                           existing employees, logged in through /token
+
+--start-server launches a local uvicorn (DATABASE_URL from the environment)
+with a SQL statement counter attached to the engine, so the report also shows
+DB queries per request for each endpoint. Against an already running server
+(--base-url) query counts are not available.
+
+Seeded employees have today's check-ins and attendance cleared before every
+concurrency level so each level starts from the same state.
+
+Examples:
+    python load_test_check_in.py --seed 500 --start-server --concurrency 50,100,200
+    python load_test_check_in.py --usernames-file users.txt --output before.json   # old build
+    python load_test_check_in.py --usernames-file users.txt --output after.json    # new build
+    python load_test_check_in.py --compare before.json after.json
+"""
+
+import argparse
+import asyncio
+import contextvars
+import json
+import math
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import date, timedelta
+
+import httpx
+
+BASE_URL = "http://localhost:8000"
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+
+LOAD_TEST_DEPT_ID = "999"
+LOAD_TEST_USER_PREFIX = "loadtest"
+LOAD_TEST_SHIFT = ("09:00", "18:00")
+
+QUERY_STATS_PATH = "/__load_test/queries"
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def summarize(latencies, statuses, errors=None, elapsed=None):
+    summary = {
+        'requests': len(latencies),
+        'statuses': dict(Counter(statuses)),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+        'max_ms': round(max(latencies) * 1000, 1) if latencies else 0.0,
+        'mean_ms': round(statistics.mean(latencies) * 1000, 1) if latencies else 0.0,
+    }
+    if elapsed is not None:
+        summary['throughput_rps'] = round(len(latencies) / elapsed, 1) if elapsed else 0.0
+    if errors is not None:
+        summary['errors'] = dict(Counter(errors).most_common())
+    return summary
+
+
+# ===== Backend access (seeding, token minting, instrumented server) =====
+
+def _import_backend():
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+
+
+async def seed_employees(count):
+    """Create (or reuse) count load-test employees with a shift today; returns their usernames"""
+    _import_backend()
+    from sqlalchemy import select
+    from app.database import engine, async_session_maker
+    from app.models import User, UserType, Department, Role, Employee, Schedule
+    from app.auth import get_password_hash
+    import app.employee_week_stats  # noqa: F401  (keeps employee_week_stats in step with the seeded shifts)
+
+    today = date.today()
+    usernames = [f"{LOAD_TEST_USER_PREFIX}{i:05d}" for i in range(1, count + 1)]
+
+    async with async_session_maker() as db:
+        result = await db.execute(select(Department).filter(Department.dept_id == LOAD_TEST_DEPT_ID))
+        department = result.scalar_one_or_none()
+        if not department:
+            department = Department(dept_id=LOAD_TEST_DEPT_ID, name="Load Test", description="Check-in load test employees")
+            db.add(department)
+            await db.flush()
+
+        result = await db.execute(select(Role).filter(Role.department_id == department.id))
+        role = result.scalars().first()
+        if not role:
+            role = Role(name="Load Test Staff", department_id=department.id, break_minutes=60)
+            db.add(role)
+            await db.flush()
+
+        result = await db.execute(select(User).filter(User.username.in_(usernames)))
+        users = {u.username: u for u in result.scalars().all()}
+        hashed_password = get_password_hash("emp123")  # One hash for every seeded user
+        new_users = [
+            User(username=username, email=f"{username}@loadtest.local", hashed_password=hashed_password,
+                 full_name=f"Load Test {username[-5:]}", user_type=UserType.EMPLOYEE, is_active=True)
+            for username in usernames if username not in users
+        ]
+        db.add_all(new_users)
+        await db.flush()
+        users.update((u.username, u) for u in new_users)
+
+        user_ids = [users[username].id for username in usernames]
+        result = await db.execute(select(Employee).filter(Employee.user_id.in_(user_ids)))
+        employees = {e.user_id: e for e in result.scalars().all()}
+        new_employees = [
+            Employee(employee_id=f"LT{username[-5:]}", first_name="Load", last_name=f"Test {username[-5:]}",
+                     email=f"{username}@loadtest.local", department_id=department.id, role_id=role.id,
+                     user_id=users[username].id, is_active=True)
+            for username in usernames if users[username].id not in employees
+        ]
+        db.add_all(new_employees)
+        await db.flush()
+        employees.update((e.user_id, e) for e in new_employees)
+
+        employee_ids = [employees[user_id].id for user_id in user_ids]
+        result = await db.execute(
+            select(Schedule.employee_id).filter(Schedule.employee_id.in_(employee_ids), Schedule.date == today)
+        )
+        scheduled = set(result.scalars().all())
+        db.add_all([
+            Schedule(department_id=department.id, employee_id=employee_id, role_id=role.id, date=today,
+                     start_time=LOAD_TEST_SHIFT[0], end_time=LOAD_TEST_SHIFT[1], status='scheduled')
+            for employee_id in employee_ids if employee_id not in scheduled
+        ])
+        await db.commit()
+    # The pool's connections belong to this event loop; the scenario runs in another
+    await engine.dispose()
+
+    print(f"🌱 Seeded {len(new_users)} new / {count} load-test employees with a shift on {today}")
+    return usernames
+
+
+async def reset_today(usernames):
+    """Clear today's check-ins and attendance of the given employees"""
+    _import_backend()
+    from sqlalchemy import select, delete
+    from app.database import async_session_maker
+    from app.models import User, Employee, CheckInOut, Attendance
+
+    today = date.today()
+    employee_ids = (
+        select(Employee.id).join(User, User.id == Employee.user_id).filter(User.username.in_(usernames))
+    )
+    async with async_session_maker() as db:
+        await db.execute(delete(CheckInOut).where(CheckInOut.employee_id.in_(employee_ids), CheckInOut.date == today))
+        await db.execute(delete(Attendance).where(Attendance.employee_id.in_(employee_ids), Attendance.date == today))
+        await db.commit()
+
+
+def mint_tokens(usernames):
+    """JWTs for the given usernames, signed like the /token endpoint signs them"""
+    _import_backend()
+    from app.auth import create_access_token
+    return [create_access_token({"sub": username}, expires_delta=timedelta(hours=12)) for username in usernames]
+
+
+def serve(port):
+    """Run the backend with a per-endpoint SQL statement counter (used by --start-server)"""
+    _import_backend()
+    os.chdir(BACKEND_DIR)
+    import uvicorn
+    from fastapi import Request
+    from sqlalchemy import event
+    from app.main import app
+    from app.database import engine
+
+    queries, requests = Counter(), Counter()
+    current_path = contextvars.ContextVar('load_test_path', default='(background)')
+
+    @event.listens_for(engine.sync_engine, 'before_cursor_execute')
+    def count_query(conn, cursor, statement, parameters, context, executemany):
+        queries[current_path.get()] += 1
+
+    @app.middleware("http")
+    async def tag_request(request: Request, call_next):
+        if request.url.path == QUERY_STATS_PATH:
+            return await call_next(request)
+        requests[request.url.path] += 1
+        token = current_path.set(request.url.path)
+        try:
+            return await call_next(request)
+        finally:
+            current_path.reset(token)
+
+    @app.get(QUERY_STATS_PATH, include_in_schema=False)
+    async def query_stats(reset: bool = False):
+        stats = {'queries': dict(queries), 'requests': dict(requests)}
+        if reset:
+            queries.clear()
+            requests.clear()
+        return stats
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def start_server(port):
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve", "--port", str(port)])
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Backend exited with code {process.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/", timeout=1).status_code < 500:
+                print(f"🚀 Backend started on port {port} (pid {process.pid})")
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise SystemExit("Backend did not start within 60s")
+
+
+# ===== Scenario =====
+
+async def login(client, username, password):
+    response = await client.post(
+        f"{BASE_URL}/token",
+        data={'username': username, 'password': password},
+        headers={'Content-Type': 'application/x-www-form-urlencoded'}
+    )
+    response.raise_for_status()
+    return response.json()['access_token']
+
+
+async def timed_post(client, semaphore, path, token, body):
+    """(latency, status, error) of one request; error is None on 2xx"""
+    async with semaphore:
+        started = time.perf_counter()
+        try:
+            response = await client.post(f"{BASE_URL}{path}", json=body, headers={'Authorization': f"Bearer {token}"})
+        except httpx.HTTPError as e:
+            return time.perf_counter() - started, 'error', type(e).__name__
+        latency = time.perf_counter() - started
+    if response.status_code < 400:
+        return latency, response.status_code, None
+    try:
+        detail = response.json().get('detail')
+    except ValueError:
+        detail = response.text
+    return latency, response.status_code, f"{response.status_code} {str(detail)[:80]}"
+
+
+async def burst(client, semaphore, path, tokens, body):
+    started = time.perf_counter()
+    results = await asyncio.gather(*(timed_post(client, semaphore, path, token, body) for token in tokens))
+    return results, time.perf_counter() - started
+
+
+async def query_stats(client, reset=False):
+    try:
+        response = await client.get(f"{BASE_URL}{QUERY_STATS_PATH}", params={'reset': reset})
+    except httpx.HTTPError:
+        return None
+    return response.json() if response.status_code == 200 else None
+
+
+def queries_per_request(stats, path):
+    if not stats or not stats['requests'].get(path):
+        return None
+    return round(stats['queries'].get(path, 0) / stats['requests'][path], 2)
+
+
+async def run_level(client, tokens, rounds, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    await query_stats(client, reset=True)
+
+    ops = {'check_in': ("/employee/check-in", {'location': 'Load test'}), 'check_out': ("/employee/check-out", {})}
+    collected = {op: {'latencies': [], 'statuses': [], 'errors': [], 'elapsed': 0.0} for op in ops}
+    for round_number in range(1, rounds + 1):
+        line = []
+        for op, (path, body) in ops.items():
+            results, elapsed = await burst(client, semaphore, path, tokens, body)
+            data = collected[op]
+            data['latencies'] += [latency for latency, _, _ in results]
+            data['statuses'] += [code for _, code, _ in results]
+            data['errors'] += [error for _, _, error in results if error]
+            data['elapsed'] += elapsed
+            p99 = percentile([latency for latency, _, _ in results], 99) * 1000
+            line.append(f"{op} {len(results) / elapsed:.0f} req/s p99={p99:.1f}ms")
+        print(f"  Round {round_number}: " + ", ".join(line))
+
+    stats = await query_stats(client)
+    level = {'concurrency': concurrency}
+    for op, (path, _) in ops.items():
+        data = collected[op]
+        level[op] = summarize(data['latencies'], data['statuses'], data['errors'], data['elapsed'])
+        level[op]['db_queries_per_request'] = queries_per_request(stats, path)
+    if stats:
+        level['db_queries'] = stats['queries']
+    return level
+
+
+async def run_scenario(usernames, password, rounds, levels, seeded):
+    max_concurrency = max(levels)
+    limits = httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency)
+    async with httpx.AsyncClient(timeout=60, limits=limits) as client:
+        if seeded:
+            tokens = mint_tokens(usernames)
+        else:
+            print(f"🔐 Logging in {len(usernames)} employees...")
+            tokens = await asyncio.gather(*(login(client, u, password) for u in usernames))
+
+        results = []
+        for concurrency in levels:
+            if seeded:
+                await reset_today(usernames)
+            print(f"⚡ Concurrency {concurrency}: {len(tokens)} employees x {rounds} rounds")
+            level = await run_level(client, tokens, rounds, concurrency)
+            for op in ('check_in', 'check_out'):
+                s = level[op]
+                print(f"  {op:<9} {s['throughput_rps']} req/s p50={s['p50_ms']}ms p95={s['p95_ms']}ms "
+                      f"p99={s['p99_ms']}ms queries/req={s['db_queries_per_request']} errors={s['errors'] or '-'}")
+            results.append(level)
+
+    return {
+        'base_url': BASE_URL,
+        'employees': len(usernames),
+        'rounds': rounds,
+        'levels': results,
+    }
+
+
+def _levels(path):
+    with open(path) as f:
+        result = json.load(f)
+    if 'levels' in result:
+        return {level['concurrency']: level for level in result['levels']}
+    # Summaries written before concurrency sweeps: one level, check-in only
+    return {result['concurrency']: {'check_in': result['check_in']}}
+
+
+def compare(before_path, after_path):
+    before_levels, after_levels = _levels(before_path), _levels(after_path)
+    for concurrency in sorted(set(before_levels) & set(after_levels)):
+        for op in ('check_in', 'check_out'):
+            before = before_levels[concurrency].get(op)
+            after = after_levels[concurrency].get(op)
+            if not before or not after:
+                continue
+            print(f"\nconcurrency={concurrency} {op}")
+            print(f"{'metric':<22} {'before':>10} {'after':>10} {'change':>8}")
+            for metric in ('throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms', 'mean_ms', 'db_queries_per_request'):
+                if before.get(metric) is None or after.get(metric) is None:
+                    continue
+                change = (after[metric] - before[metric]) / before[metric] * 100 if before[metric] else 0.0
+                print(f"{metric:<22} {before[metric]:>10} {after[metric]:>10} {change:>7.1f}%")
+
+
+def main():
+    global BASE_URL
+    parser = argparse.ArgumentParser(description="Check-in / check-out load test")
+    parser.add_argument('--base-url', default=BASE_URL)
+    parser.add_argument('--seed', type=int, metavar='N', help="Seed N load-test employees and mint their tokens")
+    parser.add_argument('--usernames', help="Comma-separated employee usernames")
+    parser.add_argument('--usernames-file', help="File with one employee username per line")
+    parser.add_argument('--password', default="emp123")
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--concurrency', default="200", help="Concurrency level(s), e.g. 50,100,200")
+    parser.add_argument('--start-server', action='store_true', help="Start a local instrumented backend")
+    parser.add_argument('--port', type=int, default=8765, help="Port for --start-server")
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--output', help="Write the summary as JSON")
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help="Compare two JSON summaries")
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port)
+        return
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    levels = [int(level) for level in args.concurrency.split(',') if level.strip()]
+    BASE_URL = f"http://127.0.0.1:{args.port}" if args.start_server else args.base_url.rstrip('/')
+
+    usernames = []
+    if args.usernames:
+        usernames += [u.strip() for u in args.usernames.split(',') if u.strip()]
+    if args.usernames_file:
+        with open(args.usernames_file) as f:
+            usernames += [line.strip() for line in f if line.strip()]
+    if args.seed:
+        usernames = asyncio.run(seed_employees(args.seed))
+        if not args.start_server:
+            print("ℹ️  A running backend may serve its cached roster for up to ROSTER_CACHE_TTL_SECONDS "
+                  "before it sees newly seeded shifts")
+    if not usernames:
+        parser.error("Pass --seed, --usernames or --usernames-file")
+
+    server = start_server(args.port) if args.start_server else None
+    try:
+        result = asyncio.run(run_scenario(usernames, args.password, args.rounds, levels, bool(args.seed)))
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    print(json.dumps(result['levels'], indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"📝 Summary written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()